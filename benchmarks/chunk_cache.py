@@ -0,0 +1,58 @@
+"""
+Compares the time the data checks need to read compressed and uncompressed NetCDF4 variables
+
+A synthetic variable is written uncompressed (contiguous) and compressed (zlib, chunked). Each file is read block by
+block along the first dimension with the default chunk cache of the netCDF library and with chunk_cache="auto"
+(see uc2data.Dataset). Blocks smaller than a storage chunk read the same chunks again; with a too small chunk cache
+every chunk is decompressed once per block.
+
+Usage: python benchmarks/chunk_cache.py [nt ny nx]
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+import numpy
+import netCDF4
+import uc2data
+
+
+def write(path, shape, compressed):
+    with netCDF4.Dataset(str(path), "w") as nc:
+        for name, length in zip(["time", "y", "x"], shape):
+            nc.createDimension(name, length)
+        if compressed:
+            var = nc.createVariable("ta", "f4", ("time", "y", "x"), zlib=True, complevel=4,
+                                    chunksizes=(32, min(shape[1], 256), min(shape[2], 256)))
+        else:
+            var = nc.createVariable("ta", "f4", ("time", "y", "x"), contiguous=True)
+        rng = numpy.random.default_rng(0)
+        for t in range(shape[0]):
+            var[t] = 280. + rng.normal(size=shape[1:]).astype("f4").round(1)
+
+
+def read(path, chunks, chunk_cache):
+    with uc2data.Dataset(path, chunks=chunks, cache_size=0, chunk_cache=chunk_cache) as ds:
+        start = time.perf_counter()
+        ds._all_finite("ta")
+        return time.perf_counter() - start
+
+
+def main(shape):
+    with tempfile.TemporaryDirectory() as tmp:
+        files = {"uncompressed": Path(tmp) / "uncompressed.nc", "compressed": Path(tmp) / "compressed.nc"}
+        for name, path in files.items():
+            write(path, shape, name == "compressed")
+            print(name + ": " + str(path.stat().st_size // 1024 ** 2) + " MiB")
+
+        print("file          blocks     chunk cache   time [s]")
+        for name, path in files.items():
+            for chunks in [None, 32, 4]:
+                for chunk_cache in [None, 4 * 1024 ** 2, "auto"]:
+                    print("{:13} {:10} {:13} {:.3f}".format(name, "all" if chunks is None else str(chunks),
+                                                             str(chunk_cache), read(path, chunks, chunk_cache)))
+
+
+if __name__ == "__main__":
+    main(tuple(int(i) for i in sys.argv[1:4]) if len(sys.argv) > 1 else (64, 1024, 1024))
@@ -0,0 +1,54 @@
+"""
+Measures how long `import uc2data` takes and which modules take longest (python -X importtime)
+
+uc2check is also used for single files, e.g. in upload hooks, where the start-up is most of the runtime. The heavy
+dependencies (xarray, netCDF4, pyproj, cfchecker) are imported on first use, so they must not appear in the list.
+For comparison the import times of the heavy dependencies are printed as well.
+
+Usage: python benchmarks/import_time.py [number of modules to list]
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+repo_dir = Path(__file__).parent.parent
+heavy = ["xarray", "netCDF4", "pyproj", "cfchecker"]
+
+
+def import_times(module):
+    """
+    Returns {module: (self time, cumulative time)} in microseconds of all modules imported by `import module`
+    """
+
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module], check=True,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True,
+                            cwd=str(repo_dir)).stderr
+    times = dict()
+    for line in stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[0].startswith("import time:") and fields[1].strip().isdigit():
+            times[fields[2].strip()] = (int(fields[0].split(":")[1]), int(fields[1]))
+    return times
+
+
+def main(count):
+    times = import_times("uc2data")
+    print("import uc2data: {:.3f} s".format(times["uc2data"][1] / 1e6))
+    print()
+    print("module                                   self [s]  cumulative [s]")
+    for name, (own, cumulative) in sorted(times.items(), key=lambda i: -i[1][1])[:count]:
+        print("{:40} {:9.3f} {:15.3f}".format(name, own / 1e6, cumulative / 1e6))
+
+    loaded = [i for i in heavy if i in times]
+    print()
+    print("heavy modules loaded by import uc2data: " + (", ".join(loaded) if loaded else "none"))
+    for module in heavy:
+        try:
+            print("import {}: {:.3f} s".format(module, import_times(module)[module][1] / 1e6))
+        except (subprocess.CalledProcessError, KeyError):
+            print("import {}: not available".format(module))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 15)
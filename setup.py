@@ -27,5 +27,5 @@ setup(
     include_package_data=True,
     install_requires=requirements,
     packages=find_packages(exclude=('tests', 'docs')),
-    scripts=['scripts/uc2check']
+    scripts=['scripts/uc2check', 'scripts/uc2catalog', 'scripts/uc2extents']
 )
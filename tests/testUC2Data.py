@@ -1,8 +1,50 @@
 import unittest
+import subprocess
+import sys
+import io
+import json
+import os
+import pickle
+import time
+import shutil
+import tempfile
+import threading
+import numpy
+import netCDF4
+import xarray
 from uc2data.Dataset import *
+from uc2data.Dataset import _ArrayCache
+from uc2data.helpers import check_many, shard
+from uc2data.pool import IsolatedPool
+from uc2data.catalog import Catalog
+from uc2data.extents import ExtentCatalog, file_extent
+from uc2data.names import plan_names, find_collisions, apply_renames
+from uc2data.series import check_series
+from uc2data.workqueue import WorkQueue
+from uc2data.watch import DirectoryWatcher, watch_check
+from uc2data.progress import Progress
+from uc2data import netcdf3
+from uc2data.utils import time_steps_ok, midpoints_ok
 from pathlib import Path
 
 
+def copy_as(src, dst, file_format):
+    """
+    Copies a NetCDF file to another file format without changing any attributes
+    """
+    with netCDF4.Dataset(src) as i, netCDF4.Dataset(dst, "w", format=file_format) as o:
+        i.set_auto_maskandscale(False)
+        o.setncatts({k: i.getncattr(k) for k in i.ncattrs()})
+        for name, dim in i.dimensions.items():
+            o.createDimension(name, len(dim))
+        for name, var in i.variables.items():
+            attrs = {k: var.getncattr(k) for k in var.ncattrs()}
+            out = o.createVariable(name, var.dtype, var.dimensions, fill_value=attrs.pop("_FillValue", None))
+            out.set_auto_maskandscale(False)
+            out.setncatts(attrs)
+            out[...] = var[...]
+
+
 class TestCheckResult(unittest.TestCase):
 
     file_dir = Path(__file__).parent / "test_files"
@@ -31,6 +73,54 @@ class TestCheckResult(unittest.TestCase):
         self.assertDictEqual(x, exp)
 
 
+    def test_iter_items(self):
+        a = CheckResult()
+        a['E1'].add(ResultCode.ERROR, 'E1 is wrong')
+        a['E1']['E1.1'].add(ResultCode.WARNING, 'E1.1 is odd')
+        a['O1'].add(ResultCode.OK)
+        a['empty']
+        self.assertEqual(list(a.iter_items()), [(('E1',), ResultCode.ERROR, 'E1 is wrong'),
+                                                (('E1', 'E1.1'), ResultCode.WARNING, 'E1.1 is odd'),
+                                                (('O1',), ResultCode.OK, 'Test passed.')])
+        self.assertEqual([i[0] for i in a.iter_items(ResultCode.WARNING)], [('E1',), ('E1', 'E1.1')])
+        self.assertEqual(str(a), "[ E1 ]\n    E1 is wrong (ResultCode.ERROR)\n    [ E1.1 ]\n"
+                                 "        E1.1 is odd (ResultCode.WARNING)\n[ O1 ]\n    Test passed. (ResultCode.OK)\n"
+                                 "[ empty ]\n    ")
+        self.assertEqual(list(a.errors.keys()), ['E1', 'empty'])
+        self.assertEqual((a.count_errors(), a.count_warnings()), (1, 1))
+
+        deep = CheckResult()
+        node = deep
+        for i in range(2 * sys.getrecursionlimit()):  # deeper than the recursion limit
+            node = node[str(i)]
+        node.add(ResultCode.ERROR, "deep")
+        self.assertEqual(len(list(deep.iter_items())[0][0]), 2 * sys.getrecursionlimit())
+        self.assertTrue(str(deep).endswith("deep (ResultCode.ERROR)"))
+
+    def test_to_bytes(self):
+        data = Dataset(self.file_dir / "trajectory.nc")
+        data.uc2_check()
+        data.check_result["empty"]
+        for result in [data.check_result, CheckResult()]:
+            for copy in [CheckResult.from_bytes(result.to_bytes()), pickle.loads(pickle.dumps(result))]:
+                self.assertIsInstance(copy, CheckResult)
+                self.assertEqual(str(copy), str(result))
+                self.assertEqual(list(copy.iter_items()), list(result.iter_items()))
+        self.assertLess(len(data.check_result.to_bytes()), len(pickle.dumps(data.check_result.to_dict())))
+
+        raw = data.check_result.to_bytes()
+        for broken in [b"", b"nonsense" * 4, raw[:-1], raw + b"\0"]:
+            self.assertRaises(ValueError, CheckResult.from_bytes, broken)
+
+        # indices and result codes out of range (the tables at the end are 1 byte per entry here)
+        small = CheckResult()
+        small["tag"].add(ResultCode.ERROR, "message")
+        raw = small.to_bytes()
+        for position in [-5, -4, -3, -2, -1]:  # parent, name, item tag, item message, item code
+            broken = bytearray(raw)
+            broken[position] = 200
+            self.assertRaises(ValueError, CheckResult.from_bytes, bytes(broken))
+
     def test_ok_files_pass(self):
         files = ["grid", "timeSeries", "timeSeriesProfile", "trajectory"]
         for fn in files:
@@ -50,6 +140,245 @@ class TestCheckResult(unittest.TestCase):
 
             self.assertTrue(type(data.filename) == str)
 
+    def test_chunked_reads(self):
+        files = ["grid", "timeSeries", "timeSeriesProfile", "trajectory"]
+        for fn in files:
+            fn = self.file_dir / (fn + ".nc")
+
+            whole = Dataset(fn, chunks=None)
+            whole.uc2_check()
+            blocks = Dataset(fn, chunks=1)  # one entry along the first dimension per block
+            blocks.uc2_check()
+            self.assertEqual(str(whole.check_result), str(blocks.check_result))
+            self.assertEqual(whole.get_bounds(utm=True), blocks.get_bounds(utm=True))
+
+    def test_var_workers(self):
+        for fn in ["grid.nc", "timeSeries.nc", "timeSeriesProfile.nc", "trajectory.nc"]:
+            serial = Dataset(self.file_dir / fn)
+            serial.uc2_check()
+            parallel = Dataset(self.file_dir / fn, var_workers=4)
+            parallel.uc2_check()
+            self.assertEqual(str(serial.check_result), str(parallel.check_result))
+
+    def test_in_memory(self):
+        fn = self.file_dir / "timeSeries.nc"
+        data = Dataset(fn)
+        data.uc2_check()
+
+        from_bytes = Dataset.from_bytes(fn.read_bytes())
+        from_bytes.uc2_check()
+        self.assertIsNone(from_bytes.path)
+        self.assertEqual(str(data.check_result), str(from_bytes.check_result))
+
+        with xarray.open_dataset(fn) as ds, tempfile.TemporaryDirectory() as tmp:
+            from_xarray = Dataset.from_xarray(ds)
+            from_xarray.uc2_check()
+            ds.to_netcdf(Path(tmp) / "written.nc")
+            written = Dataset(Path(tmp) / "written.nc")
+            written.uc2_check()
+            self.assertEqual(str(written.check_result), str(from_xarray.check_result))
+            written.ds.close()
+
+    def test_fail_fast(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            fn = Path(tmp) / "broken.nc"
+            copy_as(self.file_dir / "grid.nc", fn, "NETCDF4")
+            with netCDF4.Dataset(fn, "a") as nc:
+                nc.Conventions = "CF-1.6"
+                nc.version = 1000
+
+            data = Dataset(fn)
+            data.uc2_check(max_errors=1)
+            self.assertTrue(data.truncated)
+            self.assertFalse(data.check_result)
+            self.assertTrue(data.check_result["truncated"].contains_warnings())
+            self.assertNotIn("cfchecks", data.check_result)  # expensive checks are skipped
+            self.assertNotIn("ta", data.check_result)
+
+            data.uc2_check()
+            self.assertFalse(data.truncated)
+            self.assertIn("cfchecks", data.check_result)
+            self.assertEqual(data.check_result.count_errors(), 2)
+
+    def test_check_groups(self):
+        self.assertEqual(Dataset.schedule_groups(only=["coordinates"]),
+                         ["global_attributes", "variables", "coordinates"])
+        self.assertEqual(Dataset.schedule_groups(skip=["variables"]), ["cf", "global_attributes", "dimensions"])
+        self.assertRaises(ValueError, Dataset.schedule_groups, ["nonsense"])
+
+        data = Dataset(self.file_dir / "grid.nc")
+        data.uc2_check(only=["global_attributes"])
+        self.assertTrue(data.check_result)
+        self.assertIn("featureType", data.check_result)
+        self.assertNotIn("cfchecks", data.check_result)
+        self.assertNotIn("ta", data.check_result)
+
+    def test_header_only(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for fn in ["grid", "timeSeries", "timeSeriesProfile", "trajectory"]:
+                nc3 = Path(tmp) / (fn + ".nc")
+                copy_as(self.file_dir / (fn + ".nc"), nc3, "NETCDF3_64BIT_OFFSET")
+                for path in [self.file_dir / (fn + ".nc"), nc3]:
+                    full = Dataset(path)
+                    data = Dataset.from_header(path)
+                    self.assertTrue(data.header_only)
+                    self.assertEqual(dict(data.ds.dims), dict(full.ds.dims))
+                    self.assertEqual(list(data.ds.attrs), list(full.ds.attrs))
+                    for name, value in full.ds.attrs.items():
+                        self.assertEqual(type(data.ds.attrs[name]), type(value))
+                        self.assertTrue(numpy.array_equal(data.ds.attrs[name], value))
+                    for name in full.ds.variables:
+                        self.assertEqual(data.ds[name].dims, full.ds[name].dims)
+                        self.assertEqual(data.ds[name].dtype, full.ds[name].dtype)
+                        self.assertEqual(list(data.ds[name].attrs), list(full.ds[name].attrs))
+
+                    full.uc2_check(only=["global_attributes", "dimensions"])
+                    data.uc2_check()
+                    self.assertEqual(data.check_result.to_dict(), full.check_result.to_dict())
+                    self.assertRaises(ValueError, data.uc2_check, only=["variables"])
+
+            not_nc = Path(tmp) / "text.nc"
+            not_nc.write_text("no NetCDF file")
+            self.assertRaises(ValueError, Dataset.from_header, not_nc)
+            self.assertRaises(ValueError, Dataset, not_nc)
+
+    def test_plan_names(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            for src, dst in [("grid.nc", "a.nc"), ("grid.nc", "b.nc"), ("timeSeries.nc", "c.nc")]:
+                (tmp / dst).write_bytes((self.file_dir / src).read_bytes())
+            (tmp / "d.nc").write_text("no NetCDF file")
+
+            plan = plan_names(sorted(tmp.iterdir()), workers=2)
+            self.assertEqual([i.path.name for i in plan], ["a.nc", "b.nc", "c.nc", "d.nc"])
+            self.assertEqual(plan[0].target, plan[1].target)
+            self.assertIsNone(plan[3].target)
+            self.assertFalse(plan[3].result)
+
+            data = Dataset(tmp / "c.nc")
+            self.assertEqual(plan[2].target.name, data.filename)
+            self.assertIsNone(data.check_result)  # filename did not run uc2_check
+
+            collisions = find_collisions(plan)
+            self.assertEqual(list(collisions.values()), [[tmp / "a.nc", tmp / "b.nc"]])
+            renamed, failed = apply_renames(plan, collisions)
+            self.assertEqual(renamed, [(tmp / "c.nc", plan[2].target)])
+            self.assertEqual(list(failed), [tmp / "a.nc", tmp / "b.nc"])
+            self.assertTrue(plan[2].target.exists())
+            self.assertFalse((tmp / "c.nc").exists())
+
+            # never replaces existing files
+            (tmp / "e.nc").write_bytes(plan[2].target.read_bytes())
+            plan = plan_names([tmp / "e.nc"])
+            self.assertEqual(list(find_collisions(plan).values()), [[plan[0].target, tmp / "e.nc"]])
+            self.assertEqual(apply_renames(plan)[0], [])
+
+    def test_array_cache(self):
+        for fn in ["grid", "timeSeries", "timeSeriesProfile", "trajectory"]:
+            fn = self.file_dir / (fn + ".nc")
+            data = Dataset(fn)
+            data.uc2_check()
+            data.get_bounds()
+            self.assertEqual(set(data._cache.loads.values()), {1})  # every array is read only once
+
+            uncached = Dataset(fn, cache_size=0)
+            uncached.uc2_check()
+            self.assertEqual(uncached._cache.nbytes, 0)
+            self.assertEqual(uncached.check_result.to_dict(), data.check_result.to_dict())
+
+        cache = _ArrayCache(16)
+        for key in ["a", "b", "a", "c"]:
+            cache.get(key, lambda: numpy.zeros(1))  # 8 bytes each
+        self.assertEqual(list(cache._items), ["a", "c"])  # b was used least recently
+        self.assertEqual(cache.loads["a"], 1)
+
+        # different keys are loaded at the same time, the same key only once
+        barrier = threading.Barrier(2, timeout=5)
+
+        def load():
+            barrier.wait()
+            time.sleep(0.1)
+            return numpy.zeros(1)
+
+        cache = _ArrayCache(16)
+        threads = [threading.Thread(target=cache.get, args=(key, load)) for key in ["a", "b"]]
+        threads.append(threading.Thread(target=cache.get, args=("a", load)))
+        for i in threads:
+            i.start()
+        for i in threads:
+            i.join()
+        self.assertFalse(barrier.broken)
+        self.assertEqual(cache.loads, {"a": 1, "b": 1})
+
+    def test_metadata_snapshot(self):
+        data = Dataset(self.file_dir / "timeSeries.nc")
+        self.assertEqual(list(data.metadata.variables), list(data.ds.variables))
+        self.assertEqual(dict(data.metadata.dims), dict(data.ds.dims))
+        for name, var in data.ds.variables.items():
+            self.assertEqual(data.metadata[name].dims, var.dims)
+            self.assertEqual(data.metadata[name].shape, var.shape)
+            self.assertEqual(data.metadata[name].dtype, var.dtype)
+            self.assertEqual(list(data.metadata[name].attrs), list(var.attrs))
+        self.assertEqual(data.metadata.site, data.ds.site)
+        with self.assertRaises(TypeError):
+            data.metadata.attrs["site"] = "somewhere"
+        with self.assertRaises(TypeError):
+            data.metadata["time"].attrs["units"] = "days"
+
+    def test_close(self):
+        def open_files():
+            return len(os.listdir("/proc/self/fd")) if os.path.isdir("/proc/self/fd") else 0
+
+        with tempfile.TemporaryDirectory() as tmp:
+            nc3 = Path(tmp) / "grid.nc"
+            copy_as(self.file_dir / "grid.nc", nc3, "NETCDF3_64BIT_OFFSET")
+            paths = [self.file_dir / "grid.nc", self.file_dir / "timeSeries.nc", nc3]
+
+            before = open_files()
+            for _ in range(20):
+                for path in paths:
+                    with Dataset(path) as data:
+                        data.uc2_check()
+                    self.assertTrue(data.check_result)
+                    self.assertIn("site", data.metadata.attrs)
+                    data.close()  # closing twice is fine
+            self.assertEqual(open_files(), before)
+
+            data = Dataset.from_bytes((self.file_dir / "grid.nc").read_bytes())
+            data.close()
+            data.close()
+
+    def test_chunk_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            compressed = Path(tmp) / "grid.nc"
+            with xarray.open_dataset(self.file_dir / "grid.nc", decode_cf=False, mask_and_scale=False) as ds:
+                ds.to_netcdf(compressed, encoding={k: {"zlib": True} for k, v in ds.variables.items()
+                                                   if v.ndim > 0 and v.dtype.kind in "biuf"})
+
+            with Dataset(compressed, chunk_cache=None) as default:
+                default.uc2_check()
+                library_default = default._store.ds["ta"].get_var_chunk_cache()
+            for chunk_cache in ["auto", 1024, {"ta": 2048}]:
+                for chunks in [None, 1]:
+                    with Dataset(compressed, chunks=chunks, chunk_cache=chunk_cache) as data:
+                        data.uc2_check()
+                        self.assertEqual(data.check_result.to_dict(), default.check_result.to_dict())
+                        # the cache is only set while the variable is read
+                        self.assertEqual(data._store.ds["ta"].get_var_chunk_cache(), library_default)
+                        blocks = data.iter_blocks("ta", block_len=1)
+                        next(blocks)
+                        size = data._store.ds["ta"].get_var_chunk_cache()[0]
+                        self.assertNotEqual(size, library_default[0])
+                        if chunk_cache != "auto":
+                            self.assertEqual(size, chunk_cache if isinstance(chunk_cache, int) else 2048)
+                        # a second reader of the same variable (e.g. another thread) keeps the cache
+                        others = data.iter_blocks("ta", block_len=1)
+                        next(others)
+                        blocks.close()
+                        self.assertEqual(data._store.ds["ta"].get_var_chunk_cache()[0], size)
+                        others.close()
+                        self.assertEqual(data._store.ds["ta"].get_var_chunk_cache(), library_default)
+
     def test_nonsense_fails(self):
         fn = self.file_dir / "nonsense.nc"
         data = Dataset(fn)
@@ -57,5 +386,377 @@ class TestCheckResult(unittest.TestCase):
         self.assertFalse(data.check_result)
 
 
+class TestImport(unittest.TestCase):
+
+    repo_dir = Path(__file__).parent.parent
+
+    def run_python(self, *args):
+        """
+        Runs python in the repository with the repository on PYTHONPATH, independent of the working directory
+        """
+        path = [str(self.repo_dir)] + ([os.environ["PYTHONPATH"]] if os.environ.get("PYTHONPATH") else [])
+        return subprocess.run([sys.executable] + list(args), check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                              universal_newlines=True, cwd=str(self.repo_dir),
+                              env=dict(os.environ, PYTHONPATH=os.pathsep.join(path)))
+
+    def import_time(self, module):
+        """
+        Returns the cumulative import time of a module in microseconds (python -X importtime)
+        """
+        for line in self.run_python("-X", "importtime", "-c", "import " + module).stderr.splitlines():
+            fields = line.split("|")
+            if len(fields) == 3 and fields[2].strip() == module:
+                return int(fields[1])
+        self.fail("No import time of " + module)
+
+    def test_lazy_imports(self):
+        # the heavy dependencies must not slow down the start of uc2check
+        code = "import sys, uc2data; print(uc2data.__file__); print(' '.join(sorted(sys.modules)))"
+        path, modules = self.run_python("-c", code).stdout.splitlines()
+        self.assertEqual(Path(path).parent, self.repo_dir / "uc2data")
+        for module in ["xarray", "netCDF4", "pyproj", "cfchecker", "urllib.request", "pandas"]:
+            self.assertNotIn(module, modules.split())
+
+        # importing uc2data (including numpy) must be faster than importing xarray alone (see benchmarks)
+        self.assertLess(self.import_time("uc2data"), self.import_time("xarray"))
+
+
+class TestUtils(unittest.TestCase):
+
+    def test_time_steps(self):
+        times = numpy.array([[0, 1800, 3600, -9999, 5400], [0, 1800, 3000, 7200, 9000]])
+        self.assertTrue(time_steps_ok(times[0], 1800))
+        self.assertFalse(time_steps_ok(times, 1800))
+        self.assertTrue(time_steps_ok(times[0, 1:], 1800, previous=0))
+        self.assertFalse(time_steps_ok(times[0, 1:], 1800, previous=100))
+
+    def test_midpoints(self):
+        bounds = numpy.array([[0., 10.], [10., 20.], [20., 40.]])
+        self.assertTrue(midpoints_ok(numpy.array([5., 15., 30.]), bounds))
+        self.assertFalse(midpoints_ok(numpy.array([5., 15., 31.]), bounds))
+        self.assertTrue(midpoints_ok(numpy.array([5, 15, 30]), bounds.astype(int)))
+
+
+class TestCheckMany(unittest.TestCase):
+
+    file_dir = Path(__file__).parent / "test_files"
+
+    def test_check_many(self):
+        files = [self.file_dir / (fn + ".nc") for fn in ["grid", "timeSeries", "timeSeriesProfile", "trajectory"]]
+        files.append(self.file_dir / "does_not_exist.nc")
+        cache = dict()
+
+        res = {path: result for path, result, timing in check_many(files, workers=2, cache=cache)}
+        self.assertEqual(set(res.keys()), set(files))
+        for fn in files[:-1]:
+            self.assertTrue(res[fn])
+        self.assertFalse(res[files[-1]])
+        self.assertEqual(res[files[-1]].result[0].result, ResultCode.FATAL)
+
+        # the second run is served from the cache
+        timings = [timing for path, result, timing in check_many(files[:-1], cache=cache)]
+        self.assertEqual(timings, [0.] * 4)
+
+        # results of a fail-fast check are cached separately
+        timings = [timing for path, result, timing in check_many(files[:1], cache=cache, max_errors=1)]
+        self.assertNotEqual(timings, [0.])
+
+        # a running thread cannot be stopped, so timeouts need worker processes
+        with self.assertRaises(ValueError):
+            next(check_many(files, workers=2, timeout=1.))
+
+
+    @unittest.skipUnless(hasattr(os, "mkfifo") and os.path.exists("/proc/self/statm"), "needs mkfifo and /proc")
+    def test_isolation(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            hangs = Path(tmp) / "hangs.nc"
+            os.mkfifo(str(hangs))  # opening it blocks forever
+            files = [self.file_dir / "grid.nc", hangs, self.file_dir / "trajectory.nc"]
+
+            start = time.perf_counter()
+            res = {path: result for path, result, timing in
+                   check_many(files, workers=2, mode="process", timeout=1., header_only=True)}
+            self.assertLess(time.perf_counter() - start, 10)
+            self.assertTrue(res[files[0]])
+            self.assertTrue(res[files[2]])
+            self.assertEqual(res[hangs].result[0].result, ResultCode.FATAL)
+            self.assertIn("Timed out", res[hangs].result[0].message)
+
+            cache = dict()
+            list(check_many(files[::2], workers=2, mode="process", cache=cache, header_only=True))
+            self.assertEqual([timing for path, result, timing in check_many(files[::2], cache=cache, header_only=True)],
+                             [0., 0.])
+
+            res = list(check_many([hangs], mode="process", max_rss=1, header_only=True))
+            self.assertIn("memory", res[0][1].result[0].message)
+
+            self.assertRaises(ValueError, lambda: list(check_many(files, max_files=1)))  # needs mode="process"
+            for mode in ["thread", "process"]:
+                self.assertRaises(ValueError, lambda: list(check_many(files, workers=0, mode=mode)))
+            self.assertRaises(ValueError, IsolatedPool, 0)
+
+        # workers are replaced after every file
+        pids = set()
+        with IsolatedPool(1, max_files=1) as pool:
+            for fn in ["grid.nc", "timeSeries.nc"]:
+                pool.submit(self.file_dir / fn, header_only=True)
+                pids.add(pool._slots[0].process.pid)
+                results = list()
+                while pool.busy:
+                    results.extend(pool.wait(1.))
+                self.assertTrue(results[0][1])
+        self.assertEqual(len(pids), 2)
+
+    def test_shard(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = list()
+            for i, size in enumerate([100, 90, 50, 40, 30, 30, 20, 10, 10, 0]):
+                paths.append(Path(tmp) / (str(i) + ".nc"))
+                paths[-1].write_bytes(b"x" * size)
+
+            shards = [shard(paths, i, 3, base=tmp) for i in range(3)]
+            self.assertEqual(sorted(sum(shards, [])), sorted(paths))  # every file in exactly one shard
+            self.assertEqual(shards, [shard(reversed(paths), i, 3, base=tmp)[::-1] for i in range(3)])
+            sizes = [sum(i.stat().st_size for i in s) for s in shards]
+            self.assertLessEqual(max(sizes) - min(sizes), 30)
+            self.assertRaises(ValueError, shard, paths, 3, 3)
+
+
+    def test_work_queue(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            queue1 = WorkQueue(tmp, expire=60)
+            queue2 = WorkQueue(tmp, expire=60)
+
+            self.assertTrue(queue1.claim("a.nc"))
+            self.assertFalse(queue2.claim("a.nc"))
+
+            # claims without heartbeat expire
+            claim_file = queue1._claim_path("a.nc")
+            os.utime(claim_file, (time.time() - 120, time.time() - 120))
+            self.assertTrue(queue2.claim("a.nc"))
+            self.assertTrue(queue2.holds("a.nc"))
+            self.assertFalse(queue1.holds("a.nc"))  # queue1 notices that it lost the claim
+            self.assertFalse(queue1.put_result("a.nc", []))
+            self.assertFalse(queue1.done("a.nc"))
+            queue1.release("a.nc")  # does not remove the claim of queue2
+            self.assertTrue(os.path.exists(claim_file))
+
+            queue2.put_result("a.nc", ["Test passed. (ResultCode.OK)"])
+            queue2.release("a.nc")
+            self.assertTrue(queue1.done("a.nc"))
+            self.assertFalse(queue1.claim("a.nc"))
+
+            # every item is handed out once
+            got = list()
+            for i in queue1.items(["a.nc", "b.nc", "c.nc"]):
+                got.append(i)
+                self.assertFalse(queue2.claim(i))
+                queue1.put_result(i, [])
+            self.assertEqual(got, ["b.nc", "c.nc"])
+            self.assertEqual(list(queue2.items(["a.nc", "b.nc", "c.nc"])), [])
+
+            # with hold the claims are kept while further items are taken
+            items = queue1.items(["d.nc", "e.nc"], hold=True)
+            self.assertEqual([next(items), next(items)], ["d.nc", "e.nc"])
+            self.assertFalse(queue2.claim("d.nc"))
+            queue1.release("d.nc")
+            self.assertTrue(queue2.claim("d.nc"))
+            queue1.close()
+            queue2.close()
+
+
+    def test_watch(self):
+        for backend in ["inotify", "poll"] if sys.platform.startswith("linux") else ["poll"]:
+            with tempfile.TemporaryDirectory() as tmp:
+                tmp = Path(tmp)
+                shutil.copy(str(self.file_dir / "grid.nc"), str(tmp / "old.nc"))
+                with DirectoryWatcher(tmp, settle=0.2, poll_interval=0.05, backend=backend) as watcher:
+                    self.assertEqual(watcher.backend, backend)
+                    self.assertEqual(watcher.ready(timeout=0.3), [])  # existing files are not reported
+
+                    with open(str(tmp / "new.nc"), "wb") as f:  # a file that is still being written
+                        f.write(b"CDF")
+                        f.flush()
+                        self.assertEqual(watcher.ready(timeout=0.1), [])
+                    shutil.copy(str(self.file_dir / "grid.nc"), str(tmp / "new.nc"))
+                    self.assertEqual(watcher.ready(timeout=5), [tmp / "new.nc"])
+                    self.assertEqual(watcher.ready(timeout=0.3), [])  # unchanged files are reported once
+
+                for mode, limits in [("thread", {}), ("process", {"timeout": 60., "max_files": 1})]:
+                    cancel = threading.Event()
+                    timer = threading.Timer(30, cancel.set)  # never hang
+                    timer.start()
+                    results = watch_check(tmp, workers=2, mode=mode, cancel=cancel, settle=0.2, poll_interval=0.05,
+                                          backend=backend, **limits)
+                    threading.Timer(0.5, shutil.copy,
+                                    [str(self.file_dir / "trajectory.nc"), str(tmp / (mode + ".nc"))]).start()
+                    path, result, timing = next(results)
+                    cancel.set()
+                    timer.cancel()
+                    self.assertEqual(path, tmp / (mode + ".nc"))
+                    self.assertTrue(result)
+                    self.assertEqual(list(results), [])
+                self.assertRaises(ValueError, lambda: next(watch_check(tmp, timeout=1.)))  # needs mode="process"
+                self.assertRaises(ValueError, lambda: next(watch_check(tmp, workers=0)))
+
+    def test_progress(self):
+        result = CheckResult()
+        result["a"].add(ResultCode.ERROR, "error")
+        result["b"].add(ResultCode.WARNING, "warning")
+
+        out = io.StringIO()
+        progress = Progress(total_files=4, total_bytes=400, stream=out, interval=0)
+        progress.update(100, result)
+        progress.update(100, CheckResult(ResultCode.OK))
+        progress.close()
+
+        lines = [json.loads(i) for i in out.getvalue().splitlines()]
+        self.assertEqual(len(lines), 3)  # not a terminal: one json line per report
+        self.assertEqual(lines[-1]["files"], 2)
+        self.assertEqual(lines[-1]["bytes"], 200)
+        self.assertEqual(lines[-1]["errors"], 1)
+        self.assertEqual(lines[-1]["warnings"], 1)
+        self.assertIsNotNone(lines[-1]["eta_s"])
+
+        progress = Progress(stream=io.StringIO())  # totals unknown, e.g. with a work queue
+        progress.update(100, result)
+        self.assertEqual((progress.errors, progress.warnings), (1, 1))
+        self.assertIsNone(progress.status()["eta_s"])
+
+
+class TestCatalog(unittest.TestCase):
+
+    file_dir = Path(__file__).parent / "test_files"
+
+    def test_catalog(self):
+        broken = CheckResult()
+        broken["crs"]["units"].add(ResultCode.ERROR, "wrong units")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Path(tmp) / "results.sqlite"
+            with Catalog(db, batch_size=2) as catalog:
+                for fn in ["grid.nc", "timeSeries.nc", "trajectory.nc"]:
+                    data = Dataset(self.file_dir / fn)
+                    data.uc2_check()
+                    catalog.add(fn, data.check_result, data.ds.attrs)
+                catalog.add("broken.nc", broken, {"site": "nowhere"})
+                catalog.add("broken.nc", broken, {"site": "somewhere"})  # replaces the first one
+
+            catalog = Catalog(db)
+            self.assertEqual(len(catalog.query(files_only=True, severity="OK")), 3)
+            self.assertEqual(catalog.query(tag="crs", severity="ERROR", site="somewhere"),
+                             [("broken.nc", "crs/units", "ERROR", "wrong units")])
+            self.assertEqual(catalog.query(tag="crs", site="nowhere"), [])
+            self.assertEqual(catalog.query(tag="cr", severity="ERROR"), [])
+            self.assertEqual(catalog.query(message="wrong", files_only=True, severity="ERROR"), ["broken.nc"])
+            self.assertEqual(catalog.query(message="units"), [])
+            catalog.close()
+
+    def test_extents(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = [self.file_dir / fn for fn in ["grid.nc", "timeSeries.nc", "trajectory.nc"]]
+            with ExtentCatalog(Path(tmp) / "extents.sqlite") as catalog:
+                failed = catalog.build(paths + [Path(tmp) / "missing.nc"], workers=2)
+                self.assertEqual(list(failed), [str(Path(tmp) / "missing.nc")])
+
+                extent = file_extent(paths[0])
+                self.assertEqual(extent["featureType"], None)
+                rows = catalog.query()
+                self.assertEqual([i["path"] for i in rows], sorted(str(i) for i in paths))
+                self.assertEqual(rows[0], extent)
+
+                bbox = (extent["min_lon"], extent["min_lat"], extent["max_lon"], extent["max_lat"])
+                self.assertIn(str(paths[0]), [i["path"] for i in catalog.query(bbox=bbox)])
+                self.assertEqual(catalog.query(bbox=(0., 0., 1., 1.)), [])
+                self.assertEqual(catalog.query(start=max(i["end"] for i in rows) + 1), [])
+                self.assertIn(extent, catalog.query(bbox=bbox, start=extent["start"], end=extent["start"]))
+                self.assertNotIn(extent, catalog.query(bbox=bbox, start=extent["end"] + 1))
+                self.assertEqual(catalog.query(site="nowhere"), [])
+                self.assertRaises(ValueError, catalog.query, location="nowhere")
+
+            # files without time have no time span
+            with xarray.open_dataset(paths[0], decode_times=False) as ds:
+                ds.drop_vars("time").to_netcdf(Path(tmp) / "no_time.nc")
+            extent = file_extent(Path(tmp) / "no_time.nc")
+            self.assertEqual((extent["start"], extent["end"]), (None, None))
+
+
+class TestSeries(unittest.TestCase):
+
+    file_dir = Path(__file__).parent / "test_files"
+
+    def month(self, tmp, name, month, first):
+        """
+        Copies the LTO file timeSeries.nc (January 2017, hourly) to another month with times starting at first
+        """
+        path = Path(tmp) / name
+        copy_as(self.file_dir / "timeSeries.nc", path, "NETCDF4")
+        with netCDF4.Dataset(path, "a") as nc:
+            nc.origin_time = "2017-" + month + "-01 00:00:00 +00"
+            nc["time"].units = "seconds since " + nc.origin_time
+            nc["time"][0, :] = first + 3600 * numpy.arange(nc["time"].shape[1])
+        return path
+
+    def test_series(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            files = [self.file_dir / "timeSeries.nc", self.file_dir / "grid.nc", self.month(tmp, "02.nc", "02", 3600)]
+            results = check_series(files)
+            self.assertEqual(list(results), [("LTO", "B", "rothenburg", "TUBklima", "meteo")])
+            self.assertEqual(results[("LTO", "B", "rothenburg", "TUBklima", "meteo")].to_dict(), CheckResult().to_dict())
+
+            for name, first, code, message in [("overlap.nc", 0, ResultCode.ERROR, "Overlap between"),
+                                               ("step.nc", 600, ResultCode.ERROR, "Time step of 600 s"),
+                                               ("gap.nc", 7 * 3600, ResultCode.WARNING, "Gap of 25200 s")]:
+                path = self.month(tmp, name, "02", first)
+                result = list(check_series([path, self.file_dir / "timeSeries.nc"], workers=2).values())[0]
+                self.assertEqual(len(result[name]["time"].result), 1)
+                self.assertEqual(result[name]["time"].result[0].result, code)
+                self.assertIn(message, result[name]["time"].result[0].message)
+
+            result = list(check_series([path, self.file_dir / "timeSeries.nc"], max_gap=10 * 3600).values())[0]
+            self.assertEqual(result.to_dict(), CheckResult().to_dict())
+            self.assertIn(None, check_series([Path(tmp) / "missing.nc"]))
+
+
+class TestNetCDF3(unittest.TestCase):
+
+    file_dir = Path(__file__).parent / "test_files"
+
+    def test_memmap_reads(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for fn in ["grid", "timeSeries", "timeSeriesProfile", "trajectory"]:
+                src = self.file_dir / (fn + ".nc")
+                dst = Path(tmp) / (fn + ".nc")
+                copy_as(src, dst, "NETCDF3_64BIT_OFFSET")
+
+                data = Dataset(dst)
+                self.assertEqual(data.format, "NETCDF3_64BIT_OFFSET")
+                for name in data.ds.variables:
+                    self.assertFalse(data._values(name).flags.writeable)
+                    self.assertTrue(numpy.array_equal(data._values(name), data.ds[name].values))
+
+                data.uc2_check()
+                orig = Dataset(src)
+                orig.uc2_check()
+                self.assertEqual(str(data.check_result), str(orig.check_result))
+
+    def test_record_variables(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            fn = str(Path(tmp) / "records.nc")
+            with netCDF4.Dataset(fn, "w", format="NETCDF3_CLASSIC") as nc:
+                nc.createDimension("time", None)
+                nc.createDimension("x", 3)
+                nc.createVariable("time", "i4", ("time",))[:] = numpy.arange(5) * 1800
+                nc.createVariable("ta", "f4", ("time", "x"))[:] = numpy.arange(15).reshape(5, 3)
+                nc.createVariable("x", "i2", ("x",))[:] = [1, 2, 3]
+
+            header, arrays = netcdf3.open_arrays(fn)
+            self.assertEqual(header.unlimited, "time")
+            self.assertEqual(header.dims["time"], 5)
+            with netCDF4.Dataset(fn) as nc:
+                for name in ["time", "ta", "x"]:
+                    self.assertTrue(numpy.array_equal(arrays[name], nc[name][...]))
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -1,20 +1,26 @@
 from __future__ import annotations
-import pyproj
-import xarray
 import numpy
 import csv
 import re
 import calendar
-import netCDF4
 import importlib
+import itertools
 import pathlib
-import urllib.request
 import os
-if os.name != 'nt':
-    from cfchecker import cfchecks
+import threading
+import collections
+import concurrent.futures
+import contextlib
+import tempfile
+from collections import OrderedDict
 from cached_property import cached_property
-from .utils import check_type, check_person_field, compare_utms
+from .utils import check_type, check_person_field, compare_utms, max_utm_diff, utm_diff_result, time_steps_ok, \
+    midpoints_ok
 from .Result import ResultCode, CheckResult
+from . import netcdf3
+from . import header
+
+# xarray, netCDF4, pyproj and cfchecker take long to import. They are imported where they are needed.
 
 libpath = pathlib.Path(importlib.import_module("uc2data").__file__)
 respath = libpath.parent / "resources"
@@ -24,6 +30,138 @@ institutions_file = respath / "uc2_table_A3.csv"
 data_content_file = respath / "uc2_table_A2.csv"
 sites_file = respath / "uc2_table_A4.csv"
 
+# The netCDF4/HDF5 libraries are not thread-safe. All opening, reading and closing of files is done with this lock.
+nc_lock = threading.RLock()
+
+
+table_urls = {
+    variables_file: "http://www.uc2-program.org/uc2_table_A1.csv",
+    data_content_file: "http://www.uc2-program.org/uc2_table_A2.csv",
+    institutions_file: "http://www.uc2-program.org/uc2_table_A3.csv",
+    sites_file: "http://www.uc2-program.org/uc2_table_A4.csv",
+}
+_tables_lock = threading.Lock()
+_tables_downloaded = False
+
+
+def _read_table(table_file):
+    """
+    Returns the rows of a tab separated table file
+
+    Before the first table is read, the newest versions of the tables are downloaded (if possible).
+    """
+
+    global _tables_downloaded
+    with _tables_lock:
+        if not _tables_downloaded:
+            import urllib.request
+            for i_file, url in table_urls.items():
+                try:
+                    urllib.request.urlretrieve(url, i_file)
+                except Exception:
+                    pass
+            _tables_downloaded = True
+
+    with open(table_file, encoding="utf-8") as csvfile:
+        return list(csv.reader(csvfile, delimiter='\t', quotechar='"'))
+
+
+class _LazyTable:
+    """
+    Class attribute of Dataset that is loaded on first access
+
+    The loaded value replaces this object in the class, so it is loaded only once.
+    """
+
+    def __init__(self, load):
+        self.load = load
+
+    def __set_name__(self, owner, name):
+        self.owner = owner
+        self.name = name
+
+    def __get__(self, instance, owner):
+        value = self.load()
+        setattr(self.owner, self.name, value)
+        return value
+
+
+class _ArrayCache:
+    """
+    Least recently used cache of numpy arrays with a limit of their total size in bytes
+
+    Used by Dataset so that the checks read every variable only once. Thread-safe. Arrays are loaded outside the
+    lock, so threads can read different variables at the same time. Threads that need a value that is being loaded
+    wait for it, so a value is never loaded twice at the same time.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.loads = collections.Counter()  # key -> number of times it was loaded
+        self._items = OrderedDict()
+        self._loading = dict()  # key -> concurrent.futures.Future of a value that is being loaded
+        self._lock = threading.Lock()
+
+    def get(self, key, load):
+        """
+        Returns the cached value of key. If there is none, it is loaded with load() and cached if it fits.
+        """
+
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+            loading = self._loading.get(key)
+            if loading is None:
+                self._loading[key] = future = concurrent.futures.Future()
+        if loading is not None:
+            return loading.result()  # loaded by another thread. Raises its exception if loading failed.
+
+        try:
+            value = load()
+        except BaseException as e:
+            with self._lock:
+                del self._loading[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._loading[key]
+            self.loads[key] += 1
+            nbytes = getattr(value, "nbytes", 0)
+            if nbytes <= self.max_bytes:
+                self._items[key] = value
+                self.nbytes += nbytes
+                while self.nbytes > self.max_bytes:
+                    _, old = self._items.popitem(last=False)
+                    self.nbytes -= getattr(old, "nbytes", 0)
+        future.set_result(value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.nbytes = 0
+
+
+def _prime_at_least(n):
+    """
+    Returns the smallest prime number >= n (number of slots of the HDF5 chunk cache)
+    """
+
+    n = max(2, int(n))
+    while any(n % i == 0 for i in range(2, int(n ** 0.5) + 1)):
+        n += 1
+    return n
+
+
+class _ErrorBudgetExceeded(Exception):
+    """
+    Raised within uc2_check to stop checking after the maximum number of errors
+    """
+    pass
+
 
 class Dataset:
     """
@@ -37,6 +175,8 @@ class Dataset:
         The results of a call to Dataset.uc2_check
     ds : xarray.Dataset
         The representation of the data
+    metadata : header.Header
+        Read-only snapshot of the metadata of ds that is used by the checks
 
     Methods
     -------
@@ -70,62 +210,33 @@ class Dataset:
 
     allowed_featuretypes = ["timeSeries", "timeSeriesProfile", "trajectory"]
 
-    # try to download newest versions of the table files
-    try:
-        urllib.request.urlretrieve('http://www.uc2-program.org/uc2_table_A1.csv', variables_file)
-    except Exception:
-        pass
-    try:
-        urllib.request.urlretrieve('http://www.uc2-program.org/uc2_table_A2.csv', data_content_file)
-    except Exception:
-        pass
-    try:
-        urllib.request.urlretrieve('http://www.uc2-program.org/uc2_table_A3.csv', institutions_file)
-    except Exception:
-        pass
-    try:
-        urllib.request.urlretrieve('http://www.uc2-program.org/uc2_table_A4.csv', sites_file)
-    except Exception:
-        pass
-
-    allowed_aggregations = dict()
-    with open(aggregations_file, encoding="utf-8") as csvfile:
-        spamreader = csv.reader(csvfile, delimiter='\t', quotechar='"')
-        for row in spamreader:
-            allowed_aggregations[row[1]] = row[2]
-
-    allowed_data_contents = list()
-    with open(data_content_file, encoding="utf-8") as csvfile:
-        spamreader = csv.reader(csvfile, delimiter='\t', quotechar='"')
-        for row in spamreader:
-            allowed_data_contents.append(row[1])
-
-    allowed_variables = dict()
-    with open(variables_file, encoding="utf-8") as csvfile:
-        spamreader = csv.reader(csvfile, delimiter='\t', quotechar='"')
-        for row in spamreader:
-            allowed_variables[row[3]] = {
-                "long_name": row[0],
-                "standard_name": row[1]
-            }
-
-    allowed_institutions = []
-    allowed_acronyms = []
-    with open(institutions_file, encoding="utf-8") as csvfile:
-        spamreader = csv.reader(csvfile, delimiter='\t', quotechar='"')
-        for row in spamreader:
-            allowed_institutions.append(row[0])  # german name
-            allowed_acronyms.append(row[1])
-            allowed_institutions.append(row[2])  # english name
-            allowed_acronyms.append(row[1])
-
-    allowed_locations = []
-    allowed_sites = []
-    with open(sites_file, encoding="utf-8") as csvfile:
-        spamreader = csv.reader(csvfile, delimiter='\t', quotechar='"')
-        for row in spamreader:
-            allowed_locations.append(row[0])
-            allowed_sites.append(row[1])
+    # global attributes that make up the canonical filename (in this order)
+    filename_attributes = ["campaign", "location", "site", "acronym", "data_content", "data_specifier", "origin_time",
+                           "version"]
+
+    # Groups of checks run by uc2_check in this order.
+    # method: method of Dataset that runs the checks
+    # requires: groups whose results are used by the checks (must be listed before)
+    # cheap: True if only metadata is needed
+    check_groups = OrderedDict([
+        ("cf", {"method": "cf_check", "requires": [], "cheap": False}),
+        ("global_attributes", {"method": "check_all_glob_attr", "requires": [], "cheap": True}),
+        ("dimensions", {"method": "check_dims", "requires": [], "cheap": True}),
+        ("variables", {"method": "_check_all_vars", "requires": ["global_attributes"], "cheap": False}),
+        ("coordinates", {"method": "check_coordinates", "requires": ["global_attributes", "variables"],
+                         "cheap": False}),
+    ])
+
+    # The tables are read from the table files on first access (see _LazyTable)
+    allowed_aggregations = _LazyTable(lambda: {row[1]: row[2] for row in _read_table(aggregations_file)})
+    allowed_data_contents = _LazyTable(lambda: [row[1] for row in _read_table(data_content_file)])
+    allowed_variables = _LazyTable(lambda: {row[3]: {"long_name": row[0], "standard_name": row[1]}
+                                            for row in _read_table(variables_file)})
+    # german and english names of the institutions have the same acronym
+    allowed_institutions = _LazyTable(lambda: [row[i] for row in _read_table(institutions_file) for i in [0, 2]])
+    allowed_acronyms = _LazyTable(lambda: [row[1] for row in _read_table(institutions_file) for i in [0, 2]])
+    allowed_locations = _LazyTable(lambda: [row[0] for row in _read_table(sites_file)])
+    allowed_sites = _LazyTable(lambda: [row[1] for row in _read_table(sites_file)])
 
     allowed_licences = [
         "",
@@ -141,7 +252,17 @@ class Dataset:
         "[UC]2 Open Licence; see [UC]2 data policy available at www.uc2-program.org/uc2_data_policy.pdf",
     ]
 
-    def __init__(self, path):
+    # variables larger than this (in bytes) are read block by block by the checks if chunks="auto"
+    chunk_threshold = 256 * 1024 ** 2
+
+    # upper limit (in bytes) of the HDF5 chunk cache of a variable while it is read if chunk_cache="auto"
+    chunk_cache_limit = 256 * 1024 ** 2
+
+    # default maximum size (in bytes) of the arrays and fill masks that are kept in memory, so that the checks read
+    # each variable only once
+    cache_size = 256 * 1024 ** 2
+
+    def __init__(self, path, chunks="auto", var_workers=1, cache_size=None, chunk_cache="auto"):
         """
         returns a Dataset object
 
@@ -149,13 +270,251 @@ class Dataset:
         ----------
         path : str or pathlib.Path
             The path of the file to be read
+        chunks : str, int or None
+            How the checks read the data of variables.
+            "auto": variables larger than Dataset.chunk_threshold bytes are read block by block along their first
+            dimension. Blocks consist of whole storage chunks of the file. Smaller variables are read at once.
+            int: all variables are read in blocks of this many entries along their first dimension.
+            None: all variables are read at once.
+        var_workers : int
+            Number of threads that check data variables at the same time. Default: 1 (no threads)
+        cache_size : int, optional
+            Maximum size in bytes of the data and fill masks that are kept in memory while checking. The least
+            recently used arrays are dropped first. 0 disables the cache. Default: Dataset.cache_size
+        chunk_cache : str, int, dict or None
+            Size in bytes of the HDF5 chunk cache used when reading a chunked (e.g. compressed) NetCDF4 variable.
+            "auto": large enough for all chunks that share the same position along the first dimension (at most
+            Dataset.chunk_cache_limit), so that reading block by block decompresses every chunk only once.
+            The cache is only set while a variable is read, so at most one large cache per thread is allocated.
+            int: this size for all variables.
+            dict: variable name -> "auto", int or None. Variables not listed use "auto".
+            None: the default of the netCDF library.
         """
 
+        self._init_attributes(path, chunks, var_workers, cache_size, chunk_cache)
+
+        # reject other files by their magic bytes before the expensive open
+        self.format = header.sniff(self.path)
+        if self.format is None:
+            raise ValueError("'" + str(self.path) + "' is not a NetCDF file.")
+
+        import xarray
+
+        # decode and mask are False for checking file without xarray's interpretation
+        # The store gives access to the netCDF4 variables to set their chunk cache.
+        # cache is False, because arrays are cached in _ArrayCache with a limit of cache_size bytes.
+        with nc_lock:
+            self._store = xarray.backends.NetCDF4DataStore.open(str(self.path), lock=nc_lock)
+            self.ds = xarray.open_dataset(self._store, decode_cf=False, mask_and_scale=False, cache=False)
+
+        # NetCDF3 files store variables contiguously. Their data is read directly from a memory map.
+        if self.format.startswith("NETCDF3"):
+            self._arrays = netcdf3.open_arrays(self.path)[1]
+
+    def _init_attributes(self, path, chunks, var_workers, cache_size=None, chunk_cache="auto"):
         self.path = path
+        self.chunks = chunks
+        self.var_workers = var_workers
+        self.chunk_cache = chunk_cache
         self.check_result = None
+        self.max_errors = None
+        self.truncated = False
+        self.format = None
+        self._arrays = dict()
+        self._memory = None  # content of the file if it was created from bytes
+        self._source = None  # the original xarray.Dataset if it was created from one
+        self._nc = None  # netCDF4.Dataset in memory if there is no file
+        self._header = None  # header.Header if only the header was read
+        self._store = None  # xarray's NetCDF4DataStore of ds
+        self._chunk_cache_users = dict()  # varname -> [number of reads, netCDF4.Variable, previous chunk cache]
+        self._cache = _ArrayCache(self.cache_size if cache_size is None else cache_size)
+
+    @classmethod
+    def from_bytes(cls, buf, chunks="auto", var_workers=1, cache_size=None, chunk_cache="auto"):
+        """
+        returns a Dataset object for a NetCDF file in memory
 
-        # decode and mask are False for checking file without xarray's interpretation
-        self.ds = xarray.open_dataset(self.path, decode_cf=False, mask_and_scale=False)
+        Parameters
+        ----------
+        buf : bytes-like
+            The complete content of a NetCDF file (NetCDF3 or NetCDF4)
+        chunks : str, int or None
+            see Dataset
+        var_workers : int
+            see Dataset
+        cache_size : int, optional
+            see Dataset
+        chunk_cache : str, int, dict or None
+            see Dataset
+
+        Returns
+        -------
+        Dataset
+
+        """
+
+        import netCDF4
+        import xarray
+
+        out = cls.__new__(cls)
+        out._init_attributes(None, chunks, var_workers, cache_size, chunk_cache)
+        out._memory = buf
+
+        with nc_lock:
+            out._nc = netCDF4.Dataset("inmemory.nc", memory=buf)
+            out._store = xarray.backends.NetCDF4DataStore(out._nc, lock=nc_lock)
+            out.ds = xarray.open_dataset(out._store, decode_cf=False, mask_and_scale=False, cache=False)
+
+        out.format = netcdf3.formats.get(bytes(buf[:4]))
+        if out.format is not None and out.format.startswith("NETCDF3"):
+            out._arrays = netcdf3.arrays(buf)
+        return out
+
+    @classmethod
+    def from_header(cls, path):
+        """
+        returns a Dataset object that only reads the header of a NetCDF file
+
+        No data is read and xarray is not used. ds is a header.Header with the global attributes, dimensions and
+        variable attributes. uc2_check only runs the check groups that need no data (global attributes and
+        dimensions), which is much faster for validating the metadata of many files.
+
+        Parameters
+        ----------
+        path : str or pathlib.Path
+            The path of the file to be read
+
+        Returns
+        -------
+        Dataset
+
+        Raises
+        ------
+        ValueError
+            If the file is not a NetCDF file
+
+        """
+
+        out = cls.__new__(cls)
+        out._init_attributes(path, None, 1)
+        out._header = header.read_header(path)
+        out.ds = out._header
+        out.format = out._header.format
+        return out
+
+    @property
+    def header_only(self):
+        """
+        True if only the header of the file was read (see from_header)
+        """
+
+        return self._header is not None
+
+    @classmethod
+    def from_xarray(cls, ds, chunks="auto", var_workers=1, cache_size=None, chunk_cache="auto"):
+        """
+        returns a Dataset object for an xarray.Dataset in memory
+
+        The dataset is written to a NetCDF4 dataset in memory the same way as xarray.Dataset.to_netcdf writes a
+        file (e.g. times are converted to numbers and _FillValue becomes an attribute). So the results are the same
+        as for the file written by to_netcdf.
+
+        Parameters
+        ----------
+        ds : xarray.Dataset
+            The dataset to check
+        chunks : str, int or None
+            see Dataset
+        var_workers : int
+            see Dataset
+        cache_size : int, optional
+            see Dataset
+        chunk_cache : str, int, dict or None
+            see Dataset
+
+        Returns
+        -------
+        Dataset
+
+        """
+
+        import netCDF4
+        import xarray
+
+        out = cls.__new__(cls)
+        out._init_attributes(None, chunks, var_workers, cache_size, chunk_cache)
+        out._source = ds
+
+        # write to a NetCDF4 dataset that lives in memory only. This encodes the variables exactly like to_netcdf.
+        with nc_lock:
+            out._nc = netCDF4.Dataset("inmemory-" + str(id(out)) + ".nc", "w", diskless=True, persist=False)
+            out._store = xarray.backends.NetCDF4DataStore(out._nc, lock=nc_lock)
+            ds.dump_to_store(out._store, unlimited_dims=ds.encoding.get("unlimited_dims"))
+            out.ds = xarray.open_dataset(out._store, decode_cf=False, mask_and_scale=False, cache=False)
+        return out
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        Closes the file and frees the cached data
+
+        The results (check_result) and the metadata snapshot (metadata) stay available. Data can not be read any
+        more. Use the Dataset as context manager to close it automatically:
+
+        >>> with uc2data.Dataset(path) as ds:
+        ...     ds.uc2_check()
+        """
+
+        with nc_lock:
+            self.ds.close()
+            if self._nc is not None and self._nc.isopen():
+                self._nc.close()
+        self._arrays = dict()  # the memory map of NetCDF3 files is unmapped when no array uses it any more
+        self._cache.clear()
+
+    @contextlib.contextmanager
+    def _file_path(self):
+        """
+        Yields the path of the file for tools that can only read files
+
+        Datasets in memory are written to a temporary file, on tmpfs (/dev/shm) if available.
+        The file is removed afterwards.
+        """
+
+        if self.path is not None:
+            yield self.path
+            return
+
+        fd, tmp_path = tempfile.mkstemp(suffix=".nc", dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                if self._memory is not None:
+                    f.write(self._memory)
+            if self._memory is None:
+                with nc_lock:
+                    self._source.to_netcdf(tmp_path)
+            yield tmp_path
+        finally:
+            os.remove(tmp_path)
+
+    @cached_property
+    def metadata(self):
+        """
+        Read-only snapshot of the metadata (header.Header): global attributes and dims, shape, dtype and attributes
+        of all variables
+
+        The checks read metadata from here instead of ds, because every access of a variable of the xarray.Dataset
+        creates new objects.
+        """
+
+        if self._header is not None:
+            return self._header
+        return header.snapshot(self.ds, self.format)
 
     @cached_property
     def is_ts(self):
@@ -175,22 +534,22 @@ class Dataset:
 
     @cached_property
     def is_iop(self):
-        if "campaign" in self.ds.attrs:
-            return self.ds.campaign[:3] == "IOP"
+        if "campaign" in self.metadata.attrs:
+            return self.metadata.campaign[:3] == "IOP"
         else:
             return False
 
     @cached_property
     def is_lto(self):
-        if "campaign" in self.ds.attrs:
-            return self.ds.campaign == "LTO"
+        if "campaign" in self.metadata.attrs:
+            return self.metadata.campaign == "LTO"
         else:
             return False
 
     @cached_property
     def featuretype(self):
-        if "featureType" in self.ds.attrs:
-            return self.ds.featureType
+        if "featureType" in self.metadata.attrs:
+            return self.metadata.featureType
         else:
             return "None"
 
@@ -199,91 +558,446 @@ class Dataset:
         tmp = list()
 
         for var in self.allowed_variables:
-            if var in self.ds.variables:
+            if var in self.metadata.variables:
                 tmp.append(var)
             for agg in self.allowed_aggregations:
-                if var + "_" + agg in self.ds.variables:
+                if var + "_" + agg in self.metadata.variables:
                     tmp.append(var)
 
         return tmp
 
     @cached_property
     def filename(self):
-        attrs = ["campaign", "location", "site", "acronym", "data_content", "data_specifier", "origin_time", "version"]
         vals = list()
 
-        if self.check_result is None:
-            self.uc2_check()
+        # without results of uc2_check only the attributes of the filename are checked
+        check_result = self.check_filename_attributes() if self.check_result is None else self.check_result
 
-        for i in attrs:
-            if not self.check_result[i]:
+        for i in self.filename_attributes:
+            if not check_result[i]:
                 raise Exception(
                     "Cannot parse filename. Global attribute '" + i + "' did not pass UC2 conformity tests.")
 
             if i == "origin_time":
-                vals.append(self.ds.attrs[i][: 10].replace("-", ""))
+                vals.append(self.metadata.attrs[i][: 10].replace("-", ""))
             elif i == "version":
-                vals.append(str(self.ds.attrs[i]).zfill(3))
+                vals.append(str(self.metadata.attrs[i]).zfill(3))
             elif i == "data_specifier":
-                if i in self.ds.attrs.keys():
-                    vals.append(self.ds.attrs[i])
+                if i in self.metadata.attrs.keys():
+                    vals.append(self.metadata.attrs[i])
             else:
-                tmp_val = self.ds.attrs[i].replace("-","_").replace(".","_").replace("/","_").replace("\\","_")
+                tmp_val = self.metadata.attrs[i].replace("-","_").replace(".","_").replace("/","_").replace("\\","_")
                 vals.append(tmp_val)
 
         filename = "-".join(vals) + ".nc"
         return filename
 
 
-    def uc2_check(self):
+    def check_filename_attributes(self):
+        """
+        Checks only the global attributes that the canonical filename is made of (see filename_attributes)
+
+        Only metadata is used, so this is fast (especially for Datasets from from_header). The attribute
+        check_result is not changed.
+
+        Returns
+        -------
+        Dataset.CheckResult: the results with one tag per attribute in filename_attributes
+
+        """
+
+        check_result = self.check_result
+        self.check_result = CheckResult()
+        try:
+            self.check_all_glob_attr()  # the attributes are checked in context, e.g. site must match location
+            checked = self.check_result
+        finally:
+            self.check_result = check_result
+
+        out = CheckResult()
+        for i in self.filename_attributes:
+            if len(checked[i].result) == 0 and len(checked[i]) == 0:
+                out[i].add(ResultCode.ERROR, "Global attribute '" + i + "' was not checked because of errors in " +
+                                             "global attribute 'featureType'.")
+            else:
+                out[i].add(checked[i])
+        return out
+
+    def _block_len(self, varname):
+        """
+        Returns the number of entries along the first dimension of a variable that are read at once by the checks
+
+        Returns None for scalar variables.
+        """
+
+        var = self.ds.variables[varname]
+        if var.ndim == 0:
+            return None
+        if var.shape[0] == 0 or self.chunks is None:
+            return max(1, var.shape[0])
+        if self.chunks != "auto":
+            return int(self.chunks)
+        if var.nbytes <= self.chunk_threshold:
+            return var.shape[0]
+
+        # use as many whole storage chunks along the first dimension as fit into chunk_threshold
+        chunksizes = var.encoding.get("chunksizes")
+        step = chunksizes[0] if chunksizes else 1
+        rows = self.chunk_threshold // max(1, var.nbytes // var.shape[0])
+        return max(step, rows // step * step)
+
+    def iter_blocks(self, varname, block_len=None):
+        """
+        Iterates over the data of a variable block by block along its first dimension
+
+        Only one block at a time is held in memory. Scalar variables are returned as one block.
+
+        Parameters
+        ----------
+        varname : str
+            name of the variable
+        block_len : int, optional
+            number of entries along the first dimension per block. Default: as given by the chunks attribute.
+            Pass the same block_len to iterate over multiple variables with the same first dimension in lockstep.
+
+        Yields
+        ------
+        numpy.ndarray: consecutive blocks of the variable's data
+
+        """
+
+        var = self.ds.variables[varname]
+        if block_len is None:
+            block_len = self._block_len(varname)
+        if block_len is None or var.ndim == 0 or var.shape[0] <= block_len:
+            yield self._values(varname)  # all at once (cached)
+            return
+        data = self._arrays.get(varname)  # read-only memory map of NetCDF3 files
+        if data is not None:
+            for start in range(0, var.shape[0], block_len):
+                yield data[start:start + block_len]
+            return
+        with self._chunk_cache(varname):
+            for start in range(0, var.shape[0], block_len):
+                yield var[start:start + block_len].values
+
+    def iter_blocks_masked(self, varname, fill_value=-9999, block_len=None):
+        """
+        Like iter_blocks, but yields every block together with its fill mask (block == fill_value)
+
+        The masks of variables that are read at once are cached like their data.
+        """
+
+        var = self.metadata.variables[varname]
+        if block_len is None:
+            block_len = self._block_len(varname)
+        if block_len is None or var.ndim == 0 or var.shape[0] <= block_len:
+            yield self._values(varname), self._fill_mask(varname, fill_value)
+            return
+        for block in self.iter_blocks(varname, block_len):
+            yield block, numpy.asarray(block == fill_value)
+
+    def _values(self, varname):
+        """
+        Returns all data of a variable. For NetCDF3 files this is a read-only view of the memory mapped file.
+
+        Other data is cached (see cache_size). The returned arrays must not be modified.
+        """
+
+        if varname in self._arrays:
+            return self._arrays[varname]
+
+        def load():
+            with self._chunk_cache(varname):
+                return self.ds.variables[varname].values
+
+        return self._cache.get(varname, load)
+
+    @contextlib.contextmanager
+    def _chunk_cache(self, varname):
+        """
+        Sets the HDF5 chunk cache of a variable while it is read (see chunk_cache)
+
+        HDF5 keeps the chunk cache of a variable allocated until the file is closed. The previous cache is restored
+        afterwards, so only the variables that are being read hold a large cache. If several threads read the same
+        variable, the cache is set by the first and restored by the last one.
+        """
+
+        with nc_lock:
+            users = self._chunk_cache_users.get(varname)
+            if users is not None:
+                users[0] += 1
+            else:
+                restore = self._set_chunk_cache(varname)
+                if restore is not None:
+                    users = self._chunk_cache_users[varname] = [1, restore[0], restore[1]]
+        try:
+            yield
+        finally:
+            if users is not None:
+                with nc_lock:
+                    users[0] -= 1
+                    if users[0] == 0:
+                        del self._chunk_cache_users[varname]
+                        try:
+                            users[1].set_var_chunk_cache(*users[2])
+                        except RuntimeError:
+                            pass  # the file was closed in the meantime
+
+    def _set_chunk_cache(self, varname):
+        """
+        Sets the HDF5 chunk cache of a chunked NetCDF4 variable before it is read (see chunk_cache)
+
+        The cache is set before every read, because xarray may have reopened the file in the meantime.
+
+        Returns
+        -------
+        tuple: (netCDF4.Variable, its previous (size, nelems, preemption)) or None if the cache was not changed
+
+        """
+
+        size = self.chunk_cache.get(varname, "auto") if isinstance(self.chunk_cache, dict) else self.chunk_cache
+        if size is None or self._store is None:
+            return None
+
+        with nc_lock:
+            var = self._store.ds.variables[varname]
+            chunking = var.chunking()
+            if chunking == "contiguous" or not var.shape or not isinstance(var.dtype, numpy.dtype):
+                return None
+            chunk_bytes = int(numpy.prod(chunking, dtype=numpy.int64)) * var.dtype.itemsize
+            if size == "auto":
+                # all chunks with the same position along the first dimension
+                row = int(numpy.prod([-(-length // chunk) for length, chunk in zip(var.shape[1:], chunking[1:])],
+                                     dtype=numpy.int64))
+                size = max(chunk_bytes, min(row * chunk_bytes, self.chunk_cache_limit))
+            slots = _prime_at_least(max(1009, 10 * (int(size) // max(1, chunk_bytes))))
+            previous = var.get_var_chunk_cache()
+            # preemption 1: chunks that were read completely are dropped first
+            var.set_var_chunk_cache(size=int(size), nelems=slots, preemption=1.)
+        return var, previous
+
+    def _fill_mask(self, varname, fill_value=-9999):
+        """
+        Returns where all data of a variable equals fill_value (cached, must not be modified)
+        """
+
+        try:
+            key = (varname, "fill", fill_value)
+            hash(key)
+        except TypeError:  # e.g. a _FillValue attribute with several values
+            return numpy.asarray(self._values(varname) == fill_value)
+        return self._cache.get(key, lambda: numpy.asarray(self._values(varname) == fill_value))
+
+    def _all_finite(self, varname):
+        """
+        Returns True if all values of a variable are finite. Raises TypeError for non-numeric variables.
+        """
+
+        return all(numpy.all(numpy.isfinite(block)) for block in self.iter_blocks(varname))
+
+    def _contains(self, varname, value):
+        """
+        Returns True if a numeric variable contains value anywhere
+        """
+
+        if self.metadata.variables[varname].dtype.kind not in "biuf":
+            return False
+        return any(numpy.any(mask) for _, mask in self.iter_blocks_masked(varname, value))
+
+    def min_max(self, varname, fill_value=None):
+        """
+        Returns minimum and maximum of a variable ignoring fill_value
+
+        The variable is read block by block (see iter_blocks).
+
+        Parameters
+        ----------
+        varname : str
+            name of the variable
+        fill_value : optional
+            entries equal to this value are ignored
+
+        Returns
+        -------
+        tuple: (minimum, maximum) or (None, None) if there is no other value than fill_value
+
+        """
+
+        this_min = None
+        this_max = None
+        blocks = self.iter_blocks(varname) if fill_value is None else \
+            (block[~fill] for block, fill in self.iter_blocks_masked(varname, fill_value))
+        for block in blocks:
+            if block.size == 0:
+                continue
+            block_min = block.min()
+            block_max = block.max()
+            if this_min is None or block_min < this_min:
+                this_min = block_min
+            if this_max is None or block_max > this_max:
+                this_max = block_max
+        return this_min, this_max
+
+    def _is_sorted(self, varname, axis, decrease_sort_allowed):
+        """
+        Returns True if a variable is sorted along an axis. -9999 is sorted as if it was larger than all other values.
+
+        If decrease_sort_allowed, the variable may also be sorted in descending order.
+        """
+
+        def violations(this, following, this_fill, following_fill, descending):
+            if descending:
+                return numpy.any((~this_fill & following_fill) |
+                                 (~this_fill & ~following_fill & (this < following)))
+            return numpy.any((this_fill & ~following_fill) |
+                             (~this_fill & ~following_fill & (this > following)))
+
+        ascending = True
+        descending = decrease_sort_allowed
+        last = None  # last entry along axis of the previous block (only if the blocks are split along axis)
+        for block, fill in self.iter_blocks_masked(varname):
+            first = [slice(None)] * block.ndim
+            second = [slice(None)] * block.ndim
+            first[axis] = slice(0, -1)
+            second[axis] = slice(1, None)
+            pairs = [(block[tuple(first)], block[tuple(second)], fill[tuple(first)], fill[tuple(second)])]
+            if axis == 0 and block.shape[0] > 0:
+                if last is not None:
+                    pairs.append((last, block[0], last == -9999, fill[0]))
+                last = block[-1]
+
+            for this, following, this_fill, following_fill in pairs:
+                ascending = ascending and not violations(this, following, this_fill, following_fill, False)
+                descending = descending and not violations(this, following, this_fill, following_fill, True)
+            if not (ascending or descending):
+                return False
+        return True
+
+    def uc2_check(self, max_errors=None, only=None, skip=None):
         """
         Performs all checks of conformity to the UC2 data standard.
 
         The results will be stored in the attribute check_result.
 
+        Parameters
+        ----------
+        max_errors : int, optional
+            If given, the check stops as soon as this many errors are found. The cheap checks of global attributes
+            and dimensions are done first. If they already failed, the expensive checks (cfchecker and data
+            variables) are skipped. A stopped check is marked by a warning in the tag 'truncated' and the
+            attribute truncated is set to True.
+        only : list, optional
+            Names of the check groups to run (see Dataset.check_groups). Groups these depend on are run as well.
+            Default: all groups
+        skip : list, optional
+            Names of check groups not to run. Groups that depend on a skipped group are skipped as well.
+
         Returns
         -------
         None
 
+        Raises
+        ------
+        ValueError
+            If only requests check groups that need data but only the header was read (see from_header)
+
         """
 
-        self.check_result = CheckResult()
+        groups = self.schedule_groups(only, skip, cheap_only=self.header_only)
 
-        ###
-        # Ensure cf conformance
-        ###
+        self.check_result = CheckResult()
+        self.max_errors = max_errors
+        self.truncated = False
 
-        self.cf_check()
+        if max_errors is not None:
+            # cheap checks first. If they fail, the expensive checks are not needed.
+            groups = [i for i in groups if self.check_groups[i]["cheap"]] + \
+                     [i for i in groups if not self.check_groups[i]["cheap"]]
 
-        ###
-        # Check global attributes
-        ###
+        try:
+            metadata_checked = False
+            for group in groups:
+                if max_errors is not None and not metadata_checked and not self.check_groups[group]["cheap"]:
+                    metadata_checked = True
+                    self._check_error_budget(limit=1)  # metadata is broken. No need to read data.
+
+                getattr(self, self.check_groups[group]["method"])()
+
+                if group == "global_attributes" and not self.check_result["featureType"]:
+                    return  # doesnt make sense to check file with unknown featureType
+                self._check_error_budget()
+
+            # TODO: If all variables have cell_methods with time:point then no time_bounds (and bounds attribute)
+            # TODO: If all variables have cell_methods with z:point then no z_bounds (and bounds attribute)
+            # TODO: parse cell_methods more nicely: allow "lat: time: lon: mean over years z: sum"
+            #       - check if dims have bounds
+        except _ErrorBudgetExceeded:
+            self.truncated = True
+            self.check_result["truncated"].add(ResultCode.WARNING, "Check stopped after " +
+                                               str(self.check_result.count_errors()) + " error(s). " +
+                                               "Remaining checks were skipped.")
+
+    @classmethod
+    def schedule_groups(cls, only=None, skip=None, cheap_only=False):
+        """
+        Returns the names of the check groups to run in the order they have to be run
 
-        self.check_all_glob_attr()
-        if not self.check_result["featureType"]:
-            return  # doesnt make sense to check file with unknown featureType
+        Parameters
+        ----------
+        only : list, optional
+            Names of the requested check groups. Default: all groups.
+            Groups the requested groups depend on are added.
+        skip : list, optional
+            Names of check groups not to run. Groups depending on them are not run either.
+        cheap_only : bool
+            If True, only groups that need no data are returned (for header-only Datasets). It is an error to
+            request other groups with only.
 
-        ###
-        # Check dims
-        ###
+        Returns
+        -------
+        list: names of check groups
 
-        self.check_dims()
+        """
 
-        ###
-        # Check variables
-        ###
+        for name in list(only or []) + list(skip or []):
+            if name not in cls.check_groups:
+                raise ValueError("Unknown check group '" + str(name) + "'. Allowed: " +
+                                 ", ".join(cls.check_groups.keys()))
+
+        selected = set(only) if only else set(cls.check_groups.keys())
+        todo = list(selected)
+        while todo:
+            for dep in cls.check_groups[todo.pop()]["requires"]:
+                if dep not in selected:
+                    selected.add(dep)
+                    todo.append(dep)
+
+        skipped = set(skip or [])
+        for name, group in cls.check_groups.items():  # dependencies always come first in check_groups
+            if any(dep in skipped for dep in group["requires"]):
+                skipped.add(name)
+
+        groups = [name for name in cls.check_groups if name in selected and name not in skipped]
+        if cheap_only:
+            data_groups = [name for name in groups if not cls.check_groups[name]["cheap"]]
+            if only and data_groups:
+                raise ValueError("Check groups " + ", ".join(data_groups) + " need the data of the file, but only " +
+                                 "the header is read.")
+            groups = [name for name in groups if cls.check_groups[name]["cheap"]]
+        return groups
+
+    def check_coordinates(self):
+        """
+        Checks geographic coordinates if the 'crs' variable passed the checks
 
-        self._check_all_vars()
+        The check_result attribute of the Dataset object is updated.
 
-        # TODO: If all variables have cell_methods with time:point then no time_bounds (and bounds attribute)
-        # TODO: If all variables have cell_methods with z:point then no z_bounds (and bounds attribute)
-        # TODO: parse cell_methods more nicely: allow "lat: time: lon: mean over years z: sum"
-        #       - check if dims have bounds
-        # TODO: Make fast check without reading complete arrays?
+        Returns
+        -------
+        None
 
-        ###
-        # Check geo vars
-        ###
+        """
 
         if self.check_result["crs"]:
             self._check_coordinates()
@@ -291,10 +1005,29 @@ class Dataset:
             self.check_result["coordinate_transform"].add(ResultCode.ERROR, "Cannot check geographic coordinates " +
                                                           "because of error in 'crs' variable.")
 
+    def _check_error_budget(self, limit=None):
+        """
+        Stops uc2_check (by raising _ErrorBudgetExceeded) if the number of errors reached max_errors
+
+        Parameters
+        ----------
+        limit : int, optional
+            Use this limit instead of max_errors. Only applies if max_errors is set.
+        """
+
+        if self.max_errors is None:
+            return
+        if limit is None:
+            limit = self.max_errors
+        if self.check_result.count_errors() >= limit:
+            raise _ErrorBudgetExceeded()
+
     def cf_check(self):
         if os.name != 'nt':
+            from cfchecker import cfchecks
             checker = cfchecks.CFChecker(silent=True, version=cfchecks.vn1_7)
-            cfres = checker.checker(str(self.path))
+            with self._file_path() as path:
+                cfres = checker.checker(str(path))
 
             self.check_result['cfchecks'] = CheckResult(ResultCode.OK)
 
@@ -338,10 +1071,10 @@ class Dataset:
         # Check if origin_lon/origin_lat matches origin_x/origin_y
         if all([self.check_result["origin_lon"], self.check_result["origin_lat"], self.check_result["origin_x"],
                 self.check_result["origin_y"]]):
-            e_orig_ll, n_orig_ll = self.geo2utm(self.ds.origin_lon, self.ds.origin_lat)
+            e_orig_ll, n_orig_ll = self.geo2utm(self.metadata.origin_lon, self.metadata.origin_lat)
 
             self.check_result["origin_coords_match"].add(
-                compare_utms(e_orig_ll, n_orig_ll, self.ds.origin_x, self.ds.origin_y))
+                compare_utms(e_orig_ll, n_orig_ll, self.metadata.origin_x, self.metadata.origin_y))
         else:
             self.check_result["origin_coords_match"].add(
                 ResultCode.ERROR, "Cannot check if origin_lon/lat matches origin_x/y because of error "
@@ -356,7 +1089,7 @@ class Dataset:
                       ["lons", "lats", "Es_UTM", "Ns_UTM"]]  # coordinates of surfaces
 
         for i_coord in coord_list:
-            if all(elem in self.ds.variables for elem in i_coord):
+            if all(elem in self.metadata.variables for elem in i_coord):
                 if all(self.check_result[x] for x in i_coord):
                     self.check_result["_".join(i_coord)].add(self._check_geo_vars(*i_coord))
 
@@ -382,34 +1115,46 @@ class Dataset:
 
         """
 
-        x = self.ds[lon_name].values.flatten()
-        y = self.ds[lat_name].values.flatten()
-        if self.ds[lon_name].dims != self.ds[eutm_name].dims:  # "inflate" array to y,x dims
+        # the coordinates are compared block by block along the first dimension of lon
+        block_len = self._block_len(lon_name)
+        lons = self.iter_blocks_masked(lon_name, block_len=block_len)
+        lats = self.iter_blocks_masked(lat_name, block_len=block_len)
+        n_utms = self.iter_blocks_masked(nutm_name, block_len=block_len)
+        inflate = self.metadata[lon_name].dims != self.metadata[eutm_name].dims
+        if inflate:  # "inflate" array to y,x dims
             # this case is for un-rotated grid with E_UTM(x), N_UTM(y), lon(y,x), lat(y,x)
-            e_utm = numpy.tile(self.ds[eutm_name].values, (self.ds[nutm_name].shape[0], 1))
-            n_utm = numpy.tile(self.ds[nutm_name].values, (self.ds[eutm_name].shape[0], 1))
-            n_utm = numpy.transpose(n_utm)
+            e_utms = itertools.repeat((self._values(eutm_name), self._fill_mask(eutm_name)))
         else:
-            e_utm = self.ds[eutm_name].values
-            n_utm = self.ds[nutm_name].values
-        e_utm = e_utm.flatten()
-        n_utm = n_utm.flatten()
-
-        # Check if fill values are at the same spot and remove them prior to comparison
-        xfill = x == -9999
-        yfill = y == -9999
-        e_ut_mfill = e_utm == -9999
-        n_ut_mfill = n_utm == -9999
-        if not numpy.array_equal(xfill, yfill) or \
-                not numpy.array_equal(xfill, e_ut_mfill) or \
-                not numpy.array_equal(xfill, n_ut_mfill):
-            return CheckResult(ResultCode.ERROR, "Coordinates have fill values at different indices: " +
-                               ", ".join([lon_name, lat_name, eutm_name, nutm_name]) +
-                               ". They should be parallel.")
-
-        eutm, nutm = self.geo2utm(x[~xfill], y[~yfill])
-
-        return compare_utms(eutm, nutm, e_utm[~e_ut_mfill], n_utm[~n_ut_mfill])
+            e_utms = self.iter_blocks_masked(eutm_name, block_len=block_len)
+
+        max_diff = 0
+        for (x, xfill), (y, yfill), (n_utm, n_ut_mfill), (e_utm, e_ut_mfill) in zip(lons, lats, n_utms, e_utms):
+            if inflate:
+                e_utm, e_ut_mfill = [numpy.tile(i, (n_utm.shape[0], 1)) for i in [e_utm, e_ut_mfill]]
+                n_utm, n_ut_mfill = [numpy.transpose(numpy.tile(i, (e_utm.shape[1], 1))) for i in [n_utm, n_ut_mfill]]
+            x = x.flatten()
+            y = y.flatten()
+            e_utm = e_utm.flatten()
+            n_utm = n_utm.flatten()
+
+            # Check if fill values are at the same spot and remove them prior to comparison
+            xfill = xfill.flatten()
+            yfill = yfill.flatten()
+            e_ut_mfill = e_ut_mfill.flatten()
+            n_ut_mfill = n_ut_mfill.flatten()
+            if not numpy.array_equal(xfill, yfill) or \
+                    not numpy.array_equal(xfill, e_ut_mfill) or \
+                    not numpy.array_equal(xfill, n_ut_mfill):
+                return CheckResult(ResultCode.ERROR, "Coordinates have fill values at different indices: " +
+                                   ", ".join([lon_name, lat_name, eutm_name, nutm_name]) +
+                                   ". They should be parallel.")
+
+            if numpy.all(xfill):
+                continue
+            eutm, nutm = self.geo2utm(x[~xfill], y[~yfill])
+            max_diff = max(max_diff, max_utm_diff(eutm, nutm, e_utm[~e_ut_mfill], n_utm[~n_ut_mfill]))
+
+        return utm_diff_result(max_diff)
 
     def check_xy(self, xy):
         """
@@ -454,7 +1199,7 @@ class Dataset:
         # standard coordinate?
         elif xy in ["x", "y", "lon", "lat", "E_UTM", "N_UTM"]:
             if self.is_grid:
-                if "ncol" in self.ds.dims:  # pixel-based surfaces
+                if "ncol" in self.metadata.dims:  # pixel-based surfaces
                     dims = ("nrow", "ncol")
                     sort_along = None
                 else:
@@ -572,7 +1317,7 @@ class Dataset:
 
         """
 
-        exists = varname in self.ds.variables
+        exists = varname in self.metadata.variables
         result = CheckResult(ResultCode.OK)
 
         if not exists:
@@ -581,10 +1326,10 @@ class Dataset:
             else:
                 return result
 
-        this_var = self.ds[varname]
+        this_var = self.metadata[varname]
 
         try:
-            if not numpy.all(numpy.isfinite(this_var.values)):
+            if not self._all_finite(varname):
                 result.add(ResultCode.ERROR, "Variable '" + varname + "' contains non-finite values. Not allowed.")
         except TypeError:
             pass  # TypeError (probably) means that isfinite is not applicable to this variable. That's fine.
@@ -599,15 +1344,10 @@ class Dataset:
                            "Found type: " + str(this_var.dtype))
 
         if allowed_range is not None:
-            if "_FillValue" in this_var.attrs:
-                any_value = this_var.values[this_var.values != this_var._FillValue][0]  # the first occurrence of non-FillValue
-                this_tmp = numpy.where(this_var.values == this_var._FillValue, any_value, this_var.values)
-                this_var_min = this_tmp.min()
-                this_var_max = this_tmp.max()
-            else:
-                this_var_min = this_var.min()
-                this_var_max = this_var.max()
-            if (this_var_min < allowed_range[0]) or (this_var_max > allowed_range[1]):
+            this_var_min, this_var_max = self.min_max(varname, this_var.attrs.get("_FillValue"))
+            if this_var_min is None:
+                pass  # only fill values. Nothing to compare.
+            elif (this_var_min < allowed_range[0]) or (this_var_max > allowed_range[1]):
                 result.add(ResultCode.ERROR,
                            "Variable '" + varname + "' is outside allowed range" + str(allowed_range) + ". " +
                            "Found range: [" + str(this_var_min) + "," + str(this_var_max) + "]")
@@ -629,20 +1369,10 @@ class Dataset:
 
         if must_be_sorted_along is not None:
             if must_be_sorted_along in this_var.dims:
-                me = this_var.values.copy()
-                me[me == -9999] = numpy.max(
-                    me) + 1  # fill values must be in the end of array for coordinate variables (sort to end)
-                sorted_arr = numpy.sort(me, axis=this_var.dims.index(must_be_sorted_along))
-
-                if decrease_sort_allowed:
-                    anti_sorted_arr = -numpy.sort(-me, axis=this_var.dims.index(must_be_sorted_along))
-                    if not (numpy.array_equal(me, sorted_arr) or numpy.array_equal(me, anti_sorted_arr)):
-                        result.add(ResultCode.ERROR,
-                                   "Variable '" + varname + "' must be sorted along dimension '" + must_be_sorted_along + "'")
-                else:
-                    if not numpy.array_equal(me, sorted_arr):
-                        result.add(ResultCode.ERROR,
-                                   "Variable '" + varname + "' must be sorted along dimension '" + must_be_sorted_along + "'")
+                # fill values must be in the end of array for coordinate variables (sort to end)
+                if not self._is_sorted(varname, this_var.dims.index(must_be_sorted_along), decrease_sort_allowed):
+                    result.add(ResultCode.ERROR,
+                               "Variable '" + varname + "' must be sorted along dimension '" + must_be_sorted_along + "'")
             else:
                 result.add(ResultCode.ERROR, "Variable should be sorted along " + str(must_be_sorted_along) +
                            " but dim not found in variable.")
@@ -652,12 +1382,12 @@ class Dataset:
                 result.add(ResultCode.WARNING, "Variable '" + varname + "' must not contain fill values but has " +
                            "the variable attribute '_FillValue'.")
 
-            if -9999 in this_var:  # -9999 must always be the fill value
+            if self._contains(varname, -9999):  # -9999 must always be the fill value
                 result.add(ResultCode.ERROR, "Variable '" + varname + "' contains -9999. No fill values " +
                            "are allowed for this variables. -9999 is the fixed fill value in UC2 data standard.")
         else:
             if not no_fill_attr_required:
-                if -9999 in this_var and "_FillValue" not in this_var.attrs:
+                if "_FillValue" not in this_var.attrs and self._contains(varname, -9999):
                     result.add(ResultCode.ERROR, "Variable '" + varname + "' contains -9999 but does not have the " +
                                "'_FillValue' attribute. This is required. -9999 is the fixed fill value in the UC2 data standard.")
             if "_FillValue" in this_var.attrs and this_var.attrs["_FillValue"] != -9999:
@@ -699,7 +1429,7 @@ class Dataset:
 
         """
 
-        exists = attrname in self.ds[varname].attrs
+        exists = attrname in self.metadata[varname].attrs
         result = CheckResult(ResultCode.OK)
         if not exists:
             if must_exist:
@@ -712,7 +1442,7 @@ class Dataset:
                 return CheckResult(ResultCode.ERROR,
                                    "Variable '" + varname + "' has attribute '" + attrname + "' defined. Not allowed.")
 
-        this_value = self.ds[varname].attrs[attrname]
+        this_value = self.metadata[varname].attrs[attrname]
 
         if allowed_types is not None:
             if not check_type(this_value, allowed_types):
@@ -778,7 +1508,7 @@ class Dataset:
 
         """
 
-        exists = attrname in self.ds.attrs
+        exists = attrname in self.metadata.attrs
         result = CheckResult(ResultCode.OK)
 
         if not exists:
@@ -787,7 +1517,7 @@ class Dataset:
             else:
                 return result
 
-        this_value = self.ds.attrs[attrname]
+        this_value = self.metadata.attrs[attrname]
 
         if allowed_types is not None:
             if not check_type(this_value, allowed_types):
@@ -848,16 +1578,24 @@ class Dataset:
 
         """
 
-        tmp = netCDF4.Dataset(self.path)
-        if any([x.isunlimited() for k, x in tmp.dimensions.items()]):
+        if self._header is not None:
+            has_unlimited = len(self._header.unlimited) > 0
+        else:
+            import netCDF4
+
+            with nc_lock:
+                tmp = netCDF4.Dataset(self.path) if self._nc is None else self._nc
+                has_unlimited = any([x.isunlimited() for k, x in tmp.dimensions.items()])
+                if self._nc is None:
+                    tmp.close()
+        if has_unlimited:
             self.check_result["unlimited_dim"].add(ResultCode.ERROR, "Unlimited dimensions not supported.")
-        tmp.close()
 
-        if "nv" in self.ds.dims:
-            if self.ds.dims["nv"] != 2:
+        if "nv" in self.metadata.dims:
+            if self.metadata.dims["nv"] != 2:
                 self.check_result["nv_is_2"].add(ResultCode.ERROR, "Dimension 'nv' must have size of 2.")
-        if "max_name_len" in self.ds.dims:
-            if self.ds.dims["max_name_len"] != 32:
+        if "max_name_len" in self.metadata.dims:
+            if self.metadata.dims["max_name_len"] != 32:
                 self.check_result["max_name_len_is_32"].add(ResultCode.ERROR,
                                                             "Dimension 'max_name_len' must have size of 32.")
 
@@ -887,6 +1625,8 @@ class Dataset:
             self.check_result["vrs"]["standard_name"].add(
                 self.check_var_attr("vrs", "standard_name", False, must_not_exist=True))
 
+        self._check_error_budget()
+
         # time
 
         allowed_range = None
@@ -897,7 +1637,7 @@ class Dataset:
             time_dims = ("traj", "ntime")
             time_dim_name = "ntime"
         else:
-            if "ncol" in self.ds.dims:  # pixel-based surfaces
+            if "ncol" in self.metadata.dims:  # pixel-based surfaces
                 pass  # TODO: do anything?
             else:  # is grid
                 time_dims = ("time",)
@@ -907,7 +1647,7 @@ class Dataset:
             allowed_range = [.001, 86400]
         elif self.is_lto:
             if self.check_result["origin_time"]:
-                ndays = calendar.monthrange(int(self.ds.origin_time[0:4]), int(self.ds.origin_time[5:7]))[1]
+                ndays = calendar.monthrange(int(self.metadata.origin_time[0:4]), int(self.metadata.origin_time[5:7]))[1]
                 allowed_range = [.01, ndays * 24 * 60 * 60]
 
         self.check_result["time"]["variable"].add(
@@ -920,18 +1660,14 @@ class Dataset:
         # Check that LTO time series have minimum time step of 30 min.
         if self.is_lto:
             if self.check_result["time"]:
-                diff_ok = self.ds["time"].diff(time_dim_name) >= 1800  # is difference ok?
-                # add 1 column to diff_ok because diff is one column shorter than time variable
-                if self.ds["time"].ndim > 1:
-                    add_to = numpy.ones((diff_ok.shape[0], 1), dtype=bool)
-                    diff_ok = numpy.concatenate((add_to, diff_ok), axis=1)
-                else:
-                    add_to = numpy.array([True])
-                    diff_ok = numpy.concatenate((add_to, diff_ok))
-                is_valid = numpy.not_equal(self.ds["time"].values, -9999)  # -9999 is excluded from diff check
-                if numpy.any(
-                        numpy.logical_and(numpy.logical_not(diff_ok), is_valid)):  # if diff not okay and not -9999 -> error
-                    self.check_result.add(ResultCode.ERROR, "Minimum time step in LTO must be 30 minutes")
+                # time dimension is the last one. Blocks are along the first dimension.
+                last = None  # last time of the previous block if time is 1-dimensional
+                for block in self.iter_blocks("time"):
+                    if not time_steps_ok(block, 1800, fill_value=-9999, previous=last):
+                        self.check_result.add(ResultCode.ERROR, "Minimum time step in LTO must be 30 minutes")
+                        break
+                    if block.ndim == 1 and block.size > 0:
+                        last = block[-1]
             else:
                 self.check_result["time"]["variable"].add(ResultCode.ERROR, "Cannot check time steps because of previous error in time variable.")
 
@@ -946,16 +1682,18 @@ class Dataset:
             self.check_result["time"]["axis"].add(
                 self.check_var_attr("time", "axis", True, allowed_types=str, allowed_values="T"))
             self.check_result["time"]["fill_values"].add(
-                self.check_var_attr("time", "_FillValue", False, allowed_types=self.ds["time"].dtype,
+                self.check_var_attr("time", "_FillValue", False, allowed_types=self.metadata["time"].dtype,
                                     must_not_exist=self.is_grid))
             self.check_result["time"]["units"].add(self.check_var_attr("time", "units", True, allowed_types=str,
                                                                        regex="seconds since [0-9]{4}-[0-9]{2}-[0-9]{2} [0-9]{2}:[0-9]{2}:[0-9]{2} \+00"))
             if self.check_result["origin_time"] and self.check_result["time"]["units"]:
-                if not self.ds["time"].units.endswith(self.ds.origin_time):
+                if not self.metadata["time"].units.endswith(self.metadata.origin_time):
                     self.check_result["time"]["origin_time"].add(ResultCode.ERROR,
                                                                  "Global attribute 'origin_time' does not match units of variable 'time'.")
             # bounds attributes are checked below together with other variables.
 
+        self._check_error_budget()
+
         # z
         # TODO: z does not have to be there (e.g. T2 model output)
 
@@ -989,9 +1727,11 @@ class Dataset:
 
             if self.check_result["z"] and self.check_result["origin_z"]:
                 self.check_result["z"]["standard_name"].add(
-                    self.check_var_attr("z", "standard_name", self.ds.origin_z == 0, allowed_types=str,
+                    self.check_var_attr("z", "standard_name", self.metadata.origin_z == 0, allowed_types=str,
                                         allowed_values="height_above_mean_sea_level",
-                                        must_not_exist=self.ds.origin_z != 0))
+                                        must_not_exist=self.metadata.origin_z != 0))
+
+        self._check_error_budget()
 
         # x, y
         self.check_xy("x")
@@ -1001,7 +1741,7 @@ class Dataset:
         self.check_xy("E_UTM")
         self.check_xy("N_UTM")
 
-        if "s" in self.ds.dims:
+        if "s" in self.metadata.dims:
             self.check_xy("xs")
             self.check_xy("ys")
             self.check_xy("lons")
@@ -1011,20 +1751,22 @@ class Dataset:
 
         if self.is_grid:
             # if one u is there, all are nedded
-            if any(elem in self.ds.variables for elem in ["xu", "Eu_UTM", "Nu_UTM", "lonu", "latu"]):
+            if any(elem in self.metadata.variables for elem in ["xu", "Eu_UTM", "Nu_UTM", "lonu", "latu"]):
                 self.check_xy("xu")
                 self.check_xy("Eu_UTM")
                 self.check_xy("Nu_UTM")
                 self.check_xy("latu")
                 self.check_xy("lonu")
             # if one v is there, all are nedded
-            if any(elem in self.ds.variables for elem in ["xv", "Ev_UTM", "Nv_UTM", "lonv", "latv"]):
+            if any(elem in self.metadata.variables for elem in ["xv", "Ev_UTM", "Nv_UTM", "lonv", "latv"]):
                 self.check_xy("yv")
                 self.check_xy("Ev_UTM")
                 self.check_xy("Nv_UTM")
                 self.check_xy("lonv")
                 self.check_xy("latv")
 
+        self._check_error_budget()
+
         # crs
         self.check_result["crs"]["variable"].add(self.check_var("crs", True, dims=()))
         if self.check_result["crs"]:
@@ -1069,6 +1811,8 @@ class Dataset:
                                                                           allowed_values=["EPSG:25831", "EPSG:25832",
                                                                                           "EPSG:25833"]))
 
+        self._check_error_budget()
+
         #
         # other (auxiliary) coordinate variables
         #
@@ -1150,20 +1894,33 @@ class Dataset:
         elif self.is_traj:
             data_dims = ("traj", "ntime")
         else:
-            if "ncol" in self.ds.dims:  # pixel-based surfaces
+            if "ncol" in self.metadata.dims:  # pixel-based surfaces
                 data_dims = ("time", "nrow", "ncol")  # TODO: Wird es erlaubt werden, pixel ohne time abzulegen?
             else:
                 data_dims = None
 
         # get all coordinates that appear in this file
         existing_coordinates = list()
-        for ikey in self.ds.variables:
+        for ikey in self.metadata.variables:
             if (ikey in known_coordinates) or ikey.startswith("bands_"):
                 if not ikey.endswith("_bounds"):
                    existing_coordinates.append(ikey)
         existing_coordinates.sort()
 
-        for ikey in self.ds.variables:
+        # data variables are independent of each other. Their checks may run in parallel (see var_workers).
+        data_var_checks = list()
+        for ikey in self.metadata.variables:
+            if ikey in dont_check or ikey.endswith("_bounds") or ikey.startswith("bands_") or \
+                    ikey.startswith("ancillary_") or ikey in existing_coordinates:
+                continue
+            if ikey in self.allowed_variables:
+                data_var_checks.append((ikey, ikey, False, data_dims, existing_coordinates))
+            elif ikey in [a + "_" + b for a in self.allowed_variables for b in self.allowed_aggregations]:
+                data_var_checks.append((ikey, "_".join(ikey.split("_")[:-1]), True, data_dims, existing_coordinates))
+        data_var_results = self._iter_data_var_checks(data_var_checks)
+
+        for ikey in self.metadata.variables:
+            self._check_error_budget()
             if ikey in dont_check:
                 continue
             is_normal = ikey in self.allowed_variables
@@ -1180,26 +1937,26 @@ class Dataset:
 
             if is_bands:
                 # check if this is a coordinate variable or an auxiliary coordinate variable
-                if ikey in self.ds.dims.keys():  # is coordinate variable
+                if ikey in self.metadata.dims.keys():  # is coordinate variable
                     self.check_result[ikey].add(
                         self.check_var(ikey, True, dims=ikey, fill_allowed=False, must_be_sorted_along=ikey))
                 else:  # is not coordinate variable
-                    if len(self.ds[ikey].dims) != 1:
+                    if len(self.metadata[ikey].dims) != 1:
                         self.check_result[ikey].add(ResultCode.ERROR, "Variable '" + ikey + "' is expected to be a " +
                                                     "coordinate variable or an auxiliary coordinate variable. This means" +
-                                                    " it must be 1-dimensional. Found dimension: " + str(self.ds[ikey].dims))
+                                                    " it must be 1-dimensional. Found dimension: " + str(self.metadata[ikey].dims))
                     else:
-                        if not self.ds[ikey].dims[0].startswith("bands_"):
+                        if not self.metadata[ikey].dims[0].startswith("bands_"):
                             self.check_result[ikey].add(ResultCode.ERROR, "Variable '" + ikey + "' is expected to be a " +
                                                     "coordinate variable or an auxiliary coordinate variable. This means" +
-                                                    " it must follow a 'bands_'-dimension. Found dimension: " + str(self.ds[ikey].dims))
+                                                    " it must follow a 'bands_'-dimension. Found dimension: " + str(self.metadata[ikey].dims))
                         else:
                             self.check_var(ikey, True)
 
             elif is_bounds:
 
                 main_key = ikey.replace("_bounds", "")
-                if main_key not in self.ds.variables:
+                if main_key not in self.metadata.variables:
                     self.check_result[ikey].add(ResultCode.ERROR,
                                                 "Variable '" + ikey + "' seems to be a bounds variable " 
                                                                       "but there is no main variable (expected '" +
@@ -1207,17 +1964,19 @@ class Dataset:
                 else:
                     self.check_result[main_key].add(self.check_var_attr(main_key, "bounds", True,
                                                                         allowed_types=str, allowed_values=ikey))
-                    self.check_result[ikey].add(self.check_var(ikey, True, allowed_types=self.ds[main_key].dtype,
-                                                               dims=self.ds[main_key].dims + ("nv",),
+                    self.check_result[ikey].add(self.check_var(ikey, True, allowed_types=self.metadata[main_key].dtype,
+                                                               dims=self.metadata[main_key].dims + ("nv",),
                                                                no_fill_attr_required=True)
                                                 )
-                    if len(self.ds[ikey].attrs) != 0:
+                    if len(self.metadata[ikey].attrs) != 0:
                         self.check_result[ikey]["attributes"].add(ResultCode.ERROR,
                                                                   "Variable '" + ikey + "' must not have any attributes.")
                 # Time must be end of time period
                 if ikey == "time_bounds":
                     if self.check_result[ikey]:
-                        if not self.ds[main_key].equals(self.ds[ikey][..., 1]):
+                        block_len = self._block_len(main_key)
+                        if not all(numpy.array_equal(i_time, i_bounds[..., 1]) for i_time, i_bounds in
+                                   zip(self.iter_blocks(main_key, block_len), self.iter_blocks(ikey, block_len))):
                             self.check_result[ikey]["variable"].add(ResultCode.ERROR,
                                                                     "second column of 'time_bounds' must equal data of variable 'time'")
                     else:
@@ -1227,10 +1986,9 @@ class Dataset:
                 # z must be in middle of z bounds
                 if ikey == "z_bounds":
                     if self.check_result[ikey]:
-                        z_bound_lower = self.ds[ikey][..., 0]
-                        z_bound_upper = self.ds[ikey][..., 1]
-                        z_bound_mid = z_bound_lower + (z_bound_upper - z_bound_lower) * 0.5
-                        if not numpy.allclose(self.ds[main_key].values, z_bound_mid.values):
+                        block_len = self._block_len(main_key)
+                        if not all(midpoints_ok(i_z, i_bounds) for i_z, i_bounds in
+                                   zip(self.iter_blocks(main_key, block_len), self.iter_blocks(ikey, block_len))):
                             self.check_result[ikey]["variable"].add(ResultCode.ERROR,
                                                                     "values of z must be in the middle between z_bounds.")
                     else:
@@ -1241,13 +1999,13 @@ class Dataset:
             elif is_ancillary:
                 # Check ancillary
                 # This is an inner loop over all variables again, to find the one that references this ancillary variable.
-                for tmpKey in self.ds.variables:
-                    if "ancillary_variables" in self.ds[tmpKey].attrs:
-                        if ikey in self.ds[tmpKey].ancillary_variables.split(" "):
-                            main_var = self.ds[tmpKey]
-                            if main_var.dims != self.ds[ikey].dims:
+                for tmpKey in self.metadata.variables:
+                    if "ancillary_variables" in self.metadata[tmpKey].attrs:
+                        if ikey in self.metadata[tmpKey].ancillary_variables.split(" "):
+                            main_var = self.metadata[tmpKey]
+                            if main_var.dims != self.metadata[ikey].dims:
                                 self.check_result.add(ResultCode.ERROR, "Dimensions of ancillary variable '" +
-                                                      ikey + "' (" + str(self.ds[ikey].dims) + ") must be the same " +
+                                                      ikey + "' (" + str(self.metadata[ikey].dims) + ") must be the same " +
                                                       "as the referencing variable '" + tmpKey + "' (" +
                                                       str(main_var.dims) + ")")
 
@@ -1263,120 +2021,185 @@ class Dataset:
                 if expected_data_content not in data_content_var_names:
                     data_content_var_names.append(expected_data_content)
 
-                # Check var (depending on whether it has bands_ dim or not
-                dim_start_with_bands = [idim for idim in self.ds[ikey].dims if idim.startswith("bands_")]
-                if len(dim_start_with_bands) > 1:
-                    self.check_result[ikey]["variable"].add(ResultCode.ERROR, "not more than one dimension starting with "+
-                                                            "'bands_' allowed in variable.")
-                if len(dim_start_with_bands) == 0:  # normal case
-                    self.check_result[ikey]["variable"].add(self.check_var(ikey, True, dims=data_dims))
-                else:  # variable has bands_ dim
-                    self.check_result[ikey]["variable"].add(self.check_var(ikey, True, dims=(dim_start_with_bands[0],) + data_dims))
-
-                # Check obligatory attributes
-                self.check_result[ikey]["long_name"].add(self.check_var_attr(ikey, "long_name", True, allowed_types=str,
-                                                                             allowed_values=self.allowed_variables[
-                                                                                 expected_data_content][
-                                                                                 "long_name"]))
-                self.check_result[ikey]["units"].add(
-                    self.check_var_attr(ikey, "units", True, allowed_types=str))  # TODO: check conversion
-                self.check_result[ikey]["_FillValue"].add(
-                    self.check_var_attr(ikey, "_FillValue", True, allowed_types=self.ds[ikey].dtype,
-                                        allowed_values=-9999))
-                self.check_result[ikey]["coordinates"].add(
-                    self.check_var_attr(ikey, "coordinates", True, allowed_types=str))
-                if self.check_result[ikey]["coordinates"]:
-                    this_coords = self.ds[ikey].coordinates.split(" ")
-                    this_coords.sort()
-
-                    coords_in_var_not_in_file = set(this_coords).difference(set(existing_coordinates))
-                    coords_in_file_not_in_var = set(existing_coordinates).difference(set(this_coords))
-
-                    if len(coords_in_file_not_in_var) != 0:
-                        self.check_result[ikey]["coordinates"].add(ResultCode.WARNING,
-                                                                   "variable attribute 'coordinates' does not " +
-                                                                   "contain all (auxiliary) coordinates. These are missing: " +
-                                                                   str(coords_in_file_not_in_var))
-                    if len(coords_in_var_not_in_file) != 0:
-                        self.check_result[ikey]["coordinates"].add(ResultCode.ERROR,
-                                                                   "variable attribute 'coordinates' contains a reference " +
-                                                                   "to a coordinate that is not found in file: " +
-                                                                   str(coords_in_var_not_in_file))
-                self.check_result[ikey]["grid_mapping"].add(
-                    self.check_var_attr(ikey, "grid_mapping", True, allowed_types=str,
-                                        allowed_values="crs"))
-                # other attributes
-                self.check_result[ikey]["standard_name"].add(self.check_var_attr(ikey, "standard_name",
-                                                                                 self.allowed_variables[
-                                                                                     expected_data_content][
-                                                                                     "standard_name"] != "",
-                                                                                 allowed_types=str,
-                                                                                 allowed_values=
-                                                                                 self.allowed_variables[
-                                                                                     expected_data_content][
-                                                                                     "standard_name"],
-                                                                                 must_not_exist=
-                                                                                 self.allowed_variables[
-                                                                                     expected_data_content][
-                                                                                     "standard_name"] == ""))
-                self.check_result[ikey]["units_alt"].add(
-                    self.check_var_attr(ikey, "units_alt", False, allowed_types=str))  # TODO: check conversion
-                self.check_result[ikey]["uncertainty_rel"].add(self.check_var_attr(ikey, "uncertainty_rel", False,
-                                                                                   allowed_types=float))
-                self.check_result[ikey]["processing_level"].add(self.check_var_attr(ikey, "processing_level", False,
-                                                                                    allowed_types=int,
-                                                                                    allowed_range=[0, 3]))
-                self.check_result[ikey]["processing_info"].add(self.check_var_attr(ikey, "processing_info", False,
-                                                                                   allowed_types=str))
-                self.check_result[ikey]["instrument_name"].add(self.check_var_attr(ikey, "instrument_name", False,
-                                                                                   allowed_types=str))
-                self.check_result[ikey]["instrument_nr"].add(self.check_var_attr(ikey, "instrument_nr", False,
-                                                                                 allowed_types=str))
-                self.check_result[ikey]["instrument_sn"].add(self.check_var_attr(ikey, "instrument_sn", False,
-                                                                                 allowed_types=str))
-
-                # check cell_methods if variable has name xyz_method
-                if is_agg_name:
-                    self.check_result[ikey]["cell_methods"].add(self._check_cell_methods_agg_varname(ikey))
-
-                # check cell_methods if cell_methods in variable attributes
-                if "cell_methods" in self.ds[ikey].attrs:
-                    self.check_result[ikey]["cell_methods"].add(self._check_cell_methods_attribute(ikey, is_agg_name))
-
-                # Check ancillary_variables attribute
-                if "ancillary_variables" in self.ds[ikey].attrs:
-                    anc_var = self.ds[ikey].ancillary_variables.split(" ")
-                    self.check_result[ikey]["ancillary_variables"].add(self.check_var_attr(ikey, "ancillary_variables",
-                                                                                           True, allowed_types=str))
-                    for i in anc_var:
-                        if i not in self.ds.variables:
-                            self.check_result[ikey]["ancillary_variables"].add(ResultCode.ERROR,
-                                                                               "Expected ancillary variable '" +
-                                                                               i + "' not found in file.")
-
-                # Check bounds attribute
-                if "bounds" in self.ds[ikey].attrs:
-                    if ikey + "_bounds" not in self.ds.variables:
-                        self.check_result[ikey]["bounds"].add(ResultCode.ERROR,
-                                                              "Expected variable '" + ikey + "_bounds' not found.")
-                    self.check_result[ikey]["bounds"].add(self.check_var_attr(ikey, "bounds", True,
-                                                                              allowed_types=str,
-                                                                              allowed_values=ikey + "_bounds"))
+                self.check_result[ikey].add(next(data_var_results))
 
         if len(data_content_var_names) == 0:
             self.check_result.add(ResultCode.ERROR, "No data variable found.")
         elif len(data_content_var_names) == 1:
-            if self.check_result["data_content"] and self.ds.data_content != data_content_var_names[0]:
+            if self.check_result["data_content"] and self.metadata.data_content != data_content_var_names[0]:
                 self.check_result["data_content"].add(ResultCode.ERROR, "Only one data variable found. '" +
                                                       data_content_var_names[0] +
                                                       "'. Expected global attribute 'data_content'" +
                                                       " to be '" + data_content_var_names[0] + "'.")
         else:
-            if self.check_result["data_content"] and self.ds.data_content not in self.allowed_data_contents:
+            if self.check_result["data_content"] and self.metadata.data_content not in self.allowed_data_contents:
                 self.check_result["data_content"].add(ResultCode.ERROR, "Multiple data variables found. "
                                                                         "In this case only one of the allowed"
                                                                         "data_content variable categories must be"
-                                                                        "used. You used '" + self.ds.data_content + "'.")
+                                                                        "used. You used '" + self.metadata.data_content + "'.")
+
+    def _iter_data_var_checks(self, checks):
+        """
+        Runs _check_data_var for each entry of checks and yields the results in the same order
+
+        With var_workers > 1 the checks run on a thread pool. Reading and testing the data is mostly done by
+        netCDF4 and numpy which release the GIL.
+
+        Parameters
+        ----------
+        checks : list
+            tuples of arguments for _check_data_var
+
+        Yields
+        ------
+        CheckResult: results of one data variable
+
+        """
+
+        if self.var_workers <= 1 or len(checks) <= 1:
+            for args in checks:
+                yield self._check_data_var(*args)
+            return
+
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.var_workers)
+        futures = [executor.submit(self._check_data_var, *args) for args in checks]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()  # e.g. if the error budget is exceeded
+            executor.shutdown(wait=True)
+
+    def _check_data_var(self, ikey, expected_data_content, is_agg_name, data_dims, existing_coordinates):
+        """
+        Checks a data variable and its attributes
+
+        This check is called internally by _check_all_vars. It does not modify the check_result attribute, so
+        that several data variables can be checked at the same time.
+
+        Parameters
+        ----------
+        ikey : str
+            name of the data variable
+        expected_data_content : str
+            name of the variable in the table of allowed variables
+        is_agg_name : bool
+            whether the name of the variable ends with an aggregation
+        data_dims : tuple or None
+            the expected dimensions (without 'bands_' dimension)
+        existing_coordinates : list
+            sorted names of all coordinates in the file
+
+        Returns
+        -------
+        CheckResult: the results of this variable
+
+        """
+
+        result = CheckResult()
+
+        # Check var (depending on whether it has bands_ dim or not
+        dim_start_with_bands = [idim for idim in self.metadata[ikey].dims if idim.startswith("bands_")]
+        if len(dim_start_with_bands) > 1:
+            result["variable"].add(ResultCode.ERROR, "not more than one dimension starting with "+
+                                   "'bands_' allowed in variable.")
+        if len(dim_start_with_bands) == 0:  # normal case
+            result["variable"].add(self.check_var(ikey, True, dims=data_dims))
+        else:  # variable has bands_ dim
+            result["variable"].add(self.check_var(ikey, True, dims=(dim_start_with_bands[0],) + data_dims))
+
+        # Check obligatory attributes
+        result["long_name"].add(self.check_var_attr(ikey, "long_name", True, allowed_types=str,
+                                                    allowed_values=self.allowed_variables[
+                                                        expected_data_content][
+                                                        "long_name"]))
+        result["units"].add(
+            self.check_var_attr(ikey, "units", True, allowed_types=str))  # TODO: check conversion
+        result["_FillValue"].add(
+            self.check_var_attr(ikey, "_FillValue", True, allowed_types=self.metadata[ikey].dtype,
+                                allowed_values=-9999))
+        result["coordinates"].add(
+            self.check_var_attr(ikey, "coordinates", True, allowed_types=str))
+        if result["coordinates"]:
+            this_coords = self.metadata[ikey].coordinates.split(" ")
+            this_coords.sort()
+
+            coords_in_var_not_in_file = set(this_coords).difference(set(existing_coordinates))
+            coords_in_file_not_in_var = set(existing_coordinates).difference(set(this_coords))
+
+            if len(coords_in_file_not_in_var) != 0:
+                result["coordinates"].add(ResultCode.WARNING,
+                                          "variable attribute 'coordinates' does not " +
+                                          "contain all (auxiliary) coordinates. These are missing: " +
+                                          str(coords_in_file_not_in_var))
+            if len(coords_in_var_not_in_file) != 0:
+                result["coordinates"].add(ResultCode.ERROR,
+                                          "variable attribute 'coordinates' contains a reference " +
+                                          "to a coordinate that is not found in file: " +
+                                          str(coords_in_var_not_in_file))
+        result["grid_mapping"].add(
+            self.check_var_attr(ikey, "grid_mapping", True, allowed_types=str,
+                                allowed_values="crs"))
+        # other attributes
+        result["standard_name"].add(self.check_var_attr(ikey, "standard_name",
+                                                        self.allowed_variables[
+                                                            expected_data_content][
+                                                            "standard_name"] != "",
+                                                        allowed_types=str,
+                                                        allowed_values=
+                                                        self.allowed_variables[
+                                                            expected_data_content][
+                                                            "standard_name"],
+                                                        must_not_exist=
+                                                        self.allowed_variables[
+                                                            expected_data_content][
+                                                            "standard_name"] == ""))
+        result["units_alt"].add(
+            self.check_var_attr(ikey, "units_alt", False, allowed_types=str))  # TODO: check conversion
+        result["uncertainty_rel"].add(self.check_var_attr(ikey, "uncertainty_rel", False,
+                                                          allowed_types=float))
+        result["processing_level"].add(self.check_var_attr(ikey, "processing_level", False,
+                                                           allowed_types=int,
+                                                           allowed_range=[0, 3]))
+        result["processing_info"].add(self.check_var_attr(ikey, "processing_info", False,
+                                                          allowed_types=str))
+        result["instrument_name"].add(self.check_var_attr(ikey, "instrument_name", False,
+                                                          allowed_types=str))
+        result["instrument_nr"].add(self.check_var_attr(ikey, "instrument_nr", False,
+                                                        allowed_types=str))
+        result["instrument_sn"].add(self.check_var_attr(ikey, "instrument_sn", False,
+                                                        allowed_types=str))
+
+        # check cell_methods if variable has name xyz_method
+        if is_agg_name:
+            result["cell_methods"].add(self._check_cell_methods_agg_varname(ikey))
+
+        # check cell_methods if cell_methods in variable attributes
+        if "cell_methods" in self.metadata[ikey].attrs:
+            result["cell_methods"].add(self._check_cell_methods_attribute(ikey, is_agg_name))
+
+        # Check ancillary_variables attribute
+        if "ancillary_variables" in self.metadata[ikey].attrs:
+            anc_var = self.metadata[ikey].ancillary_variables.split(" ")
+            result["ancillary_variables"].add(self.check_var_attr(ikey, "ancillary_variables",
+                                                                  True, allowed_types=str))
+            for i in anc_var:
+                if i not in self.metadata.variables:
+                    result["ancillary_variables"].add(ResultCode.ERROR,
+                                                      "Expected ancillary variable '" +
+                                                      i + "' not found in file.")
+
+        # Check bounds attribute
+        if "bounds" in self.metadata[ikey].attrs:
+            if ikey + "_bounds" not in self.metadata.variables:
+                result["bounds"].add(ResultCode.ERROR,
+                                     "Expected variable '" + ikey + "_bounds' not found.")
+            result["bounds"].add(self.check_var_attr(ikey, "bounds", True,
+                                                     allowed_types=str,
+                                                     allowed_values=ikey + "_bounds"))
+
+        return result
 
     def check_all_glob_attr(self):
         """
@@ -1449,9 +2272,9 @@ class Dataset:
         self.check_result["site"].add(self.check_glob_attr("site", True, str, allowed_values=Dataset.allowed_sites,
                                                            max_strlen=12)) # TODO: max_strlen gilt nur für UC2 Projekt?
         if self.check_result["location"] and self.check_result["site"]:
-            if Dataset.allowed_locations[Dataset.allowed_sites.index(self.ds.site)] != self.ds.location:
-                self.check_result["site"].add(ResultCode.ERROR, "site '" + self.ds.site +
-                                              "' does not match location '" + self.ds.location + "'")
+            if Dataset.allowed_locations[Dataset.allowed_sites.index(self.metadata.site)] != self.metadata.location:
+                self.check_result["site"].add(ResultCode.ERROR, "site '" + self.metadata.site +
+                                              "' does not match location '" + self.metadata.location + "'")
 
         self.check_result["institution"].add(
             self.check_glob_attr("institution", True, str, allowed_values=Dataset.allowed_institutions))
@@ -1459,34 +2282,34 @@ class Dataset:
             self.check_glob_attr("acronym", True, str, allowed_values=Dataset.allowed_acronyms,
                                  max_strlen=12)) # TODO: max_strlen gilt nur für UC2 Projekt?
         if self.check_result["institution"] and self.check_result["acronym"]:
-            if Dataset.allowed_acronyms[Dataset.allowed_institutions.index(self.ds.institution)] != \
-                    self.ds.acronym:
-                self.check_result["institution"].add(ResultCode.ERROR, "institution '" + self.ds.institution +
-                                                     "' does not match acronym '" + self.ds.acronym + "'")
+            if Dataset.allowed_acronyms[Dataset.allowed_institutions.index(self.metadata.institution)] != \
+                    self.metadata.acronym:
+                self.check_result["institution"].add(ResultCode.ERROR, "institution '" + self.metadata.institution +
+                                                     "' does not match acronym '" + self.metadata.acronym + "'")
 
         self.check_result["author"].add(self.check_glob_attr("author", True, str))
         if self.check_result["author"]:
-            if self.ds.author != "":
-                self.check_result["author"].add(check_person_field(self.ds.author, "author"))
+            if self.metadata.author != "":
+                self.check_result["author"].add(check_person_field(self.metadata.author, "author"))
 
         self.check_result["contact_person"].add(self.check_glob_attr("contact_person", True, str))
         if self.check_result["contact_person"]:
-            self.check_result["contact_person"].add(check_person_field(self.ds.contact_person, "contact_person"))
+            self.check_result["contact_person"].add(check_person_field(self.metadata.contact_person, "contact_person"))
 
         self.check_result["campaign"].add(self.check_glob_attr("campaign", True, str, regex="^[A-Za-z0-9\._-]+$",
                                                                max_strlen=12)) # TODO: max_strlen gilt nur für UC2 Projekt?
         if self.check_result["campaign"]:
             if self.is_iop:
                 try:
-                    if (len(self.ds.campaign) != 5) or (not int(self.ds.campaign[3:]) in range(1, 100)):
+                    if (len(self.metadata.campaign) != 5) or (not int(self.metadata.campaign[3:]) in range(1, 100)):
                         self.check_result["campaign"].add(ResultCode.ERROR,
                                                           "Global attribute 'campaign': If IOP then string must be IOPxx")
                 except ValueError:
                     self.check_result["campaign"].add(ResultCode.ERROR, "If global attribute 'campaign' starts with " +
                                                       "'IOP' then numbers must follow.")
-            elif self.ds.campaign.startswith("VALR") or self.ds.campaign.startswith("VALM"):
+            elif self.metadata.campaign.startswith("VALR") or self.metadata.campaign.startswith("VALM"):
                 try:
-                    if (len(self.ds.campaign) != 6) or (not int(self.ds.campaign[4:]) in range(1, 100)):
+                    if (len(self.metadata.campaign) != 6) or (not int(self.metadata.campaign[4:]) in range(1, 100)):
                         self.check_result["campaign"].add(ResultCode.ERROR,
                                                           "Global attribute 'campaign': If VALM/VALR then string must be VALMxx/VALRxx")
                 except ValueError:
@@ -1515,12 +2338,12 @@ class Dataset:
             this_agg_short = varname.split("_")[-1]
             this_agg_cf = self.allowed_aggregations[this_agg_short]
             if not re.match(r".*?\btime\b( )?:( )?" + re.escape(this_agg_cf) + r"\b",
-                            self.ds[varname].cell_methods):
+                            self.metadata[varname].cell_methods):
                 out[varname]["cell_methods"].add(ResultCode.ERROR,
                                                  "The variable name indicates a " +
                                                  "temporal aggregation. This must be given by cell_methods: " +
                                                  "'time: " + this_agg_cf + "'.")
-            if "time_bounds" not in self.ds.variables:
+            if "time_bounds" not in self.metadata.variables:
                 out[varname]["cell_methods"].add(ResultCode.ERROR,
                                                  "The variable name indicates a " +
                                                  "temporal aggregation. Therefore the variable " +
@@ -1543,7 +2366,7 @@ class Dataset:
 
         out = CheckResult(ResultCode.OK)
 
-        this_cm = self.ds[varname].cell_methods
+        this_cm = self.metadata[varname].cell_methods
         if re.match(r".*?\btime\b( )?:", this_cm):  # contains "time:"?
             method = re.match(r".*?\btime\b ?: ?([a-zA-Z]+)", this_cm)  # get method string after "time:"
             if method:
@@ -1573,7 +2396,7 @@ class Dataset:
                             )
 
                 if method != "point":
-                    if "bounds" not in self.ds["time"].attrs:
+                    if "bounds" not in self.metadata["time"].attrs:
                         out[varname]["cell_methods"].add(
                             ResultCode.ERROR, "Variable '" + varname + "' contains cell methods 'time:...'. A "
                                                                        "variable 'time_bounds' is needed and variable 'time' must contain attribute "
@@ -1605,7 +2428,9 @@ class Dataset:
 
         """
 
-        utm = pyproj.CRS(self.ds["crs"].epsg_code.lower())
+        import pyproj
+
+        utm = pyproj.CRS(self.metadata["crs"].epsg_code.lower())
         geo = pyproj.CRS("epsg:4258")
 
         return pyproj.transform(geo, utm, x, y, always_xy=True)
@@ -1619,20 +2444,9 @@ class Dataset:
         :return: lower left x, lower left y , upper right x, upper right y, epsg
         """
 
-        tmp_e_utm = self.ds.E_UTM.copy()
-        tmp_n_utm = self.ds.N_UTM.copy()
-
-        any_value = tmp_e_utm.values[tmp_e_utm.values != -9999][0]  # the first occurrence of non-FillValue
-        tmp_e_utm = numpy.where(tmp_e_utm.values == -9999, any_value, tmp_e_utm.values)
-
-        any_value = tmp_n_utm.values[tmp_n_utm.values != -9999][0]  # the first occurrence of non-FillValue
-        tmp_n_utm = numpy.where(tmp_n_utm.values == -9999, any_value, tmp_n_utm.values)
-
-        ll_x_utm = tmp_e_utm.min()
-        ll_y_utm = tmp_n_utm.min()
-        ur_x_utm = tmp_e_utm.max()
-        ur_y_utm = tmp_n_utm.max()
-        epsg_utm = self.ds["crs"].epsg_code.lower()
+        ll_x_utm, ur_x_utm = self.min_max("E_UTM", -9999)
+        ll_y_utm, ur_y_utm = self.min_max("N_UTM", -9999)
+        epsg_utm = self.metadata["crs"].epsg_code.lower()
 
         if utm:
             ll_x = float(ll_x_utm)
@@ -1641,6 +2455,8 @@ class Dataset:
             ur_y = float(ur_y_utm)
             epsg = epsg_utm
         else:
+            import pyproj
+
             epsg = "epsg:4258"
             utm = pyproj.CRS(epsg_utm)
             geo = pyproj.CRS(epsg)
@@ -1,6 +1,7 @@
-from numpy.core.defchararray import add as str_add
 from collections import OrderedDict
 import enum
+import struct
+import numpy
 
 
 class ResultCode(enum.Enum):
@@ -61,7 +62,21 @@ class ResultItem:
 
         """
 
-        return self.result != ResultCode.ERROR
+        return self.result not in [ResultCode.ERROR, ResultCode.FATAL]
+
+
+# header of CheckResult.to_bytes: magic, version, number of strings, tags and results
+_wire_header = struct.Struct("<4sBIII")
+_wire_magic = b"UC2R"
+_wire_version = 1
+
+
+def _index_dtype(count):
+    """
+    Returns the smallest unsigned integer type for numbers up to count - 1 in a table of CheckResult.to_bytes
+    """
+
+    return "u1" if count <= 1 << 8 else "<u2" if count <= 1 << 16 else "<u4"
 
 
 class CheckResult(OrderedDict):
@@ -141,19 +156,62 @@ class CheckResult(OrderedDict):
         Returns True if there are WARNINGs within the object.
         """
 
-        if len(self.result) == 0:
-            has_warn = False
-        else:
-            has_warn = any([ir.result == ResultCode.WARNING for ir in self.result])  # This checks the unnested results
+        return any(code == ResultCode.WARNING for _, code, _ in self.iter_items(ResultCode.WARNING))
+
+    def count_errors(self):
+
+        """
+        Returns the number of ERRORs (and FATALs) within the object including nested tags.
+        """
+
+        return sum(1 for _ in self.iter_items(ResultCode.ERROR))
+
+    def count_warnings(self):
+
+        """
+        Returns the number of WARNINGs within the object including nested tags.
+        """
+
+        return sum(1 for _, code, _ in self.iter_items(ResultCode.WARNING) if code == ResultCode.WARNING)
+
+    def _walk(self):
+
+        """
+        Yields (tag path, CheckResult) of this object and all nested tags in the order they are printed
+
+        The tags are visited with an explicit stack instead of recursion. The tag path of this object is ().
+        """
+
+        stack = [((), self)]
+        while stack:
+            path, node = stack.pop()
+            yield path, node
+            stack.extend((path + (k,), v) for k, v in reversed(list(node.items())))
+
+    def iter_items(self, min_severity=ResultCode.OK):
+
+        """
+        Yields all results including nested tags without building new CheckResult objects
+
+        Parameters
+        ----------
+        min_severity : ResultCode
+            Only results with at least this severity, e.g. ResultCode.ERROR for ERRORs and FATALs. Default: all
 
-        if has_warn:
-            return has_warn
+        Yields
+        ------
+        tuple: (tag path as tuple of tag names, ResultCode, message) in the order they are printed
 
-        for val in self.values():
-            if val.contains_warnings():
-                return True
+        Examples
+        --------
+        >>> for path, code, message in check_result.iter_items(uc2data.ResultCode.WARNING):
+        ...     print("/".join(path), code.name, message)
+        """
 
-        return False
+        for path, node in self._walk():
+            for i in node.result:
+                if i.result.value >= min_severity.value:
+                    yield path, i.result, i.message
 
     def add(self, result, message=""):
 
@@ -222,31 +280,32 @@ class CheckResult(OrderedDict):
         :return:
         """
         if sort:
-            root = {'root': {'ERROR': list(), 'WARNING': list(), 'OK': list()}}
-            for i in self.result:
-                if i.result == ResultCode.ERROR:
-                    root['root']['ERROR'].append(i.message)
-                elif i.result == ResultCode.WARNING:
-                    root['root']['WARNING'].append(i.message)
-                elif i.result == ResultCode.OK:
-                    root['root']['OK'].append(i.message)
-
-            for k, v in self.items():
-                rec_dict = v.to_dict(sort=True)
-                if rec_dict['root']['ERROR']:
-                    root['root']['ERROR'].append({k: rec_dict['root']['ERROR']})
-                if rec_dict['root']['WARNING']:
-                    root['root']['WARNING'].append({k: rec_dict['root']['WARNING']})
-                if rec_dict['root']['OK']:
-                    root['root']['OK'].append({k: rec_dict['root']['OK']})
+            codes = {ResultCode.ERROR: 'ERROR', ResultCode.WARNING: 'WARNING', ResultCode.OK: 'OK'}
+            nodes = list()  # (tag path, sorted lists) in the order of _walk: children come after their parents
+            for path, node in self._walk():
+                lists = {'ERROR': list(), 'WARNING': list(), 'OK': list()}
+                for i in node.result:
+                    if i.result in codes:
+                        lists[codes[i.result]].append(i.message)
+                nodes.append((path, node, lists))
+
+            # tags are only listed in a category if they contain results of it: fill in from the deepest tags up
+            done = dict()
+            for path, node, lists in reversed(nodes):
+                for k in node.keys():
+                    child = done.pop(path + (k,))
+                    for category, messages in child.items():
+                        if messages:
+                            lists[category].append({k: messages})
+                done[path] = lists
+            root = {'root': done[()]}
         else:
-            root = {'root': list() }
-            for i in self.result:
-                root['root'].append(i.message + " (" + str(i.result) + ")")
-
-            for k, v in self.items():
-                rec_dict = v.to_dict()
-                root['root'].append({k: rec_dict['root']})
+            lists = dict()
+            for path, node in self._walk():
+                lists[path] = [i.message + " (" + str(i.result) + ")" for i in node.result]
+                if path:
+                    lists[path[:-1]].append({path[-1]: lists[path]})
+            root = {'root': lists[()]}
         return root
 
     def __repr__(self):
@@ -256,15 +315,21 @@ class CheckResult(OrderedDict):
         """
 
         out = list()
-        for i in self.result:
-            out.append(i.message + " (" + str(i.result) + ")")
 
-        for k, v in self.items():
-            out.append("[ " + k + " ]")
-            out.extend(list(str_add("    ", v.__repr__().split("\n"))))
+        def indent(depth, text):
+            for line in text.split("\n"):
+                out.append("    " * depth + line)
 
-        out = "\n".join(out)
-        return out
+        for path, node in self._walk():
+            depth = len(path)
+            if depth:
+                indent(depth - 1, "[ " + path[-1] + " ]")
+                if not node.result and not len(node):
+                    indent(depth, "")  # an empty tag is printed as an empty (indented) line
+            for i in node.result:
+                indent(depth, i.message + " (" + str(i.result) + ")")
+
+        return "\n".join(out)
 
     def to_file(self, file, full=False):
         """
@@ -288,25 +353,152 @@ class CheckResult(OrderedDict):
     @property
     def warnings(self):
         out = CheckResult()
-        for i in self.result:
-            if i.result == ResultCode.WARNING:
-                out.add(i)
-
-        for k, v in self.items():
-            if v.contains_warnings():
-                out[k].add(v.warnings)
-
+        for path, node in self._walk():
+            for i in node.result:
+                if i.result == ResultCode.WARNING:
+                    out._tag(path).add(i)
         return out
 
     @property
     def errors(self):
         out = CheckResult()
-        for i in self.result:
-            if not i:
-                out.add(i)
+        for path, node in self._walk():
+            if path and not node.result and not len(node):
+                out._tag(path)  # empty tags count as failed (see __bool__)
+            for i in node.result:
+                if not i:
+                    out._tag(path).add(i)
+        return out
 
-        for k, v in self.items():
-            if not v:
-                out[k].add(v.errors)
+    def _tag(self, path):
+        """
+        Returns the nested tag at path (tuple of tag names). Missing tags are created.
+        """
+        node = self
+        for k in path:
+            node = node[k]
+        return node
 
-        return out
+    def to_bytes(self):
+        """
+        Serializes the CheckResult to a compact binary format (see from_bytes)
+
+        The tags are stored as a flat table of (parent, name) in the order they are printed and the results as a
+        table of (tag, ResultCode, message). Tag names and messages are stored once and referenced by number, so
+        repeated messages like "Test passed." cost at most 4 bytes each (numbers take 1, 2 or 4 bytes depending on
+        the size of the tables). Much smaller and faster than pickling the nested
+        objects. Pickling a CheckResult uses this format.
+
+        Returns
+        -------
+        bytes
+
+        """
+
+        strings = dict()  # string -> number
+
+        def intern(text):
+            return strings.setdefault(text, len(strings))
+
+        parents, names = list(), list()
+        item_tags, item_messages, item_codes = list(), list(), list()
+        count = 0
+        stack = [(None, None, self)]
+        while stack:
+            parent, name, node = stack.pop()
+            number = count
+            count += 1
+            if parent is not None:
+                parents.append(parent)
+                names.append(intern(name))
+            for i in node.result:
+                item_tags.append(number)
+                item_messages.append(intern(i.message))
+                item_codes.append(i.result.value)
+            stack.extend((number, k, v) for k, v in reversed(list(node.items())))
+
+        encoded = [i.encode("utf-8") for i in strings]
+        return b"".join([_wire_header.pack(_wire_magic, _wire_version, len(encoded), len(parents), len(item_tags)),
+                         numpy.array([len(i) for i in encoded], dtype="<u4").tobytes(),
+                         b"".join(encoded),
+                         numpy.array(parents, dtype=_index_dtype(count)).tobytes(),
+                         numpy.array(names, dtype=_index_dtype(len(encoded))).tobytes(),
+                         numpy.array(item_tags, dtype=_index_dtype(count)).tobytes(),
+                         numpy.array(item_messages, dtype=_index_dtype(len(encoded))).tobytes(),
+                         numpy.array(item_codes, dtype="u1").tobytes()])
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Creates a CheckResult from the output of to_bytes
+
+        Parameters
+        ----------
+        data : bytes
+            The serialized CheckResult
+
+        Returns
+        -------
+        CheckResult
+
+        Raises
+        ------
+        ValueError
+            If data is not a serialized CheckResult or is truncated
+
+        """
+
+        data = memoryview(data)
+        try:
+            magic, version, n_strings, n_tags, n_items = _wire_header.unpack_from(data)
+        except struct.error:
+            raise ValueError("Not a serialized CheckResult: too short.")
+        if magic != _wire_magic:
+            raise ValueError("Not a serialized CheckResult.")
+        if version != _wire_version:
+            raise ValueError("Unsupported version " + str(version) + " of a serialized CheckResult.")
+
+        offset = _wire_header.size
+
+        def table(dtype, count):
+            nonlocal offset
+            out = numpy.frombuffer(data, dtype=dtype, count=count, offset=offset)
+            offset += out.nbytes
+            return out.tolist()
+
+        try:
+            lengths = table("<u4", n_strings)
+            strings = list()
+            for length in lengths:
+                if offset + length > len(data):
+                    raise ValueError("string " + str(len(strings)) + " ends after the data")
+                strings.append(str(data[offset:offset + length], "utf-8"))
+                offset += length
+            tag_index, string_index = _index_dtype(n_tags + 1), _index_dtype(n_strings)
+            parents, names = table(tag_index, n_tags), table(string_index, n_tags)
+            item_tags, item_messages = table(tag_index, n_items), table(string_index, n_items)
+            item_codes = table("u1", n_items)
+        except ValueError as e:
+            raise ValueError("Serialized CheckResult is truncated: " + str(e))
+        if offset != len(data):
+            raise ValueError("Unexpected data after the serialized CheckResult.")
+
+        codes = {i.value: i for i in ResultCode}
+        nodes = [cls()]
+        for parent, name in zip(parents, names):
+            if parent >= len(nodes) or name >= n_strings:  # parents are written before their children
+                raise ValueError("Serialized CheckResult is corrupted: index out of range.")
+            node = cls()
+            OrderedDict.__setitem__(nodes[parent], strings[name], node)
+            nodes.append(node)
+        for tag, message, code in zip(item_tags, item_messages, item_codes):
+            if tag >= len(nodes) or message >= n_strings or code not in codes:
+                raise ValueError("Serialized CheckResult is corrupted: index or result code out of range.")
+            item = ResultItem.__new__(ResultItem)  # no checks: the results were valid when they were serialized
+            item.result = codes[code]
+            item.message = strings[message]
+            nodes[tag].result.append(item)
+        return nodes[0]
+
+    def __reduce__(self):
+        return self.__class__.from_bytes, (self.to_bytes(),)
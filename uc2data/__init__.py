@@ -1,5 +1,6 @@
 from .Dataset import Dataset
 from .Result import ResultCode, ResultItem, CheckResult
-from .helpers import check_multi
+from .helpers import check_multi, check_many
+from .catalog import Catalog
 
 data_standard_version = (1,4)
\ No newline at end of file
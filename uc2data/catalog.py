@@ -0,0 +1,175 @@
+import sqlite3
+import time
+from collections import OrderedDict
+
+# global attributes that are stored for each file and can be used in queries
+catalog_attributes = ["site", "location", "campaign", "institution", "acronym", "data_content", "featureType"]
+
+_schema = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    checked REAL NOT NULL,
+    ok INTEGER NOT NULL,
+    """ + ",\n    ".join('"' + i + '" TEXT' for i in catalog_attributes) + """
+);
+CREATE TABLE IF NOT EXISTS results (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    tag TEXT NOT NULL,
+    severity TEXT NOT NULL,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_file ON results(file_id);
+CREATE INDEX IF NOT EXISTS results_tag ON results(tag, severity);
+CREATE INDEX IF NOT EXISTS results_severity ON results(severity);
+CREATE INDEX IF NOT EXISTS results_message ON results(message);
+""" + "".join('CREATE INDEX IF NOT EXISTS files_' + i + ' ON files("' + i + '");\n' for i in catalog_attributes)
+
+
+class Catalog:
+
+    """
+    SQLite database of check results
+
+    Results are collected and written in batches of batch_size files within one transaction.
+    Call flush or close (or use the catalog as context manager) to write the remaining results.
+
+    Attributes
+    ----------
+    path : str or pathlib.Path
+        The database file
+    batch_size : int
+        Number of files that are written at once
+
+    Examples
+    --------
+    >>> with uc2data.Catalog("results.sqlite") as catalog:
+    ...     for path, result, timing in uc2data.check_many(paths, workers=4):
+    ...         catalog.add(path, result)
+    >>> uc2data.Catalog("results.sqlite").query(tag="crs", severity="ERROR", site="Berlin")
+
+    """
+
+    def __init__(self, path, batch_size=100):
+        self.path = path
+        self.batch_size = batch_size
+        self._pending = list()
+        self.con = sqlite3.connect(str(path))
+        self.con.execute("PRAGMA foreign_keys = ON")
+        self.con.executescript(_schema)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def add(self, path, check_result, attrs=None):
+        """
+        Adds the results of a file. Earlier results of the same file are replaced.
+
+        Parameters
+        ----------
+        path : str or pathlib.Path
+            The checked file
+        check_result : CheckResult
+            The results of the check
+        attrs : dict, optional
+            Global attributes of the file (e.g. Dataset.ds.attrs). Only those in catalog_attributes are stored.
+
+        Returns
+        -------
+        None
+
+        """
+
+        attrs = attrs or dict()
+        file_row = [str(path), time.time(), int(bool(check_result))] + \
+                   [None if attrs.get(i) is None else str(attrs.get(i)) for i in catalog_attributes]
+        # nested tags are separated by "/", e.g. "crs/units"
+        result_rows = [("/".join(tag), code.name, message) for tag, code, message in check_result.iter_items()]
+        self._pending.append((file_row, result_rows))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes all collected results to the database
+        """
+
+        if not self._pending:
+            return
+        pending = OrderedDict((i[0][0], i) for i in self._pending)  # only the last results of a file
+        with self.con:  # one transaction
+            self.con.executemany("DELETE FROM files WHERE path = ?", [(i,) for i in pending])
+            for file_row, result_rows in pending.values():
+                file_id = self.con.execute("INSERT INTO files (path, checked, ok, " +
+                                           ", ".join('"' + i + '"' for i in catalog_attributes) + ") VALUES (" +
+                                           ", ".join(["?"] * len(file_row)) + ")", file_row).lastrowid
+                self.con.executemany("INSERT INTO results (file_id, tag, severity, message) VALUES (?, ?, ?, ?)",
+                                     [(file_id,) + i for i in result_rows])
+        self._pending = list()
+
+    def close(self):
+        """
+        Writes the remaining results and closes the database
+        """
+
+        self.flush()
+        self.con.close()
+
+    def query(self, tag=None, severity=None, message=None, files_only=False, **attrs):
+        """
+        Returns stored results
+
+        Parameters
+        ----------
+        tag : str, optional
+            Only results of this tag including its nested tags, e.g. "crs" also returns results of "crs/units"
+        severity : str or list, optional
+            Only results of this severity (or these severities): "OK", "WARNING", "ERROR" or "FATAL"
+        message : str, optional
+            Only results whose message starts with this text, e.g. "Overlap between"
+        files_only : bool
+            If True only the paths of the matching files are returned
+        **attrs
+            Only files with these global attributes (see catalog_attributes), e.g. site="Berlin"
+
+        Returns
+        -------
+        list: tuples of (path, tag, severity, message), or paths if files_only is set
+
+        """
+
+        where = list()
+        params = list()
+        if tag is not None:
+            # range instead of LIKE so that the index can be used. "0" is the character after "/".
+            where.append("(r.tag = ? OR (r.tag >= ? AND r.tag < ?))")
+            params.extend([tag, tag + "/", tag + "0"])
+        if severity is not None:
+            severity = [severity] if isinstance(severity, str) else list(severity)
+            where.append("r.severity IN (" + ", ".join(["?"] * len(severity)) + ")")
+            params.extend(severity)
+        if message:
+            # range instead of LIKE or instr so that the index can be used
+            where.append("r.message >= ? AND r.message < ?")
+            params.extend([message, message[:-1] + chr(ord(message[-1]) + 1)])
+        for key, value in attrs.items():
+            if key not in catalog_attributes:
+                raise ValueError("Unknown attribute '" + key + "'. Allowed: " + ", ".join(catalog_attributes))
+            where.append('f."' + key + '" = ?')
+            params.append(value)
+
+        if files_only:
+            sql = "SELECT DISTINCT f.path FROM files f JOIN results r ON r.file_id = f.id"
+        else:
+            sql = "SELECT f.path, r.tag, r.severity, r.message FROM files f JOIN results r ON r.file_id = f.id"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY f.path" if files_only else " ORDER BY f.path, r.rowid"
+
+        rows = self.con.execute(sql, params).fetchall()
+        if files_only:
+            return [i[0] for i in rows]
+        return rows
@@ -0,0 +1,263 @@
+import concurrent.futures
+import datetime
+import re
+import sqlite3
+
+# attributes of a file that are stored besides its extent and can be used in queries
+extent_attributes = ["featureType", "site", "campaign"]
+
+_schema = """
+CREATE TABLE IF NOT EXISTS extents (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    epsg_utm TEXT,
+    min_e REAL, min_n REAL, max_e REAL, max_n REAL,
+    min_lon REAL, min_lat REAL, max_lon REAL, max_lat REAL,
+    start REAL, end REAL,
+    """ + ",\n    ".join('"' + i + '" TEXT' for i in extent_attributes) + """
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS extents_index USING rtree(id, min_lon, max_lon, min_lat, max_lat, start, end);
+"""
+
+_columns = ["path", "epsg_utm", "min_e", "min_n", "max_e", "max_n", "min_lon", "min_lat", "max_lon", "max_lat",
+            "start", "end"] + extent_attributes
+
+
+def parse_origin_time(origin_time):
+    """
+    Converts the global attribute origin_time ("YYYY-MM-DD hh:mm:ss +00") to a timezone aware datetime
+    """
+
+    match = re.match(r"^(\d{4})-(\d{2})-(\d{2}) (\d{2}):(\d{2}):(\d{2}) \+00$", origin_time)
+    if match is None:
+        raise ValueError("Unexpected format of origin_time: '" + origin_time + "'")
+    return datetime.datetime(*[int(i) for i in match.groups()], tzinfo=datetime.timezone.utc)
+
+
+def _timestamp(value):
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return value.timestamp()
+    return float(value)
+
+
+def file_extent(path):
+    """
+    Reads the spatial and temporal extent of a file
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        The file
+
+    Returns
+    -------
+    dict: path, epsg_utm, min_e, min_n, max_e, max_n (UTM), min_lon, min_lat, max_lon, max_lat (EPSG:4258),
+    start and end (seconds since 1970-01-01 UTC, None for files without time) and the attributes in
+    extent_attributes
+
+    """
+
+    from .Dataset import Dataset
+
+    with Dataset(path) as ds:
+        min_e, min_n, max_e, max_n, epsg_utm = ds.get_bounds(utm=True)
+        min_lon, min_lat, max_lon, max_lat, _ = ds.get_bounds()
+        first, last = None, None
+        if "time" in ds.metadata.variables:
+            origin = parse_origin_time(ds.metadata.attrs["origin_time"]).timestamp()
+            first, last = ds.min_max("time", -9999)
+        extent = {
+            "path": str(path),
+            "epsg_utm": epsg_utm,
+            "min_e": min_e, "min_n": min_n, "max_e": max_e, "max_n": max_n,
+            "min_lon": float(min_lon), "min_lat": float(min_lat), "max_lon": float(max_lon), "max_lat": float(max_lat),
+            "start": None if first is None else origin + float(first),
+            "end": None if last is None else origin + float(last),
+        }
+        for i in extent_attributes:
+            extent[i] = None if ds.metadata.attrs.get(i) is None else str(ds.metadata.attrs.get(i))
+    return extent
+
+
+class ExtentCatalog:
+
+    """
+    SQLite database of the spatial and temporal extents of files with an R*Tree index
+
+    Attributes
+    ----------
+    path : str or pathlib.Path
+        The database file
+
+    Examples
+    --------
+    >>> catalog = ExtentCatalog("extents.sqlite")
+    >>> failed = catalog.build(paths, workers=8)
+    >>> catalog.query(bbox=(13.3, 52.4, 13.4, 52.5), start=datetime.datetime(2019, 7, 1), site="Berlin")
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.con = sqlite3.connect(str(path))
+        self.con.executescript(_schema)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.con.close()
+
+    def add(self, extents):
+        """
+        Stores extents as returned by file_extent. Earlier extents of the same files are replaced.
+
+        Parameters
+        ----------
+        extents : Iterable
+            dictionaries as returned by file_extent
+        """
+
+        with self.con:  # one transaction
+            for extent in extents:
+                old = self.con.execute("SELECT id FROM extents WHERE path = ?", (extent["path"],)).fetchone()
+                if old is not None:
+                    self.con.execute("DELETE FROM extents WHERE id = ?", old)
+                    self.con.execute("DELETE FROM extents_index WHERE id = ?", old)
+                file_id = self.con.execute("INSERT INTO extents (" + ", ".join('"' + i + '"' for i in _columns) +
+                                           ") VALUES (" + ", ".join(["?"] * len(_columns)) + ")",
+                                           [extent[i] for i in _columns]).lastrowid
+                # files without time get an unbounded time span in the index
+                self.con.execute("INSERT INTO extents_index VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                 (file_id, extent["min_lon"], extent["max_lon"], extent["min_lat"], extent["max_lat"],
+                                  -1e300 if extent["start"] is None else extent["start"],
+                                  1e300 if extent["end"] is None else extent["end"]))
+
+    def build(self, paths, workers=1, batch_size=100):
+        """
+        Reads the extents of files in parallel processes and stores them
+
+        Parameters
+        ----------
+        paths : Iterable
+            The files
+        workers : int
+            Number of processes. Default: 1 (no extra processes)
+        batch_size : int
+            Number of files written in one transaction
+
+        Returns
+        -------
+        dict: path -> error message of the files whose extent could not be read
+
+        """
+
+        failed = dict()
+        batch = list()
+
+        def collect(path, extent, error):
+            if error is not None:
+                failed[str(path)] = error
+                return
+            batch.append(extent)
+            if len(batch) >= batch_size:
+                self.add(batch)
+                batch.clear()
+
+        if workers <= 1:
+            for path in paths:
+                try:
+                    collect(path, file_extent(path), None)
+                except Exception as e:
+                    collect(path, None, type(e).__name__ + ": " + str(e))
+        else:
+            todo = iter(paths)
+            pending = dict()  # future -> path
+            exhausted = False
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+                while True:
+                    # keep a bounded number of files in flight, so that paths can be an endless generator
+                    while not exhausted and len(pending) < 2 * workers:
+                        path = next(todo, None)
+                        if path is None:
+                            exhausted = True
+                            break
+                        pending[executor.submit(file_extent, path)] = path
+                    if not pending:
+                        break
+                    done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        path = pending.pop(future)
+                        try:
+                            extent, error = future.result(), None
+                        except Exception as e:
+                            extent, error = None, type(e).__name__ + ": " + str(e)
+                        collect(path, extent, error)
+
+        self.add(batch)
+        return failed
+
+    def query(self, bbox=None, start=None, end=None, **attrs):
+        """
+        Returns the files that intersect a region and a time window
+
+        Parameters
+        ----------
+        bbox : tuple, optional
+            (min_lon, min_lat, max_lon, max_lat) in EPSG:4258
+        start : datetime.datetime or float, optional
+            Beginning of the time window (naive datetimes are UTC, floats are seconds since 1970-01-01 UTC)
+        end : datetime.datetime or float, optional
+            End of the time window
+        **attrs
+            Only files with these attributes (see extent_attributes), e.g. site="Berlin"
+
+        Returns
+        -------
+        list: dictionaries with the columns of the matching files, ordered by path
+
+        """
+
+        # the R*Tree stores 32-bit floats rounded outwards. It preselects the files, the exact test is done on the
+        # main table.
+        where = list()
+        params = list()
+        index_where = list()
+        index_params = list()
+        if bbox is not None:
+            min_lon, min_lat, max_lon, max_lat = bbox
+            index_where.append("i.max_lon >= ? AND i.min_lon <= ? AND i.max_lat >= ? AND i.min_lat <= ?")
+            index_params.extend([min_lon, max_lon, min_lat, max_lat])
+            where.append("e.max_lon >= ? AND e.min_lon <= ? AND e.max_lat >= ? AND e.min_lat <= ?")
+            params.extend([min_lon, max_lon, min_lat, max_lat])
+        if start is not None:
+            index_where.append("i.end >= ?")
+            index_params.append(_timestamp(start))
+            where.append("(e.end IS NULL OR e.end >= ?)")
+            params.append(_timestamp(start))
+        if end is not None:
+            index_where.append("i.start <= ?")
+            index_params.append(_timestamp(end))
+            where.append("(e.start IS NULL OR e.start <= ?)")
+            params.append(_timestamp(end))
+        for key, value in attrs.items():
+            if key not in extent_attributes:
+                raise ValueError("Unknown attribute '" + key + "'. Allowed: " + ", ".join(extent_attributes))
+            where.append('e."' + key + '" = ?')
+            params.append(value)
+
+        sql = "SELECT " + ", ".join('e."' + i + '"' for i in _columns) + " FROM extents e"
+        if index_where:
+            sql += " JOIN extents_index i ON i.id = e.id"
+        all_where = index_where + where
+        if all_where:
+            sql += " WHERE " + " AND ".join(all_where)
+        sql += " ORDER BY e.path"
+
+        rows = self.con.execute(sql, index_params + params).fetchall()
+        return [dict(zip(_columns, i)) for i in rows]
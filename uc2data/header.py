@@ -0,0 +1,219 @@
+import collections
+import mmap
+import types
+import numpy
+from . import netcdf3
+
+HDF5_SIGNATURE = b"\x89HDF\r\n\x1a\n"
+
+
+def sniff(path):
+    """
+    Determines the format of a file from its magic bytes without opening it as NetCDF
+
+    Unlike netcdf3.sniff this also finds the signature of HDF5 files with a user block (at byte 512, 1024, 2048, ...).
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        The file to check
+
+    Returns
+    -------
+    str: "NETCDF3_CLASSIC", "NETCDF3_64BIT_OFFSET", "NETCDF3_64BIT_DATA", "NETCDF4" or None if this is not a NetCDF file
+
+    """
+
+    with open(str(path), "rb") as f:
+        magic = f.read(8)
+        file_format = netcdf3.formats.get(magic[:4])
+        if file_format is not None:
+            return file_format
+        offset = 512
+        while True:
+            f.seek(offset)
+            magic = f.read(8)
+            if len(magic) < 8:
+                return None
+            if magic == HDF5_SIGNATURE:
+                return "NETCDF4"
+            offset *= 2
+
+
+class HeaderVariable:
+
+    """
+    Metadata of a variable without its data
+
+    Provides the parts of xarray.Variable that the checks of metadata use. Attributes can also be accessed as
+    attributes of the object, e.g. var.units.
+
+    Attributes
+    ----------
+    dims : tuple
+        Names of the dimensions
+    shape : tuple
+        Length of the dimensions
+    dtype : numpy.dtype
+        Data type
+    attrs : mappingproxy
+        Attributes of the variable (read-only)
+    """
+
+    def __init__(self, dims, shape, dtype, attrs):
+        self.dims = tuple(dims)
+        self.shape = tuple(shape)
+        self.dtype = dtype
+        self.attrs = types.MappingProxyType(attrs)  # read-only
+
+    @property
+    def ndim(self):
+        return len(self.dims)
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__["attrs"][name]
+        except KeyError:
+            raise AttributeError("'" + type(self).__name__ + "' object has no attribute '" + name + "'")
+
+
+class Header:
+
+    """
+    Global attributes, dimensions and variables of a NetCDF file without data
+
+    Provides the parts of xarray.Dataset that the checks of metadata use (see Dataset.metadata). Without data it
+    also replaces Dataset.ds in a header-only Dataset (see Dataset.from_header). Global attributes can also be accessed as attributes of the
+    object, e.g. header.site.
+
+    Attributes
+    ----------
+    format : str
+        File format (see sniff)
+    dims : mappingproxy
+        Dimension name -> length. Like in xarray only dimensions used by variables are listed.
+    unlimited : tuple
+        Names of the unlimited dimensions
+    attrs : mappingproxy
+        Global attributes
+    variables : mappingproxy
+        Variable name -> HeaderVariable
+
+    All mappings are read-only, so a Header can be shared by threads and checks without copying.
+    """
+
+    def __init__(self, file_format, unlimited, attrs, variables):
+        self.format = file_format
+        self.unlimited = tuple(unlimited)
+        self.attrs = types.MappingProxyType(attrs)
+        self.variables = types.MappingProxyType(variables)
+        dims = collections.OrderedDict()
+        for var in variables.values():
+            for name, length in zip(var.dims, var.shape):
+                dims.setdefault(name, length)
+        self.dims = types.MappingProxyType(dims)
+
+    def __getitem__(self, name):
+        return self.variables[name]
+
+    def __contains__(self, name):
+        return name in self.variables
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__["attrs"][name]
+        except KeyError:
+            raise AttributeError("'" + type(self).__name__ + "' object has no attribute '" + name + "'")
+
+    def close(self):
+        pass  # the file is closed after reading the header
+
+
+def snapshot(ds, file_format=None):
+    """
+    Copies the metadata of an xarray.Dataset into a Header
+
+    Reading metadata from the Header is much faster than from the xarray.Dataset, which creates new DataArray
+    objects on every access of a variable.
+
+    Parameters
+    ----------
+    ds : xarray.Dataset
+        The dataset (not decoded)
+    file_format : str, optional
+        The file format (see sniff)
+
+    Returns
+    -------
+    Header
+
+    """
+
+    variables = collections.OrderedDict((name, HeaderVariable(var.dims, var.shape, var.dtype,
+                                                              collections.OrderedDict(var.attrs)))
+                                        for name, var in ds.variables.items())
+    return Header(file_format, sorted(ds.encoding.get("unlimited_dims", [])), collections.OrderedDict(ds.attrs),
+                  variables)
+
+
+def _native(dtype):
+    if dtype is str:
+        return numpy.dtype(object)  # variable length strings of NetCDF4, like xarray
+    dtype = numpy.dtype(dtype)
+    return dtype if dtype.kind == "S" else dtype.newbyteorder("=")
+
+
+def read_header(path):
+    """
+    Reads global attributes, dimensions and variable attributes of a NetCDF file without reading data
+
+    NetCDF3 headers are parsed directly from a memory map of the file, NetCDF4 headers are read with netCDF4 which
+    only reads the metadata of the file.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        The file to read
+
+    Returns
+    -------
+    Header
+
+    Raises
+    ------
+    ValueError
+        If the file is not a NetCDF file
+
+    """
+
+    file_format = sniff(path)
+    if file_format is None:
+        raise ValueError("'" + str(path) + "' is not a NetCDF file.")
+
+    if file_format.startswith("NETCDF3"):
+        with open(str(path), "rb") as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            nc3 = netcdf3.read_header(buf)
+        finally:
+            buf.close()
+        variables = collections.OrderedDict(
+            (name, HeaderVariable(v.dims, v.shape, _native(v.dtype), v.attrs)) for name, v in nc3.variables.items())
+        return Header(file_format, [] if nc3.unlimited is None else [nc3.unlimited], nc3.attrs, variables)
+
+    import netCDF4
+    from .Dataset import nc_lock
+
+    with nc_lock:
+        nc = netCDF4.Dataset(str(path))
+        try:
+            unlimited = [name for name, dim in nc.dimensions.items() if dim.isunlimited()]
+            attrs = collections.OrderedDict((i, nc.getncattr(i)) for i in nc.ncattrs())
+            variables = collections.OrderedDict()
+            for name, var in nc.variables.items():
+                variables[name] = HeaderVariable(var.dimensions, var.shape, _native(var.dtype),
+                                                 collections.OrderedDict((i, var.getncattr(i))
+                                                                         for i in var.ncattrs()))
+        finally:
+            nc.close()
+    return Header(file_format, unlimited, attrs, variables)
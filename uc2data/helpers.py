@@ -1,26 +1,318 @@
 from .Dataset import Dataset
+from .Result import ResultCode, CheckResult
+from .pool import IsolatedPool
 from pathlib import Path
+import concurrent.futures
+import hashlib
+import heapq
+import os
+import time
 
 
-def check_multi(folder):
+def check_multi(folder, workers=1, timeout=None, max_rss=None, max_files=None, max_bytes=None):
+    """
+    Checks every *.nc file below folder and writes a *.check file with the errors and warnings next to it
+
+    With workers > 1 or any of the other options the files are checked in worker processes, so a file that hangs or
+    uses too much memory only gets a FATAL result (see check_many for the options).
+    """
+
+    isolated = workers > 1 or any(i is not None for i in [timeout, max_rss, max_files, max_bytes])
     pathlist = Path(folder).glob('**/*.nc')
 
-    for path in pathlist:
+    for path, result, timing in check_many(pathlist, workers=workers, mode="process" if isolated else "thread",
+                                           timeout=timeout, max_rss=max_rss, max_files=max_files,
+                                           max_bytes=max_bytes):
         outfile = Path(str(path).replace(".nc", ".check"))
 
-        try:
-            i_data = Dataset(path)
-            i_data.uc2_check()
-            print_me_err = str(i_data.check_result.errors)
-            print_me_warn = str(i_data.check_result.warnings)
+        if _is_fatal(result):
+            print_me = "Could not read file: "+str(path) + "\n" + str(result.errors)
+        else:
+            print_me_err = str(result.errors)
+            print_me_warn = str(result.warnings)
             if print_me_err != "" and print_me_warn != "":
                 connect = "\n"
             else:
                 connect = ""
             print_me = print_me_err + connect + print_me_warn
-        except Exception:
-            print_me = "Could not read file: "+str(path)
 
         text_file = open(str(outfile), "w")
         text_file.write(print_me)
         text_file.close()
+
+
+def _check_file(path, check_args=None, header_only=False):
+    """
+    Runs uc2_check on a single file. Used as the worker function of check_many.
+
+    Exceptions are not swallowed but turned into a FATAL result with the error message.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        The file to check
+    check_args : dict, optional
+        keyword arguments passed on to Dataset.uc2_check
+    header_only : bool
+        If True only the header of the file is read (see Dataset.from_header)
+
+    Returns
+    -------
+    tuple: (CheckResult, wall-clock time of the check in seconds)
+
+    """
+
+    start = time.perf_counter()
+    try:
+        with Dataset.from_header(path) if header_only else Dataset(path) as ds:
+            ds.uc2_check(**(check_args or {}))
+            result = ds.check_result
+    except Exception as e:
+        result = CheckResult(ResultCode.FATAL, "Could not check file '" + str(path) + "': " +
+                             type(e).__name__ + ": " + str(e))
+    return result, time.perf_counter() - start
+
+
+def _cache_key(path, check_args=None):
+    """
+    Returns the key under which the result of a file is cached. Changes if the file is modified
+    or if it is checked with other options.
+    """
+
+    try:
+        st = os.stat(str(path))
+    except OSError:
+        return None  # let the check itself report the problem
+    key = str(path) + ":" + str(st.st_mtime_ns) + ":" + str(st.st_size)
+    if check_args:
+        key += ":" + repr(sorted(check_args.items()))
+    return key
+
+
+def _is_fatal(result):
+    """
+    Returns True if the check of a file could not be performed (results of these are not cached)
+    """
+
+    return any(i.result == ResultCode.FATAL for i in result.result)
+
+
+def check_many(paths, workers=1, mode="thread", cache=None, timeout=None, cancel=None, max_errors=None,
+               only=None, skip=None, header_only=False, max_rss=None, max_files=None, max_bytes=None):
+    """
+    Checks many files and yields the results in the order the checks complete
+
+    Parameters
+    ----------
+    paths : Iterable
+        The files to check (str or pathlib.Path). Consumed lazily, so generators are fine.
+    workers : int
+        Number of files checked at the same time. With workers=1 and mode "thread" files are checked one after
+        another in the calling thread.
+    mode : str
+        "thread" or "process". Backend used to check files in parallel. With "process" every file is checked in a
+        worker process that is killed if it exceeds timeout or max_rss, so one broken file cannot stop the run
+        (see pool.IsolatedPool).
+    cache : MutableMapping, optional
+        Mapping (e.g. dict or shelve) that stores results. Files that were not modified since
+        their result was stored are not checked again.
+    timeout : float, optional
+        Maximum wall-clock time in seconds for a single file (mode "process"). If exceeded, a FATAL result is
+        yielded for the file and its worker process is killed. Not available with threads, because a running
+        thread cannot be stopped.
+    cancel : threading.Event, optional
+        If set, no further files are started and pending checks are cancelled.
+        Closing the iterator has the same effect.
+    max_errors : int, optional
+        Stop checking a file after this many errors (see Dataset.uc2_check). Use 1 to only find out which files
+        are broken.
+    only : list, optional
+        Check groups to run (see Dataset.uc2_check)
+    skip : list, optional
+        Check groups not to run (see Dataset.uc2_check)
+    header_only : bool
+        If True only the headers of the files are read and only global attributes and dimensions are checked
+        (see Dataset.from_header)
+    max_rss : int, optional
+        Maximum resident memory of a worker process in bytes (mode "process", Linux only). If exceeded, a FATAL
+        result is yielded for the file and the worker is killed.
+    max_files : int, optional
+        Worker processes are replaced after checking this many files (mode "process")
+    max_bytes : int, optional
+        Worker processes are replaced after checking files of this total size in bytes (mode "process")
+
+    Yields
+    ------
+    tuple: (path, CheckResult, timing) with timing being the wall-clock time of the check in seconds
+
+    Examples
+    --------
+    >>> for path, result, timing in uc2data.check_many(paths, workers=4):
+    ...     if not result:
+    ...         print(path, result.errors)
+
+    """
+
+    if mode not in ["thread", "process"]:
+        raise ValueError("Unexpected mode '" + str(mode) + "'. Must be 'thread' or 'process'.")
+    if workers < 1:
+        raise ValueError("workers must be at least 1, got " + str(workers) + ".")
+    if mode == "thread" and (timeout is not None or max_rss is not None or max_files is not None or
+                             max_bytes is not None):
+        raise ValueError("timeout, max_rss, max_files and max_bytes need mode 'process'.")
+
+    Dataset.schedule_groups(only, skip, cheap_only=header_only)  # fail early on unknown check groups
+    check_args = {k: v for k, v in [("max_errors", max_errors), ("only", only), ("skip", skip)] if v is not None}
+    cache_args = dict(check_args, header_only=True) if header_only else check_args
+    todo = iter(paths)
+
+    def from_cache(path):
+        if cache is None:
+            return None, None
+        key = _cache_key(path, cache_args)
+        return key, None if key is None else cache.get(key)
+
+    if mode == "process":
+        yield from _check_isolated(todo, from_cache, cache, cancel, check_args, header_only,
+                                   IsolatedPool(workers, timeout, max_rss, max_files, max_bytes))
+        return
+
+    if workers <= 1:
+        for path in todo:
+            if cancel is not None and cancel.is_set():
+                return
+            key, result = from_cache(path)
+            if result is not None:
+                yield path, result, 0.
+                continue
+            result, timing = _check_file(path, check_args, header_only)
+            if key is not None and not _is_fatal(result):
+                cache[key] = result
+            yield path, result, timing
+        return
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    pending = dict()  # future -> (path, cache key)
+    exhausted = False
+    try:
+        while True:
+            if cancel is not None and cancel.is_set():
+                return
+
+            # keep a bounded number of files in flight, so that paths can be an endless generator
+            while not exhausted and len(pending) < 2 * workers:
+                path = next(todo, None)
+                if path is None:
+                    exhausted = True
+                    break
+                key, result = from_cache(path)
+                if result is not None:
+                    yield path, result, 0.
+                    continue
+                pending[executor.submit(_check_file, path, check_args, header_only)] = (path, key)
+
+            if not pending:
+                return
+
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+
+            for future in done:
+                path, key = pending.pop(future)
+                try:
+                    result, timing = future.result()
+                except Exception as e:
+                    result, timing = CheckResult(ResultCode.FATAL, "Could not check file '" + str(path) + "': " +
+                                                 type(e).__name__ + ": " + str(e)), 0.
+                if key is not None and not _is_fatal(result):
+                    cache[key] = result
+                yield path, result, timing
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def _check_isolated(todo, from_cache, cache, cancel, check_args, header_only, pool):
+    """
+    Process backend of check_many: checks files in an IsolatedPool and yields (path, CheckResult, timing)
+    """
+
+    keys = dict()  # path -> cache key, taken before the check like in the thread backend
+    exhausted = False
+    with pool:
+        while True:
+            if cancel is not None and cancel.is_set():
+                return
+
+            # keep a bounded number of files in flight, so that paths can be an endless generator
+            while not exhausted and pool.busy < 2 * pool.workers:
+                path = next(todo, None)
+                if path is None:
+                    exhausted = True
+                    break
+                key, result = from_cache(path)
+                if result is not None:
+                    yield path, result, 0.
+                    continue
+                keys[path] = key
+                pool.submit(path, check_args, header_only)
+
+            if not pool.busy:
+                return
+
+            for path, result, timing in pool.wait(timeout=1.):
+                key = keys.pop(path, None)
+                if key is not None and not _is_fatal(result):
+                    cache[key] = result
+                yield path, result, timing
+
+
+def shard(paths, index, count, base=None):
+    """
+    Returns the part of paths that belongs to one of count shards
+
+    Files are distributed so that the shards have about the same total file size: the largest files are assigned
+    first, each to the shard with the smallest total so far. Files of the same size are ordered by a hash of their path
+    relative to base. Every node that sees the same files gets the same shards, so nodes can split the work without
+    talking to each other.
+
+    Parameters
+    ----------
+    paths : Iterable
+        The files (str or pathlib.Path)
+    index : int
+        Number of the shard, starting at 0
+    count : int
+        Total number of shards
+    base : str or pathlib.Path, optional
+        Paths are hashed relative to this directory, so that nodes with different mount points agree.
+
+    Returns
+    -------
+    list: the paths of the shard in their original order
+
+    """
+
+    if not 0 <= index < count:
+        raise ValueError("Shard " + str(index) + " does not exist. Must be between 0 and " + str(count - 1) + ".")
+
+    paths = list(paths)
+
+    def sort_key(i):
+        try:
+            size = os.path.getsize(str(i))
+        except OSError:
+            size = 0
+        name = Path(os.path.relpath(str(i), str(base)) if base is not None else str(i)).as_posix()
+        return -size, hashlib.md5(name.encode("utf-8")).hexdigest()
+
+    keys = {i: sort_key(path) for i, path in enumerate(paths)}
+    totals = [(0, i) for i in range(count)]  # heap of (total size, shard)
+    mine = list()
+    for i in sorted(keys, key=keys.get):
+        total, this_shard = heapq.heappop(totals)
+        if this_shard == index:
+            mine.append(i)
+        heapq.heappush(totals, (total - keys[i][0], this_shard))
+
+    return [paths[i] for i in sorted(mine)]
@@ -0,0 +1,159 @@
+import collections
+import concurrent.futures
+import os
+from pathlib import Path
+from .Dataset import Dataset
+from .Result import ResultCode, CheckResult
+
+NamePlan = collections.namedtuple("NamePlan", ["path", "target", "result"])
+
+
+def _abspath(path):
+    return Path(os.path.abspath(str(path)))
+
+
+def _plan_name(path):
+    """
+    Returns the results of the filename attributes of a file and its canonical name (None if it has none)
+    """
+
+    try:
+        with Dataset.from_header(path) as ds:
+            result = ds.check_filename_attributes()
+            if not result:
+                return result, None
+            ds.check_result = result  # filename uses these results instead of checking again
+            return result, ds.filename
+    except Exception as e:
+        return CheckResult(ResultCode.FATAL, "Could not read file '" + str(path) + "': " +
+                           type(e).__name__ + ": " + str(e)), None
+
+
+def plan_names(paths, workers=1):
+    """
+    Computes the canonical UC2 filenames of many files
+
+    Only the headers of the files are read and only the global attributes that make up the filename are checked
+    (see Dataset.check_filename_attributes), so this is much faster than Dataset.filename after uc2_check.
+
+    Parameters
+    ----------
+    paths : Iterable
+        The files (str or pathlib.Path)
+    workers : int
+        Number of processes that read files in parallel. Default: 1 (no extra processes)
+
+    Returns
+    -------
+    list: NamePlan(path, target, result) in the order of paths. target is the path with the canonical filename in
+    the same directory or None if the attributes did not pass the checks. result contains the results of the
+    attributes.
+
+    """
+
+    paths = [Path(i) for i in paths]
+    if workers <= 1:
+        results = map(_plan_name, paths)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_plan_name, paths, chunksize=16))
+
+    return [NamePlan(path, None if name is None else path.parent / name, result)
+            for path, (result, name) in zip(paths, results)]
+
+
+def find_collisions(plan):
+    """
+    Finds files that would get the same name
+
+    Parameters
+    ----------
+    plan : list
+        NamePlan entries as returned by plan_names
+
+    Returns
+    -------
+    dict: target -> list of the paths that would be renamed to it. Includes files that already have the name and are
+    not renamed themselves. Targets used by only one file are not listed.
+
+    """
+
+    moved = {_abspath(i.path) for i in plan if i.target is not None and i.target != i.path}
+
+    claims = collections.OrderedDict()
+    for entry in plan:
+        if entry.target is not None:
+            claims.setdefault(_abspath(entry.target), list()).append(entry.path)
+
+    collisions = collections.OrderedDict()
+    for target, paths in claims.items():
+        if target.exists() and target not in moved and target not in [_abspath(i) for i in paths]:
+            paths = [target] + paths  # a file that keeps its name already has this name
+        if len(paths) > 1:
+            collisions[target] = paths
+    return collisions
+
+
+def apply_renames(plan, collisions=None):
+    """
+    Renames files to their canonical names without ever replacing an existing file
+
+    Each file gets a hard link with the new name (which fails if the name exists) and then the old name is removed.
+    Files that are renamed to a name that is freed by another rename are handled in the right order. Files with
+    collisions (see find_collisions) are not renamed.
+
+    Parameters
+    ----------
+    plan : list
+        NamePlan entries as returned by plan_names
+    collisions : dict, optional
+        The result of find_collisions(plan). Computed if not given.
+
+    Returns
+    -------
+    tuple: (list of (path, target) of the renamed files, dict path -> error message of the files that could not be
+    renamed)
+
+    """
+
+    if collisions is None:
+        collisions = find_collisions(plan)
+    blocked = {_abspath(i) for i in collisions}
+
+    failed = collections.OrderedDict()
+    todo = list()
+    for entry in plan:
+        if entry.target is None or entry.target == entry.path:
+            continue
+        if _abspath(entry.target) in blocked:
+            failed[entry.path] = "Another file would get the name '" + entry.target.name + "'."
+        else:
+            todo.append(entry)
+
+    renamed = list()
+    while todo:
+        waiting = list()
+        for entry in todo:
+            try:
+                os.link(str(entry.path), str(entry.target))
+            except FileExistsError:
+                waiting.append(entry)  # maybe the name is freed by another rename
+                continue
+            except OSError as e:
+                failed[entry.path] = type(e).__name__ + ": " + str(e)
+                continue
+            try:
+                os.unlink(str(entry.path))
+            except OSError as e:
+                os.unlink(str(entry.target))
+                failed[entry.path] = type(e).__name__ + ": " + str(e)
+                continue
+            renamed.append((entry.path, entry.target))
+
+        if len(waiting) == len(todo):  # no progress, e.g. two files that swap names
+            for entry in waiting:
+                failed[entry.path] = "File '" + str(entry.target) + "' exists."
+            break
+        todo = waiting
+
+    return renamed, failed
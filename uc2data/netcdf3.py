@@ -0,0 +1,243 @@
+import collections
+import mmap
+import numpy
+
+# magic bytes at the start of a file and the corresponding file format
+formats = {
+    b"CDF\x01": "NETCDF3_CLASSIC",
+    b"CDF\x02": "NETCDF3_64BIT_OFFSET",
+    b"CDF\x05": "NETCDF3_64BIT_DATA",
+    b"\x89HDF": "NETCDF4",
+}
+
+# netCDF external types (big endian)
+nc_types = {
+    1: numpy.dtype(">i1"),
+    2: numpy.dtype("S1"),
+    3: numpy.dtype(">i2"),
+    4: numpy.dtype(">i4"),
+    5: numpy.dtype(">f4"),
+    6: numpy.dtype(">f8"),
+    7: numpy.dtype(">u1"),
+    8: numpy.dtype(">u2"),
+    9: numpy.dtype(">u4"),
+    10: numpy.dtype(">i8"),
+    11: numpy.dtype(">u8"),
+}
+
+NC_DIMENSION = 10
+NC_VARIABLE = 11
+NC_ATTRIBUTE = 12
+STREAMING = 0xFFFFFFFF
+
+Variable = collections.namedtuple("Variable", ["name", "dims", "shape", "dtype", "attrs", "vsize", "begin",
+                                               "is_record"])
+Header = collections.namedtuple("Header", ["format", "numrecs", "dims", "unlimited", "attrs", "variables",
+                                           "recsize"])
+
+
+def sniff(path):
+    """
+    Determines the format of a NetCDF file from its magic bytes
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        The file to check
+
+    Returns
+    -------
+    str: "NETCDF3_CLASSIC", "NETCDF3_64BIT_OFFSET", "NETCDF3_64BIT_DATA", "NETCDF4" or None if this is not a NetCDF file
+
+    """
+
+    with open(str(path), "rb") as f:
+        return formats.get(f.read(4))
+
+
+class _Reader:
+
+    """
+    Reads the big endian, 4-byte aligned items of a NetCDF3 header from a buffer
+    """
+
+    def __init__(self, buf):
+        self.buf = buf
+        self.pos = 4
+        version = bytes(buf[3:4])
+        self.big = version == b"\x05"  # 64-bit counts
+        self.big_offset = version in [b"\x02", b"\x05"]  # 64-bit offsets
+
+    def int(self, size=4):
+        value = int.from_bytes(self.buf[self.pos:self.pos + size], "big")
+        self.pos += size
+        return value
+
+    def count(self):
+        return self.int(8 if self.big else 4)
+
+    def padded(self, size):
+        out = bytes(self.buf[self.pos:self.pos + size])
+        self.pos += size + (-size % 4)
+        return out
+
+    def name(self):
+        return self.padded(self.count()).decode("utf-8")
+
+    def list(self, tag, read_item):
+        this_tag = self.int()
+        n = self.count()
+        if this_tag == 0 and n == 0:
+            return []  # ABSENT
+        if this_tag != tag:
+            raise ValueError("Corrupt NetCDF3 header at byte " + str(self.pos))
+        return [read_item() for _ in range(n)]
+
+    def attribute(self):
+        name = self.name()
+        dtype = nc_types[self.int()]
+        n = self.count()
+        raw = self.padded(n * dtype.itemsize)
+        if dtype.kind == "S":
+            value = raw.rstrip(b"\x00").decode("utf-8")
+        else:
+            value = numpy.frombuffer(raw, dtype=dtype).astype(dtype.newbyteorder("="))
+            if len(value) == 1:
+                value = value[0]
+        return name, value
+
+    def dimension(self):
+        return self.name(), self.count()
+
+
+def read_header(buf):
+    """
+    Parses the header of a NetCDF3 file (classic, 64-bit offset or 64-bit data)
+
+    Parameters
+    ----------
+    buf : bytes-like
+        The content of the file (e.g. a mmap). Only the header needs to be present.
+
+    Returns
+    -------
+    Header: format, number of records, dimensions (OrderedDict name -> length), name of unlimited dimension (or None),
+    global attributes, variables (OrderedDict name -> Variable) and size of one record in bytes
+
+    """
+
+    file_format = formats.get(bytes(buf[:4]))
+    if file_format is None or file_format == "NETCDF4":
+        raise ValueError("Not a NetCDF3 file.")
+
+    reader = _Reader(buf)
+    numrecs = reader.count()
+
+    dim_list = reader.list(NC_DIMENSION, reader.dimension)
+    unlimited = None
+    for dim_name, dim_len in dim_list:
+        if dim_len == 0:
+            unlimited = dim_name
+    dim_names = [i[0] for i in dim_list]
+
+    attrs = collections.OrderedDict(reader.list(NC_ATTRIBUTE, reader.attribute))
+
+    def variable():
+        name = reader.name()
+        ndims = reader.count()
+        dims = tuple(dim_names[reader.count()] for _ in range(ndims))
+        var_attrs = collections.OrderedDict(reader.list(NC_ATTRIBUTE, reader.attribute))
+        dtype = nc_types[reader.int()]
+        vsize = reader.count()
+        begin = reader.int(8 if reader.big_offset else 4)
+        is_record = len(dims) > 0 and dims[0] == unlimited
+        shape = tuple(dim_list[dim_names.index(d)][1] for d in dims)
+        return Variable(name, dims, shape, dtype, var_attrs, vsize, begin, is_record)
+
+    variables = collections.OrderedDict((v.name, v) for v in reader.list(NC_VARIABLE, variable))
+
+    record_vars = [v for v in variables.values() if v.is_record]
+    if len(record_vars) == 1:
+        # special case: a single record variable is not padded between records
+        v = record_vars[0]
+        recsize = int(numpy.prod(v.shape[1:], dtype=numpy.int64)) * v.dtype.itemsize
+    else:
+        recsize = sum(v.vsize for v in record_vars)
+
+    if numrecs == STREAMING or (reader.big and numrecs == 2 ** 64 - 1):
+        # number of records unknown. Derive it from the file size
+        if record_vars and recsize > 0:
+            numrecs = (len(buf) - min(v.begin for v in record_vars)) // recsize
+        else:
+            numrecs = 0
+
+    dims = collections.OrderedDict((name, numrecs if name == unlimited else length) for name, length in dim_list)
+    for name, v in variables.items():
+        if v.is_record:
+            variables[name] = v._replace(shape=(numrecs,) + v.shape[1:])
+
+    return Header(file_format, numrecs, dims, unlimited, attrs, variables, recsize)
+
+
+def arrays(buf, header=None):
+    """
+    Returns read-only numpy views of all variables of a NetCDF3 file without copying data
+
+    Parameters
+    ----------
+    buf : bytes-like
+        The complete content of the file, e.g. a read-only mmap (see open_arrays) or bytes
+    header : Header, optional
+        The result of read_header(buf). Read from buf if not given.
+
+    Returns
+    -------
+    dict: variable name -> numpy.ndarray in big endian byte order
+
+    """
+
+    if header is None:
+        header = read_header(buf)
+
+    out = dict()
+    for name, v in header.variables.items():
+        if 0 in v.shape:
+            out[name] = numpy.empty(v.shape, dtype=v.dtype)
+            continue
+
+        # C order within a record. Consecutive records of a variable are recsize bytes apart.
+        strides = list()
+        stride = v.dtype.itemsize
+        for length in reversed(v.shape[1:] if v.is_record else v.shape):
+            strides.insert(0, stride)
+            stride *= length
+        if v.is_record:
+            strides.insert(0, header.recsize)
+
+        arr = numpy.ndarray(v.shape, dtype=v.dtype, buffer=buf, offset=v.begin, strides=tuple(strides))
+        arr.flags.writeable = False
+        out[name] = arr
+    return out
+
+
+def open_arrays(path):
+    """
+    Memory-maps a NetCDF3 file and returns read-only views of all its variables
+
+    The data is read from the page cache when accessed. Nothing is copied.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        The NetCDF3 file
+
+    Returns
+    -------
+    tuple: (Header, dict of variable name -> numpy.ndarray)
+
+    """
+
+    with open(str(path), "rb") as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    header = read_header(buf)
+    return header, arrays(buf, header)
@@ -0,0 +1,231 @@
+import collections
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import time
+from .Result import ResultCode, CheckResult
+
+
+def _rss(pid):
+    """
+    Returns the resident memory of a process in bytes or None if it is unknown (only available with /proc)
+    """
+
+    try:
+        with open("/proc/" + str(pid) + "/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _worker(conn, max_files, max_bytes):
+    """
+    Main function of a worker process: checks files until it is told to stop or has checked enough files or bytes
+    """
+
+    from .helpers import _check_file
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C is handled by the main process
+    files = 0
+    size = 0
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        path, check_args, header_only = task
+        result, timing = _check_file(path, check_args, header_only)
+        files += 1
+        try:
+            size += os.path.getsize(str(path))
+        except OSError:
+            pass
+        retire = (max_files is not None and files >= max_files) or (max_bytes is not None and size >= max_bytes)
+        conn.send((result, timing, retire))
+        if retire:
+            return
+
+
+class _Slot:
+
+    """
+    A worker process and the file it is checking
+    """
+
+    def __init__(self, context, max_files, max_bytes):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_worker, args=(child, max_files, max_bytes), daemon=True)
+        self.process.start()
+        child.close()
+        self.task = None  # (path, time the check started)
+
+    def kill(self):
+        self.conn.close()
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+
+
+class IsolatedPool:
+
+    """
+    Checks files in worker processes that are killed if they take too long or use too much memory
+
+    Unlike concurrent.futures.ProcessPoolExecutor a worker that hangs (e.g. in the cfchecker) or uses too much memory
+    is killed and replaced and only its file gets a FATAL result. Workers are also replaced after they checked a
+    number of files or bytes, which limits memory leaks in HDF5 and netCDF4. Used by check_many with mode="process".
+
+    Parameters
+    ----------
+    workers : int
+        Number of worker processes
+    timeout : float, optional
+        Maximum wall-clock time in seconds for a single file
+    max_rss : int, optional
+        Maximum resident memory of a worker in bytes. Checked every poll interval. Only available with /proc (Linux).
+    max_files : int, optional
+        A worker is replaced after it checked this many files
+    max_bytes : int, optional
+        A worker is replaced after it checked files with this total size in bytes
+
+    Examples
+    --------
+    >>> with IsolatedPool(4, timeout=600, max_rss=8 * 1024 ** 3, max_files=100) as pool:
+    ...     pool.submit("file.nc")
+    ...     while pool.busy:
+    ...         for path, result, timing in pool.wait(1.):
+    ...             print(path, result.errors)
+
+    """
+
+    def __init__(self, workers, timeout=None, max_rss=None, max_files=None, max_bytes=None):
+        if workers < 1:
+            raise ValueError("workers must be at least 1, got " + str(workers) + ".")
+        self.workers = workers
+        self.timeout = timeout
+        self.max_rss = max_rss
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self._context = multiprocessing.get_context()
+        self._slots = list()
+        self._queue = collections.deque()  # (path, check_args, header_only) waiting for a worker
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def busy(self):
+        """
+        Number of files that are checked or waiting to be checked
+        """
+
+        return len(self._queue) + sum(1 for i in self._slots if i.task is not None)
+
+    def submit(self, path, check_args=None, header_only=False):
+        """
+        Adds a file to be checked (see helpers._check_file for the arguments)
+        """
+
+        self._queue.append((path, check_args, header_only))
+        self._dispatch()
+
+    def _dispatch(self):
+        for slot in [i for i in self._slots if i.task is None and not i.process.is_alive()]:
+            self._replace(slot)  # died while idle
+        for slot in self._slots:
+            if not self._queue:
+                return
+            if slot.task is None:
+                self._start(slot)
+        while self._queue and len(self._slots) < self.workers:
+            slot = _Slot(self._context, self.max_files, self.max_bytes)
+            self._slots.append(slot)
+            self._start(slot)
+
+    def _start(self, slot):
+        task = self._queue.popleft()
+        slot.task = (task[0], time.perf_counter())
+        slot.conn.send(task)
+
+    def _replace(self, slot):
+        slot.kill()
+        self._slots.remove(slot)
+
+    def _fail(self, slot, message):
+        path, start = slot.task
+        self._replace(slot)
+        return path, CheckResult(ResultCode.FATAL, "Could not check file '" + str(path) + "': " + message), \
+            time.perf_counter() - start
+
+    def wait(self, timeout=None):
+        """
+        Waits up to timeout seconds for checks to finish
+
+        Returns
+        -------
+        list: (path, CheckResult, timing) of the finished files. Files whose worker was killed get a FATAL result.
+
+        """
+
+        poll = 0.2 if self.timeout is not None or self.max_rss is not None else None
+        if poll is not None:
+            timeout = poll if timeout is None else min(timeout, poll)
+
+        running = [i for i in self._slots if i.task is not None]
+        ready = multiprocessing.connection.wait([i.conn for i in running] + [i.process.sentinel for i in running],
+                                                timeout=timeout)
+        done = list()
+        for slot in running:
+            if slot.conn in ready:
+                try:
+                    result, timing, retire = slot.conn.recv()
+                except (EOFError, OSError):
+                    pass  # died while sending. Handled below
+                else:
+                    done.append((slot.task[0], result, timing))
+                    slot.task = None
+                    if retire:
+                        self._replace(slot)
+                    continue
+            if slot.process.sentinel in ready or not slot.process.is_alive():
+                slot.process.join(1.)  # for the exit code
+                done.append(self._fail(slot, "Worker process died (exit code " + str(slot.process.exitcode) +
+                                             "), e.g. because it ran out of memory."))
+
+        now = time.perf_counter()
+        for slot in [i for i in self._slots if i.task is not None]:
+            if self.timeout is not None and now - slot.task[1] > self.timeout:
+                done.append(self._fail(slot, "Timed out after " + str(self.timeout) + " s."))
+            elif self.max_rss is not None:
+                rss = _rss(slot.process.pid)
+                if rss is not None and rss > self.max_rss:
+                    done.append(self._fail(slot, "Used " + str(rss // 1024 ** 2) + " MB of memory, more than the "
+                                                 "limit of " + str(self.max_rss // 1024 ** 2) + " MB."))
+
+        self._dispatch()
+        return done
+
+    def close(self):
+        """
+        Stops all workers. Files that are still checked or waiting are dropped.
+        """
+
+        self._queue.clear()
+        for slot in self._slots:
+            if slot.task is None:
+                try:
+                    slot.conn.send(None)
+                except OSError:
+                    pass
+        deadline = time.perf_counter() + 1.
+        for slot in self._slots:
+            if slot.task is None:
+                slot.process.join(max(0., deadline - time.perf_counter()))
+            slot.kill()
+        self._slots = list()
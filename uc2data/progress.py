@@ -0,0 +1,163 @@
+import datetime
+import json
+import sys
+import time
+from .Result import ResultCode
+
+
+def _duration(seconds):
+    return str(datetime.timedelta(seconds=int(seconds)))
+
+
+class Progress:
+
+    """
+    Reports throughput, elapsed time and estimated remaining time of a check of many files
+
+    On a terminal one status line is refreshed in place. Otherwise (e.g. output to a log file) a json line is written
+    every interval seconds. Calling update reads the clock and walks the results of the file once, so it does not slow
+the check.
+
+    Attributes
+    ----------
+    total_files : int
+        Number of files to check (if known)
+    total_bytes : int
+        Total size of the files to check (if known). The remaining time is estimated from it.
+    files : int
+        Number of checked files
+    bytes : int
+        Total size of the checked files
+    errors : int
+        Number of errors found so far
+    warnings : int
+        Number of warnings found so far
+
+    Examples
+    --------
+    >>> progress = Progress(total_files=len(paths), total_bytes=sum(os.path.getsize(i) for i in paths))
+    >>> for path, result, timing in uc2data.check_many(paths):
+    ...     progress.update(os.path.getsize(path), result)
+    >>> progress.close()
+
+    """
+
+    def __init__(self, total_files=None, total_bytes=None, stream=None, interval=None):
+        """
+        Creates a Progress object
+
+        Parameters
+        ----------
+        total_files : int, optional
+            Number of files to check
+        total_bytes : int, optional
+            Total size of the files to check
+        stream : file-like, optional
+            Where to write the progress. Default: sys.stderr
+        interval : float, optional
+            Seconds between two reports. Default: 0.5 on a terminal, 10 otherwise
+        """
+
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.stream = sys.stderr if stream is None else stream
+        self.tty = hasattr(self.stream, "isatty") and self.stream.isatty()
+        if interval is None:
+            interval = 0.5 if self.tty else 10.
+        self.interval = interval
+
+        self.files = 0
+        self.bytes = 0
+        self.errors = 0
+        self.warnings = 0
+        self.start = time.monotonic()
+        self._last_report = self.start
+        self._line_length = 0
+
+    def update(self, nbytes=0, result=None):
+        """
+        Counts a checked file and reports the progress if the last report is older than interval
+
+        Parameters
+        ----------
+        nbytes : int
+            Size of the file
+        result : CheckResult, optional
+            The results of the file. Used to count errors and warnings.
+        """
+
+        self.files += 1
+        self.bytes += nbytes
+        if result is not None:
+            for _, code, _ in result.iter_items(ResultCode.WARNING):  # one walk for errors and warnings
+                if code == ResultCode.WARNING:
+                    self.warnings += 1
+                else:
+                    self.errors += 1
+
+        now = time.monotonic()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            self.report(now)
+
+    def status(self, now=None):
+        """
+        Returns the current progress as dictionary
+
+        Keys: files, total_files, bytes, total_bytes, files_per_s, mb_per_s, elapsed_s, eta_s, errors, warnings.
+        eta_s is None if the total size or the throughput is not known yet.
+        """
+
+        elapsed = (time.monotonic() if now is None else now) - self.start
+        bytes_per_s = self.bytes / elapsed if elapsed > 0 else 0.
+        eta = None
+        if self.total_bytes is not None and bytes_per_s > 0:
+            eta = max(self.total_bytes - self.bytes, 0) / bytes_per_s
+        elif self.total_files is not None and self.files > 0:
+            eta = max(self.total_files - self.files, 0) * elapsed / self.files
+
+        return {
+            "files": self.files,
+            "total_files": self.total_files,
+            "bytes": self.bytes,
+            "total_bytes": self.total_bytes,
+            "files_per_s": round(self.files / elapsed, 3) if elapsed > 0 else 0.,
+            "mb_per_s": round(bytes_per_s / 1e6, 3),
+            "elapsed_s": round(elapsed, 1),
+            "eta_s": None if eta is None else round(eta, 1),
+            "errors": self.errors,
+            "warnings": self.warnings,
+        }
+
+    def report(self, now=None):
+        """
+        Writes the current progress
+        """
+
+        status = self.status(now)
+        if not self.tty:
+            self.stream.write(json.dumps(status) + "\n")
+            self.stream.flush()
+            return
+
+        files = str(status["files"])
+        if status["total_files"] is not None:
+            files += "/" + str(status["total_files"])
+        line = files + " files  " + \
+            "{:.2f} files/s  {:.1f} MB/s  ".format(status["files_per_s"], status["mb_per_s"]) + \
+            "elapsed " + _duration(status["elapsed_s"]) + "  " + \
+            "ETA " + ("?" if status["eta_s"] is None else _duration(status["eta_s"])) + "  " + \
+            "errors " + str(status["errors"]) + "  warnings " + str(status["warnings"])
+        self.stream.write("\r" + line.ljust(self._line_length))
+        self.stream.flush()
+        self._line_length = len(line)
+
+    def close(self):
+        """
+        Writes the final progress
+        """
+
+        self.report()
+        if self.tty:
+            self.stream.write("\n")
+            self.stream.flush()
@@ -0,0 +1,200 @@
+import collections
+import concurrent.futures
+import datetime
+import math
+from pathlib import Path
+from . import header
+from .Dataset import Dataset
+from .Result import ResultCode, CheckResult
+from .extents import parse_origin_time
+
+# global attributes that identify the files of one LTO time series
+series_attributes = ["campaign", "location", "site", "acronym", "data_content"]
+
+# minimum time step of LTO data in seconds
+lto_min_step = 1800
+
+SeriesFile = collections.namedtuple("SeriesFile", ["path", "key", "origin", "edges", "error"])
+
+
+def _row_edges(values, fill_value):
+    """
+    Returns the first, second, second to last and last valid value of a 1-dimensional array (nan if missing)
+    """
+
+    valid = values[values != fill_value]
+    head = valid[:2].tolist()
+    tail = valid[-2:].tolist()
+    return head + [math.nan] * (2 - len(head)), [math.nan] * (2 - len(tail)) + tail
+
+
+def time_edges(ds, fill_value=-9999):
+    """
+    Reads the first two and the last two times of every station of a file in seconds since 1970-01-01 UTC
+
+    The time variable is read block by block (see Dataset.iter_blocks), so memory use does not depend on the length
+    of the file. Only the edges are kept.
+
+    Parameters
+    ----------
+    ds : Dataset
+        The file
+    fill_value : float
+        Times equal to this value are skipped. Default: -9999
+
+    Returns
+    -------
+    list: one tuple (first, second, second to last, last) per station (one tuple for 1-dimensional time). Missing
+    times are nan.
+
+    """
+
+    origin = parse_origin_time(ds.metadata.origin_time).timestamp()
+    if ds.metadata["time"].ndim == 1:
+        head = list()
+        tail = list()
+        for block in ds.iter_blocks("time"):
+            valid = block[block != fill_value]
+            head.extend(valid[:2 - len(head)].tolist())
+            tail = (tail + valid[-2:].tolist())[-2:]
+        rows = [(head + [math.nan] * (2 - len(head)), [math.nan] * (2 - len(tail)) + tail)]
+    else:  # (station, ntime) or (traj, ntime): blocks are along the stations
+        rows = list()
+        for block in ds.iter_blocks("time"):
+            rows.extend(_row_edges(i, fill_value) for i in block.reshape(block.shape[0], -1))
+
+    return [tuple(origin + i for i in head + tail) for head, tail in rows]
+
+
+def _series_file(path):
+    """
+    Returns the SeriesFile of a file. Files of other campaigns than LTO get the key None and are not read.
+    """
+
+    try:
+        head = header.read_header(path)
+        if head.attrs.get("campaign") != "LTO":
+            return SeriesFile(path, None, None, None, None)
+        key = tuple(str(head.attrs.get(i)) for i in series_attributes)
+        origin = parse_origin_time(head.attrs["origin_time"])
+        with Dataset(path, cache_size=0) as ds:
+            edges = time_edges(ds)
+        return SeriesFile(path, key, origin, edges, None)
+    except Exception as e:
+        return SeriesFile(path, None, None, None, "Could not read file '" + str(path) + "': " +
+                          type(e).__name__ + ": " + str(e))
+
+
+def _format_time(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S +00")
+
+
+def _format_step(step):
+    return (str(int(step)) if step == int(step) else str(step)) + " s"
+
+
+def _check_boundary(result, previous, current, station, max_gap):
+    """
+    Checks the step from the last time of a station in the previous file to its first time in the current file
+
+    previous and current are (SeriesFile, edges of the station).
+    """
+
+    (previous_file, (_, _, penultimate, last)), (current_file, (first, second, _, _)) = previous, current
+    step = first - last
+    where = "'" + previous_file.path.name + "' and '" + current_file.path.name + "'"
+    if len(current_file.edges) > 1:
+        where += " (station " + str(station) + ")"
+
+    if step <= 0:
+        result[current_file.path.name]["time"].add(
+            ResultCode.ERROR, "Overlap between " + where + ": time starts at " + _format_time(first) +
+                              ", but the previous file ends at " + _format_time(last) + ".")
+    elif step < lto_min_step:
+        result[current_file.path.name]["time"].add(
+            ResultCode.ERROR, "Time step of " + _format_step(step) + " between " + where +
+                              ". Minimum time step in LTO must be 30 minutes")
+    else:
+        if max_gap is None:  # twice the time step next to the boundary
+            local_steps = [i for i in [last - penultimate, second - first] if not math.isnan(i)]
+            max_gap = 2 * max(local_steps) if local_steps else None
+        if max_gap is not None and step > max_gap:
+            result[current_file.path.name]["time"].add(
+                ResultCode.WARNING, "Gap of " + _format_step(step) + " between " + where + ": no data from " +
+                                    _format_time(last) + " to " + _format_time(first) + ".")
+
+
+def check_series(paths, max_gap=None, workers=1):
+    """
+    Checks the continuity of LTO time series that are delivered in several (usually monthly) files
+
+    uc2_check checks every file on its own. This check finds gaps, overlaps and time steps shorter than 30 minutes
+    between consecutive files of a series. The files of a series have the same global attributes in
+    series_attributes and are ordered by origin_time. Only the first two and last two times of every file are kept
+    (see time_edges), so memory use does not depend on the length of the series. Files of other campaigns than LTO
+    are ignored.
+
+    Parameters
+    ----------
+    paths : Iterable
+        The files (str or pathlib.Path)
+    max_gap : float, optional
+        Time steps between files longer than this many seconds are reported as gaps. Default: twice the time step
+        at the end of the previous and the beginning of the next file
+    workers : int
+        Number of processes that read files in parallel. Default: 1 (no extra processes)
+
+    Returns
+    -------
+    OrderedDict: key (tuple of the values of series_attributes) -> CheckResult of the series with the results tagged
+    by filename. Files that could not be read are listed with ResultCode.FATAL under the key None.
+
+    """
+
+    paths = [Path(i) for i in paths]
+    if workers <= 1:
+        files = map(_series_file, paths)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            files = list(executor.map(_series_file, paths, chunksize=16))
+
+    series = collections.OrderedDict()
+    failed = CheckResult()
+    any_failed = False
+    for file in files:
+        if file.error is not None:
+            failed[file.path.name].add(ResultCode.FATAL, file.error)
+            any_failed = True
+        elif file.key is not None:
+            series.setdefault(file.key, list()).append(file)
+
+    results = collections.OrderedDict()
+    for key in sorted(series):
+        result = CheckResult()
+        previous_file = None
+        last_seen = list()  # per station: (SeriesFile, edges) of the last file with times of the station
+        for current in sorted(series[key], key=lambda i: (i.origin, str(i.path))):
+            if previous_file is not None:
+                if current.origin == previous_file.origin:
+                    result[current.path.name]["origin_time"].add(
+                        ResultCode.ERROR, "Same origin_time as '" + previous_file.path.name + "'.")
+                if len(current.edges) != len(last_seen):
+                    result[current.path.name]["time"].add(
+                        ResultCode.WARNING, "Number of stations differs from '" + previous_file.path.name +
+                                            "'. Steps between the files are not checked.")
+                    last_seen = [None] * len(current.edges)
+            else:
+                last_seen = [None] * len(current.edges)
+
+            for station, edges in enumerate(current.edges):
+                if math.isnan(edges[0]):
+                    continue  # no times of this station in this file
+                if last_seen[station] is not None:
+                    _check_boundary(result, last_seen[station], (current, edges), station, max_gap)
+                last_seen[station] = (current, edges)
+            previous_file = current
+        results[key] = result
+
+    if any_failed:
+        results[None] = failed
+    return results
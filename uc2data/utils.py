@@ -47,11 +47,9 @@ def check_type(var, allowed_types):
     return this_type in allowed_types
 
 
-def compare_utms(e1, n1, e2, n2):
+def max_utm_diff(e1, n1, e2, n2):
     """
-    Checks whether pairs of UTM coordinates refer to (roughly) the same location
-
-    A warning is given if coordinate pairs differ by a small distance
+    Returns the maximum difference between pairs of UTM coordinates in either direction
 
     Parameters
     ----------
@@ -66,7 +64,7 @@ def compare_utms(e1, n1, e2, n2):
 
     Returns
     -------
-    Dataset.CheckResult: The result of this check
+    float: the maximum difference in m
 
     """
 
@@ -79,8 +77,24 @@ def compare_utms(e1, n1, e2, n2):
     if not isinstance(n2, numpy.ndarray):
         n2 = [n2]
 
-    max_diff = max(max(abs(numpy.subtract(e1, e2))),
-                   max(abs(numpy.subtract(n1, n2))))
+    return max(max(abs(numpy.subtract(e1, e2))),
+               max(abs(numpy.subtract(n1, n2))))
+
+
+def utm_diff_result(max_diff):
+    """
+    Rates the maximum difference between UTM coordinates as returned by max_utm_diff
+
+    Parameters
+    ----------
+    max_diff : float
+        maximum difference in m
+
+    Returns
+    -------
+    Dataset.CheckResult: The result of this check
+
+    """
 
     out = CheckResult()
 
@@ -97,6 +111,109 @@ def compare_utms(e1, n1, e2, n2):
     return out
 
 
+def compare_utms(e1, n1, e2, n2):
+    """
+    Checks whether pairs of UTM coordinates refer to (roughly) the same location
+
+    A warning is given if coordinate pairs differ by a small distance
+
+    Parameters
+    ----------
+    e1 : float
+        UTM easting(s) of the first point(s). Can be scalar of numpy.array
+    n1 : float
+        UTM northing(s) of the first point(s). Can be scalar of numpy.array
+    e2 : float
+        UTM easting(s) of the second point(s). Can be scalar of numpy.array
+    n2 : float
+        UTM northing(s) of the second point(s). Can be scalar of numpy.array
+
+    Returns
+    -------
+    Dataset.CheckResult: The result of this check
+
+    """
+
+    return utm_diff_result(max_utm_diff(e1, n1, e2, n2))
+
+
+def time_steps_ok(times, min_step, fill_value=-9999, previous=None):
+    """
+    Checks that consecutive times along the last axis are at least min_step apart
+
+    Steps to a fill value are not checked. Only views of times and one temporary array per comparison are used,
+    so this can be applied block by block to large variables.
+
+    Parameters
+    ----------
+    times : numpy.ndarray
+        times with time along the last axis
+    min_step : float
+        minimum allowed time step
+    fill_value : float
+        times equal to this value are excluded from the check. Default: -9999
+    previous : float, optional
+        last time of the previous block if times is 1-dimensional. The step from it to the first time is checked, too.
+
+    Returns
+    -------
+    bool: True if all time steps are ok
+
+    """
+
+    if times.ndim == 0 or times.size == 0:
+        return True
+
+    if previous is not None and times.ndim == 1:
+        if times[0] != fill_value and times[0] - previous < min_step:
+            return False
+
+    step = numpy.subtract(times[..., 1:], times[..., :-1])
+    too_small = step < min_step
+    del step
+    too_small &= times[..., 1:] != fill_value
+    return not too_small.any()
+
+
+def midpoints_ok(values, bounds):
+    """
+    Checks that values lie in the middle between their lower and upper bounds (see numpy.allclose)
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        the values
+    bounds : numpy.ndarray
+        the bounds. Same shape as values with an additional last axis of length 2 (lower, upper).
+
+    Returns
+    -------
+    bool: True if all values are close to the middle of their bounds
+
+    """
+
+    lower = bounds[..., 0]
+    upper = bounds[..., 1]
+
+    # mid = lower + (upper - lower) * 0.5, computed in place in a single buffer
+    dtype = numpy.result_type(upper, lower, numpy.float16).newbyteorder("=")  # floating point, precision of bounds
+    mid = numpy.subtract(upper, lower, dtype=dtype)
+    mid *= 0.5
+    mid += lower
+
+    # |values - mid| <= atol + rtol * |mid| with the defaults of numpy.allclose
+    tolerance = numpy.abs(mid)
+    tolerance *= 1.e-5
+    tolerance += 1.e-8
+    numpy.subtract(values, mid, out=mid)
+    numpy.abs(mid, out=mid)
+    if numpy.all(mid <= tolerance):
+        return True
+
+    # special values (e.g. inf) are only handled by the full comparison
+    return numpy.allclose(values, lower + (upper - lower) * 0.5)
+
+
 def check_person_field(string, attrname):
 
     """
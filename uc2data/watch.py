@@ -0,0 +1,386 @@
+import concurrent.futures
+import ctypes
+import ctypes.util
+import os
+import re
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from .Dataset import Dataset
+from .Result import ResultCode, CheckResult
+from .helpers import _check_file
+from .pool import IsolatedPool
+
+# inotify flags (see man 7 inotify)
+IN_MODIFY = 0x2
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ISDIR = 0x40000000
+
+_watch_mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+_event = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+def _signature(path):
+    """
+    Returns (mtime, size) of a file or None if it does not exist
+    """
+
+    try:
+        st = os.stat(str(path))
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class _Inotify:
+
+    """
+    Minimal inotify binding with ctypes (Linux only)
+    """
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+        self.dirs = dict()  # watch descriptor -> directory
+
+    def add(self, directory):
+        wd = self._add_watch(self.fd, os.fsencode(str(directory)), _watch_mask)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()), str(directory))
+        self.dirs[wd] = Path(directory)
+
+    def read(self, timeout):
+        """
+        Waits up to timeout seconds for events and returns them as list of (directory, mask, name)
+        """
+
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        try:
+            buf = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return []
+        events = list()
+        offset = 0
+        while offset < len(buf):
+            wd, mask, _, length = _event.unpack_from(buf, offset)
+            offset += _event.size
+            name = os.fsdecode(buf[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & IN_IGNORED:
+                self.dirs.pop(wd, None)
+            events.append((self.dirs.get(wd), mask, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class DirectoryWatcher:
+
+    """
+    Finds files that were created or changed in a directory and are completely written
+
+    A file is ready when its modification time and size did not change for settle seconds after the last event, so
+    files that are still being written (or copied) are not reported too early. Files that did not change since they
+    were last reported are not reported again. Files that exist when the watcher starts are not reported.
+
+    On Linux changes are found with inotify. Elsewhere, or if inotify is not available, the directory is scanned
+    every poll_interval seconds.
+
+    Attributes
+    ----------
+    path : pathlib.Path
+        The watched directory
+    backend : str
+        "inotify" or "poll"
+
+    Examples
+    --------
+    >>> with DirectoryWatcher("upload", recursive=True) as watcher:
+    ...     while True:
+    ...         for path in watcher.ready(timeout=1.):
+    ...             print(path)
+
+    """
+
+    def __init__(self, path, pattern=r".*\.nc", dirpattern=None, recursive=False, settle=2., poll_interval=2.,
+                 backend="auto"):
+        """
+        Parameters
+        ----------
+        path : str or pathlib.Path
+            The directory to watch
+        pattern : str
+            Only files whose names match this python regular expression are reported. Default: *.nc
+        dirpattern : str, optional
+            Only subdirectories whose names match this regular expression are watched (with recursive)
+        recursive : bool
+            If True subdirectories (including new ones) are watched as well
+        settle : float
+            Seconds a file must stay unchanged before it is reported. Default: 2
+        poll_interval : float
+            Seconds between two scans of the directory if inotify is not used. Default: 2
+        backend : str
+            "auto" (inotify if available, otherwise polling), "inotify" or "poll"
+        """
+
+        if backend not in ["auto", "inotify", "poll"]:
+            raise ValueError("Unexpected backend '" + str(backend) + "'. Must be 'auto', 'inotify' or 'poll'.")
+
+        self.path = Path(path)
+        if not self.path.is_dir():
+            raise NotADirectoryError("'" + str(path) + "' is not a directory.")
+        self.pattern = re.compile(pattern)
+        self.dirpattern = None if dirpattern is None else re.compile(dirpattern)
+        self.recursive = recursive
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self._inotify = None
+        if backend in ["auto", "inotify"] and sys.platform.startswith("linux"):
+            try:
+                self._inotify = _Inotify()
+            except (OSError, AttributeError):  # AttributeError: libc without inotify
+                if backend == "inotify":
+                    raise
+        elif backend == "inotify":
+            raise OSError("inotify is only available on Linux.")
+        self.backend = "poll" if self._inotify is None else "inotify"
+
+        self._known = dict()  # path -> signature when it was last reported (or found at the start)
+        self._pending = dict()  # path -> [signature at the last event, time when it is ready if unchanged]
+        self._next_scan = 0.
+        for file, signature in self._scan(watch=True):
+            self._known[file] = signature
+        self._next_scan = time.monotonic() + poll_interval
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def _dirs(self, top):
+        for dirpath, dirnames, _ in os.walk(str(top)):
+            yield Path(dirpath)
+            if not self.recursive:
+                break
+            if self.dirpattern is not None:
+                dirnames[:] = [i for i in dirnames if self.dirpattern.match(i)]
+
+    def _scan(self, top=None, watch=False):
+        """
+        Yields (path, signature) of all matching files below top. With watch new directories are watched by inotify.
+        """
+
+        for directory in self._dirs(self.path if top is None else top):
+            try:
+                if watch and self._inotify is not None:
+                    self._inotify.add(directory)  # before listing, so that no file is missed
+                entries = list(os.scandir(str(directory)))
+            except OSError:
+                continue
+            for entry in entries:
+                if self.pattern.match(entry.name):
+                    try:
+                        if entry.is_file():
+                            st = entry.stat()
+                            yield Path(entry.path), (st.st_mtime_ns, st.st_size)
+                    except OSError:
+                        pass
+
+    def _touch(self, path, signature=None):
+        """
+        Records an event of a file: it is ready after settle seconds without changes
+        """
+
+        if signature is None:
+            signature = _signature(path)
+        if signature is None:  # deleted
+            self._pending.pop(path, None)
+            self._known.pop(path, None)
+            return
+        if path not in self._pending and self._known.get(path) == signature:
+            return  # not changed since it was reported
+        self._pending[path] = [signature, time.monotonic() + self.settle]
+
+    def _read_events(self, timeout):
+        for directory, mask, name in self._inotify.read(timeout):
+            if mask & IN_Q_OVERFLOW or directory is None:
+                for file, signature in self._scan():  # events were lost
+                    self._touch(file, signature)
+                continue
+            path = directory / name
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and self.recursive and \
+                        (self.dirpattern is None or self.dirpattern.match(name)):
+                    for file, signature in self._scan(path, watch=True):  # files created before the watch
+                        self._touch(file, signature)
+            elif self.pattern.match(name):
+                self._touch(path)
+
+    def ready(self, timeout=1.):
+        """
+        Waits up to timeout seconds for files that are completely written
+
+        Returns earlier if a file becomes ready.
+
+        Parameters
+        ----------
+        timeout : float
+            Maximum time to wait in seconds
+
+        Returns
+        -------
+        list: pathlib.Path of the new or changed files in the order they became ready
+
+        """
+
+        end = time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            if self._inotify is None and now >= self._next_scan:
+                for file, signature in self._scan():
+                    if self._known.get(file) != signature and \
+                            (file not in self._pending or self._pending[file][0] != signature):
+                        self._touch(file, signature)
+                self._next_scan = now + self.poll_interval
+
+            out = list()
+            for file, (signature, due) in sorted(self._pending.items(), key=lambda i: i[1][1]):
+                if due > now:
+                    continue
+                current = _signature(file)
+                if current is None:
+                    del self._pending[file]
+                elif current != signature:
+                    self._pending[file] = [current, now + self.settle]  # still being written
+                else:
+                    del self._pending[file]
+                    self._known[file] = current
+                    out.append(file)
+            if out or now >= end:
+                return out
+
+            wait = end - now
+            if self._pending:
+                wait = min(wait, max(0., min(i[1] for i in self._pending.values()) - now))
+            if self._inotify is not None:
+                self._read_events(wait)
+            else:
+                time.sleep(min(wait, max(0., self._next_scan - now)))
+
+
+def _result(future, file):
+    """
+    Returns (CheckResult, timing) of a finished check. Failed checks (e.g. of a crashed worker) get a FATAL result.
+    """
+
+    try:
+        return future.result()
+    except Exception as e:
+        return CheckResult(ResultCode.FATAL, "Could not check file '" + str(file) + "': " +
+                           type(e).__name__ + ": " + str(e)), 0.
+
+
+def watch_check(path, workers=1, mode="thread", cancel=None, max_errors=None, only=None, skip=None,
+                header_only=False, timeout=None, max_rss=None, max_files=None, max_bytes=None, **watch_args):
+    """
+    Checks every file that is created or changed in a directory as soon as it is completely written
+
+    Runs until cancel is set or the iterator is closed. Files are checked by a pool of workers and the results are
+    yielded as soon as a check is finished.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        The directory to watch
+    workers : int
+        Number of files checked at the same time
+    mode : str
+        "thread" or "process". Backend used to check files in parallel. With "process" every file is checked in a
+        worker process that is killed if it exceeds timeout or max_rss, so one broken file cannot stop the watch
+        (see pool.IsolatedPool).
+    cancel : threading.Event, optional
+        If set, the watch ends. Running checks are finished first.
+    max_errors, only, skip, header_only, timeout, max_rss, max_files, max_bytes
+        see check_many
+    **watch_args
+        passed on to DirectoryWatcher, e.g. recursive, settle or pattern
+
+    Yields
+    ------
+    tuple: (path, CheckResult, timing) with timing being the wall-clock time of the check in seconds
+
+    Examples
+    --------
+    >>> for path, result, timing in uc2data.watch.watch_check("upload", workers=4, recursive=True):
+    ...     print(path, "ok" if result else result.errors)
+
+    """
+
+    if mode not in ["thread", "process"]:
+        raise ValueError("Unexpected mode '" + str(mode) + "'. Must be 'thread' or 'process'.")
+    if workers < 1:
+        raise ValueError("workers must be at least 1, got " + str(workers) + ".")
+    if mode == "thread" and (timeout is not None or max_rss is not None or max_files is not None or
+                             max_bytes is not None):
+        raise ValueError("timeout, max_rss, max_files and max_bytes need mode 'process'.")
+    Dataset.schedule_groups(only, skip, cheap_only=header_only)  # fail early on unknown check groups
+    check_args = {k: v for k, v in [("max_errors", max_errors), ("only", only), ("skip", skip)] if v is not None}
+
+    if mode == "process":
+        yield from _watch_isolated(path, cancel, check_args, header_only,
+                                   IsolatedPool(workers, timeout, max_rss, max_files, max_bytes), watch_args)
+        return
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    pending = dict()  # future -> path
+    try:
+        with DirectoryWatcher(path, **watch_args) as watcher:
+            while cancel is None or not cancel.is_set():
+                for file in watcher.ready(timeout=0.1 if pending else 0.5):
+                    pending[executor.submit(_check_file, file, check_args, header_only)] = file
+
+                for future in [i for i in pending if i.done()]:
+                    file = pending.pop(future)
+                    yield (file,) + _result(future, file)
+
+        for future in concurrent.futures.as_completed(list(pending)):
+            file = pending.pop(future)
+            yield (file,) + _result(future, file)
+    finally:
+        executor.shutdown(wait=False)
+
+
+def _watch_isolated(path, cancel, check_args, header_only, pool, watch_args):
+    """
+    Process backend of watch_check: checks the files in an IsolatedPool and yields (path, CheckResult, timing)
+    """
+
+    with pool, DirectoryWatcher(path, **watch_args) as watcher:
+        while cancel is None or not cancel.is_set():
+            for file in watcher.ready(timeout=0.1 if pool.busy else 0.5):
+                pool.submit(file, check_args, header_only)
+            yield from pool.wait(timeout=0.)
+
+        while pool.busy:
+            yield from pool.wait(timeout=1.)
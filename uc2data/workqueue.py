@@ -0,0 +1,293 @@
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+
+
+class WorkQueue:
+
+    """
+    Distributes files among any number of workers through a shared directory
+
+    There is no server. Every worker goes through the same list of files and claims the next one that is neither
+    done nor claimed. Claims are files created with O_EXCL in DIR/claims, which is atomic on POSIX file systems.
+    While a worker holds a claim, it touches the claim file every heartbeat seconds. Claims that were not touched
+    for expire seconds (e.g. because the worker died) are taken over by other workers. A claim file is only
+    removed or touched while its lock file (claim file + ".lock", also created with O_EXCL) is held, so two workers
+    never own the same claim. Results are written to DIR/results, one json file per checked file.
+
+    Attributes
+    ----------
+    directory : pathlib.Path
+        The shared directory
+    expire : float
+        Seconds after which a claim without heartbeat is taken over
+    heartbeat : float
+        Seconds between updates of the held claims
+    worker_id : str
+        Unique name of this worker
+
+    Examples
+    --------
+    >>> queue = WorkQueue("/shared/queue")
+    >>> for path in queue.items(paths, key=str):
+    ...     with uc2data.Dataset(path) as ds:
+    ...         ds.uc2_check()
+    ...     queue.put_result(str(path), ds.check_result.to_dict()["root"])
+    >>> queue.close()
+
+    """
+
+    def __init__(self, directory, expire=600., heartbeat=None):
+        self.directory = Path(directory)
+        self.expire = expire
+        self.heartbeat = expire / 4 if heartbeat is None else heartbeat
+        self.worker_id = socket.gethostname() + "-" + str(os.getpid()) + "-" + uuid.uuid4().hex[:8]
+        self.claims_dir = self.directory / "claims"
+        self.results_dir = self.directory / "results"
+        self.claims_dir.mkdir(parents=True, exist_ok=True)
+        self.results_dir.mkdir(parents=True, exist_ok=True)
+
+        self._held = dict()  # claim file -> token written into it
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _hash(key):
+        return hashlib.md5(key.encode("utf-8")).hexdigest()
+
+    def _claim_path(self, key):
+        return str(self.claims_dir / (self._hash(key) + ".claim"))
+
+    def _result_path(self, key):
+        return str(self.results_dir / (self._hash(key) + ".json"))
+
+    def done(self, key):
+        """
+        Returns True if there is a result for key
+        """
+
+        return os.path.exists(self._result_path(key))
+
+    def claim(self, key):
+        """
+        Tries to claim key for this worker
+
+        Parameters
+        ----------
+        key : str
+            Unique name of the work item, e.g. the path of a file relative to the checked directory
+
+        Returns
+        -------
+        bool: True if this worker now holds the claim, False if the item is done or claimed by another worker
+
+        """
+
+        if self.done(key):
+            return False
+
+        claim_path = self._claim_path(key)
+        token = self.worker_id + " " + uuid.uuid4().hex
+        for _ in range(3):
+            try:
+                fd = os.open(claim_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                if not self._expire_claim(claim_path):
+                    return False
+                continue
+            with os.fdopen(fd, "w") as f:
+                f.write(token)
+            if self.done(key):  # finished by another worker in the meantime
+                os.remove(claim_path)
+                return False
+            with self._lock:
+                self._held[claim_path] = token
+            self._start_heartbeat()
+            return True
+        return False
+
+    def _acquire(self, claim_path, wait=0.):
+        """
+        Takes the lock of a claim file. Returns False if it is held by another worker for longer than wait seconds.
+        """
+
+        lock_path = claim_path + ".lock"
+        end = time.monotonic() + wait
+        while True:
+            try:
+                os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+                return True
+            except FileExistsError:
+                pass
+            try:
+                if time.time() - os.stat(lock_path).st_mtime > self.expire:
+                    os.remove(lock_path)  # left by a worker that died in the few milliseconds it holds a lock
+                    continue
+            except FileNotFoundError:
+                continue  # released in the meantime
+            if time.monotonic() >= end:
+                return False
+            time.sleep(0.01)
+
+    def _unlock(self, claim_path):
+        os.remove(claim_path + ".lock")
+
+    @staticmethod
+    def _token(claim_path):
+        """
+        Returns the token in a claim file or None if there is no claim
+        """
+
+        try:
+            with open(claim_path) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _expire_claim(self, claim_path):
+        """
+        Removes the claim if it expired. Returns True if claiming should be tried again.
+        """
+
+        if not self._acquire(claim_path):
+            return False  # another worker is expiring, touching or releasing it
+        try:
+            try:
+                age = time.time() - os.stat(claim_path).st_mtime
+            except FileNotFoundError:
+                return True  # released in the meantime
+            if age < self.expire:
+                return False
+            os.remove(claim_path)
+            return True
+        finally:
+            self._unlock(claim_path)
+
+    def holds(self, key):
+        """
+        Returns True if this worker still holds the claim of key (and it was not taken over after it expired)
+        """
+
+        claim_path = self._claim_path(key)
+        with self._lock:
+            token = self._held.get(claim_path)
+        return token is not None and self._token(claim_path) == token
+
+    def release(self, key):
+        """
+        Gives up the claim of key (e.g. after put_result)
+        """
+
+        self._release(self._claim_path(key))
+
+    def _release(self, claim_path):
+        with self._lock:
+            token = self._held.pop(claim_path, None)
+        if token is None:
+            return
+        if not self._acquire(claim_path, wait=1.):
+            return  # the claim expires instead
+        try:
+            if self._token(claim_path) == token:  # otherwise it expired and was taken over by another worker
+                os.remove(claim_path)
+        finally:
+            self._unlock(claim_path)
+
+    def put_result(self, key, result):
+        """
+        Stores the result of key as json file {key: result} in DIR/results
+
+        The file appears atomically, so other workers never see incomplete results.
+        The json files can be combined with uc2check merge.
+
+        Returns
+        -------
+        bool: False if this worker claimed key, but the claim expired and was taken over by another worker. The result
+        is not stored then, the new owner stores its own.
+
+        """
+
+        claim_path = self._claim_path(key)
+        with self._lock:
+            claimed = claim_path in self._held
+        if claimed and not self.holds(key):
+            return False
+
+        result_path = self._result_path(key)
+        tmp_path = result_path + "." + self.worker_id + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({key: result}, f)
+        os.replace(tmp_path, result_path)
+        return True
+
+    def items(self, items, key=str, hold=False):
+        """
+        Yields the items that this worker claimed
+
+        The claim of an item is released when the next item is requested. Consumers that request further items
+        before an item is done (e.g. check_many with several workers) must use hold.
+
+        Parameters
+        ----------
+        items : Iterable
+            All work items. Every worker should use the same items.
+        key : callable
+            Returns the unique name of an item. Default: str
+        hold : bool
+            If True the claims are kept until they are released with release (e.g. after put_result) or close
+
+        Yields
+        ------
+        the claimed items
+
+        """
+
+        for item in items:
+            item_key = key(item)
+            if self.claim(item_key):
+                if hold:
+                    yield item
+                    continue
+                try:
+                    yield item
+                finally:
+                    self.release(item_key)
+
+    def _start_heartbeat(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._beat, daemon=True)
+        self._thread.start()
+
+    def _beat(self):
+        while not self._stop.wait(self.heartbeat):
+            with self._lock:
+                held = list(self._held.items())
+            for claim_path, token in held:
+                if not self._acquire(claim_path, wait=1.):
+                    continue
+                try:
+                    if self._token(claim_path) == token:  # never keep the claim of another worker alive
+                        os.utime(claim_path)
+                finally:
+                    self._unlock(claim_path)
+
+    def close(self):
+        """
+        Stops the heartbeat and releases all claims
+        """
+
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            held = list(self._held)
+        for claim_path in held:
+            self._release(claim_path)